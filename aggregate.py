@@ -0,0 +1,233 @@
+# aggregate.py
+# One "domain model" class diagram built from every submission, map-reduce style.
+# Usage:
+#   (venv) > python aggregate.py --workers 4 --min-support 5            # -> domain_model.puml
+#   (venv) > python aggregate.py --min-support 0.02 --format mermaid --out domain_model.mmd
+#   (venv) > python aggregate.py --update                               # fold in new submissions only
+#   (venv) > python aggregate.py --from-file corpus.argosreq            # bulk_io.py export, no DB
+#
+# map:    a worker takes a SubmissionID range of one shard (shards.py) and
+#         runs the pipeline stages up to "map" per submission; a member counts
+#         once per submission it appears in. Result: a Partial,
+#         {(class, kind, member): support}. Every shard is split into ranges,
+#         so all shards are read at once.
+# reduce: Partials merge by adding counts (associative and commutative, so
+#         ranges can be merged in any order or tree shape).
+# emit:   members with support >= --min-support (a count, or a fraction of
+#         the submissions when < 1) go through the ruleset's build + emitter.
+#
+# The merged Partial is saved to AGGREGATE_STATE with the last SubmissionID it
+# covers; --update maps only the submissions after it and merges the delta.
+# SubmissionIDs are handed out before the rows commit, so a submission can
+# appear after higher ones were folded in: the state also lists the
+# SubmissionIDs it covers within RESCAN_SIDS of the last one, and --update
+# maps that window again, skipping those.
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import groupby, islice
+
+import shards
+import uml_pipeline
+from requirement_store import RequirementStore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+AGGREGATE_STATE = os.environ.get("ARGOS_AGGREGATE_STATE", os.path.join(HERE, "aggregate_state.json"))
+STATE_VERSION = 2
+RESCAN_SIDS = 1000  # SubmissionIDs below the last covered one that --update looks at again
+
+
+class Partial:
+    """Per-member submission support over a set of submissions."""
+
+    def __init__(self, counts=None, submissions=0, last_sid=0, recent=()):
+        self.counts = Counter(counts or {})
+        self.submissions = submissions
+        self.last_sid = last_sid
+        floor = last_sid - RESCAN_SIDS
+        self.recent = {sid for sid in recent if sid > floor}  # covered SubmissionIDs near last_sid
+
+    def add_submission(self, sid, members):
+        self.counts.update(set(members))
+        self.submissions += 1
+        self.last_sid = max(self.last_sid, sid)
+        self.recent.add(sid)
+
+    def merge(self, other):
+        """A new Partial covering both; neither input is changed."""
+        return Partial(self.counts + other.counts, self.submissions + other.submissions,
+                       max(self.last_sid, other.last_sid), self.recent | other.recent)
+
+    def frequent(self, min_support=1):
+        """Members seen in at least min_support submissions (a fraction of them if < 1)."""
+        if 0 < min_support < 1:
+            min_support = max(1, int(min_support * self.submissions + 0.999999))
+        return [member for member, n in self.counts.items() if n >= min_support]
+
+    def to_json(self, rules):
+        return {"version": STATE_VERSION, "rules": rules.name, "rules_version": rules.version,
+                "submissions": self.submissions, "last_sid": self.last_sid,
+                "recent": sorted(sid for sid in self.recent if sid > self.last_sid - RESCAN_SIDS),
+                "members": [[cls, kind, member, n] for (cls, kind, member), n in sorted(self.counts.items())]}
+
+    @classmethod
+    def from_json(cls, data, rules):
+        """None when the state was built by other rules (it must be rebuilt)."""
+        if (data.get("version"), data.get("rules"), data.get("rules_version")) != (STATE_VERSION, rules.name,
+                                                                                  rules.version):
+            return None
+        counts = {(c, k, m): n for c, k, m, n in data["members"]}
+        return cls(counts, data["submissions"], data["last_sid"], data["recent"])
+
+
+# ---------------------------------------
+# MAP
+# ---------------------------------------
+def map_submissions(submissions, rules_name="class", skip=frozenset()):
+    """[(SubmissionID, [(Type, Description)])] -> Partial (SubmissionIDs in `skip` are covered already)."""
+    pipeline = uml_pipeline.get_pipeline(uml_pipeline.get_rules(rules_name))
+    partial = Partial()
+    for sid, rows in submissions:
+        if sid not in skip:
+            partial.add_submission(sid, pipeline.members(rows))
+    return partial
+
+
+def _range_rows(lo, hi, shard=shards.MAIN, batch_size=5000):
+    query = ("SELECT SubmissionID, Type, Description FROM dbo.Requirements "
+             "WHERE SubmissionID BETWEEN ? AND ? ORDER BY SubmissionID, Id")
+    with shards.get(shard).connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, (lo, hi))
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield from batch
+        cursor.close()
+
+
+def map_range(lo, hi, rules_name="class", shard=shards.MAIN, skip=frozenset()):
+    """Worker task: the Partial of SubmissionIDs lo..hi (inclusive), read from one shard."""
+    groups = ((sid, [(r[1], r[2]) for r in group])
+              for sid, group in groupby(_range_rows(lo, hi, shard), key=lambda r: r[0]))
+    return map_submissions(groups, rules_name, skip)
+
+
+def _sid_bounds(shard, after=0):
+    with shard.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MIN(SubmissionID), MAX(SubmissionID) FROM dbo.Requirements WHERE SubmissionID > ?",
+                       (after,))
+        lo, hi = cursor.fetchone()
+        cursor.close()
+    return lo, hi
+
+
+def _ranges(lo, hi, parts):
+    step = max(1, -(-(hi - lo + 1) // parts))
+    return [(start, min(start + step - 1, hi)) for start in range(lo, hi + 1, step)]
+
+
+# ---------------------------------------
+# MAP + REDUCE
+# ---------------------------------------
+def aggregate(after=0, workers=None, rules_name="class", submissions=None, chunk_size=256, skip=frozenset()):
+    """
+    Partial over every submission with SubmissionID > after, except those in
+    `skip`. Workers map SubmissionID ranges from the database, or chunks of
+    `submissions` ((sid, rows) pairs, e.g. RequirementStore.load(path).submissions()).
+    """
+    skip = frozenset(skip)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if submissions is not None:
+            submissions = ((sid, rows) for sid, rows in submissions if sid > after)
+            chunks = iter(lambda: list(islice(submissions, chunk_size)), [])
+            tasks = ((map_submissions, chunk, rules_name, skip) for chunk in chunks)
+        else:
+            bounds = [(shard.name, lo, hi) for shard, (lo, hi) in shards.fan_out(lambda s: _sid_bounds(s, after))
+                      if lo is not None]
+            parts = -(-workers * 4 // max(len(bounds), 1))  # a few ranges per worker evens out uneven ones
+            tasks = ((map_range, lo, hi, rules_name, name, skip) for name, shard_lo, shard_hi in bounds
+                     for lo, hi in _ranges(shard_lo, shard_hi, parts))
+        return _merge_bounded(pool, tasks, workers * 2, Partial(last_sid=after))
+
+
+def _merge_bounded(pool, tasks, window, partial):
+    """
+    Run (fn, *args) tasks on the pool with at most `window` in flight (so a big
+    file is never read ahead into memory) and merge the Partials as they finish.
+    """
+    pending = set()
+    for fn, *args in tasks:
+        pending.add(pool.submit(fn, *args))
+        if len(pending) >= window:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                partial = partial.merge(fut.result())
+    for fut in pending:
+        partial = partial.merge(fut.result())
+    return partial
+
+
+def update(state_path=AGGREGATE_STATE, workers=None, rules_name="class", rebuild=False, submissions=None):
+    """
+    Merge the submissions the saved state does not cover yet into it: those
+    after its last SubmissionID, and ones within RESCAN_SIDS below it that
+    committed late. Returns the Partial.
+    """
+    rules = uml_pipeline.get_rules(rules_name)
+    base = None
+    if not rebuild:
+        try:
+            with open(state_path, encoding="utf-8") as f:
+                base = Partial.from_json(json.load(f), rules)
+        except (OSError, ValueError):
+            base = None
+    base = base or Partial()
+    after = max(base.last_sid - RESCAN_SIDS, 0)
+    partial = base.merge(aggregate(after, workers, rules_name, submissions, skip=base.recent))
+    tmp = state_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(partial.to_json(rules), f, ensure_ascii=False)
+    os.replace(tmp, state_path)
+    return partial
+
+
+def aggregate_diagram(partial, min_support=1, fmt="plantuml", rules_name="class"):
+    """Emit the members with enough support (defaults of the ruleset included)."""
+    rules = uml_pipeline.get_rules(rules_name)
+    return uml_pipeline.EMITTERS[fmt](rules.build(partial.frequent(min_support)))
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Domain-model diagram over all submissions (map-reduce)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--min-support", type=float, default=1,
+                        help="submissions a member must appear in (a fraction of them if < 1)")
+    parser.add_argument("--rules", choices=sorted(uml_pipeline.RULESETS), default="class")
+    parser.add_argument("--format", choices=sorted(uml_pipeline.EMITTERS), default="plantuml")
+    parser.add_argument("--out", default=None, help="default: domain_model.<ext>")
+    parser.add_argument("--update", action="store_true", help="only add submissions newer than the saved state")
+    parser.add_argument("--state", default=AGGREGATE_STATE, help="saved Partial (JSON)")
+    parser.add_argument("--from-file", default=None, help="read a bulk_io.py export instead of the DB")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    start = time.perf_counter()
+    source = RequirementStore.load(args.from_file).submissions() if args.from_file else None
+    partial = update(args.state, args.workers, args.rules, rebuild=not args.update, submissions=source)
+    text = aggregate_diagram(partial, args.min_support, args.format, args.rules)
+    out = args.out or f"domain_model.{uml_pipeline.EXTENSIONS[args.format]}"
+    with open(out, "w", encoding="utf-8") as f:
+        f.write(text)
+    kept = len(partial.frequent(args.min_support))
+    print(f"✅ {partial.submissions} submissions, {len(partial.counts)} distinct members, {kept} with support "
+          f">= {args.min_support:g} -> {out} ({time.perf_counter() - start:.2f}s)")
@@ -1,9 +1,87 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+import time
+
+from flask import Flask, render_template, request, redirect, url_for, session, flash, make_response, abort, g, jsonify
+from flask import before_render_template, template_rendered
+import class_diagram
+import credentials
 import db
+import diagram_cache
+import ingest
+import jobs
+import metrics
+import page_cache
+import profiler
+import queries
+import render_service
+import search_index
+import shards
+import similarity
 
 app = Flask(__name__)
 app.secret_key = "any_strong_secret_key_here_123"
 
+# a (re)written submission must not be served from the page cache
+ingest.on_submission_saved(page_cache.pages.invalidate_submission)
+# keep the near-duplicate (similarity.py) and search (search_index.py) indexes
+# current once they have been built
+ingest.on_submission_saved(similarity.index_submission)
+ingest.on_submission_saved(search_index.index_submission)
+# categorize / diagram / render run in jobs.py workers, off the request path
+ingest.on_submission_saved(jobs.enqueue_submission)
+
+# ==================== INSTRUMENTATION ====================
+# request latency + template timing go to metrics.py; with ARGOS_PROFILE_SLOW_MS
+# set, slow requests also leave a folded stack file (profiler.py)
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    prof = profiler.get_profiler()
+    g.profile = (prof, prof.begin(request.endpoint or request.path)) if prof else None
+
+@app.after_request
+def _record_request(response):
+    metrics.observe("argos_http_request_seconds", time.perf_counter() - g.request_started,
+                    endpoint=request.endpoint or "unmatched", method=request.method, status=response.status_code)
+    return response
+
+@app.teardown_request
+def _end_profile(exc):
+    profile = g.pop("profile", None)
+    if profile:
+        prof, req = profile
+        prof.end(req)
+
+def _template_started(sender, template, context, **extra):
+    g.template_started = time.perf_counter()
+
+def _template_done(sender, template, context, **extra):
+    started = g.pop("template_started", None)
+    if started is not None:
+        metrics.observe("argos_template_render_seconds", time.perf_counter() - started, template=template.name)
+
+before_render_template.connect(_template_started, app)
+template_rendered.connect(_template_done, app)
+
+def _stat_labels(stats):
+    return {(("stat", k),): v for k, v in stats.items() if isinstance(v, (int, float))}
+
+metrics.function("argos_db_pool", lambda: _stat_labels(db.get_pool().stats()),
+                 help="Connection pool: max_size, idle, created, discarded")
+metrics.function("argos_page_cache", lambda: _stat_labels(page_cache.pages.stats()),
+                 help="Rendered page cache: entries, hits, misses")
+metrics.function("argos_diagram_cache", lambda: _stat_labels(diagram_cache.get_cache().stats()),
+                 help="Diagram cache: hits, misses, bytes, evictions")
+metrics.function("argos_render_service",
+                 lambda: _stat_labels(render_service.get_service().stats()) if render_service.started() else None,
+                 help="PlantUML render service: renders, failures, timeouts, queued")
+
+@app.route("/metrics")
+def metrics_endpoint():
+    response = make_response(metrics.render())
+    response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+    return response
+
 # ==================== LOGIN / SIGNUP ====================
 
 @app.route("/", methods=["GET", "POST"])
@@ -35,21 +113,16 @@ def register():
         flash("Email and password required!", "error")
         return redirect("/signup")
 
-    conn = db.get_connection()
-    cursor = conn.cursor()
-
-    # Check if already exists
-    cursor.execute("SELECT Email FROM Users WHERE Email = ?", (email,))
-    if cursor.fetchone():
-        conn.close()
+    # Passwords are stored as salted hashes (credentials.py)
+    try:
+        created = credentials.register_user(email, password)
+    except credentials.CredentialsBusy:
+        flash("Server is busy, please try again.", "error")
+        return redirect("/signup")
+    if not created:
         flash("Email already registered!", "error")
         return redirect("/signup")
 
-    # Create new user
-    cursor.execute("INSERT INTO Users (Email, Password) VALUES (?, ?)", (email, password))
-    conn.commit()
-    conn.close()
-
     flash("Account created successfully! Now login.", "success")
     return redirect("/")
 
@@ -58,11 +131,11 @@ def login():
     email = request.form["email"].strip().lower()
     password = request.form["password"]
 
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT Email FROM Users WHERE Email = ? AND Password = ?", (email, password))
-    user = cursor.fetchone()
-    conn.close()
+    try:
+        user = credentials.authenticate(email, password)
+    except credentials.CredentialsBusy:
+        flash("Server is busy, please try again.", "error")
+        return redirect("/")
 
     if user:
         session["user"] = email
@@ -79,6 +152,11 @@ def logout():
 
 # ==================== PROTECTED PAGES ====================
 
+def _own_submission(sid):
+    """404 unless the logged-in user made submission `sid` (other users' submissions do not exist for them)."""
+    if shards.submission_owner(sid) != session["user"]:
+        abort(404)
+
 @app.route("/form", methods=["GET"])
 def form():
     if "user" not in session:
@@ -91,51 +169,9 @@ def submit():
     if "user" not in session:
         return redirect("/")
 
-    # ←←← Tumhara pura original submit code yahan exactly same rahega →→→
+    # Form -> rows mapping lives in ingest.py; one transaction, one batched insert
     responses = request.form.to_dict()
-    conn = db.get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT ISNULL(MAX(SubmissionID), 0) + 1 FROM dbo.Requirements")
-    new_id = cursor.fetchone()[0]
-
-    functional_mapping = {
-        "functional_2": {"yes": "allow admin to approve donation campaigns", "no": "not allow admin to approve donation campaigns"},
-        "functional_4": {"email": "allow users to register using email", "social": "allow users to register using social media accounts"},
-        "functional_7": {"yes": "support recurring donations", "no": "not support recurring donations"}
-    }
-
-    for key, value in responses.items():
-        value = value.strip()
-        if not value:
-            continue
-
-        if key in functional_mapping and value in functional_mapping[key]:
-            sentence = f"The system shall {functional_mapping[key][value]}"
-            req_type = "Functional"
-        elif key.startswith("functional"):
-            req_type = "Functional"
-            sentence = f"The system shall {value}"
-        elif key.startswith("nonfunc"):
-            req_type = "Non-Functional"
-            sentence = f"The system must {value}"
-        elif key.startswith("domain"):
-            req_type = "Domain"
-            sentence = f"The system shall support {value}"
-        elif key.startswith("inverse"):
-            req_type = "Inverse"
-            sentence = f"The system shall not {value}"
-        else:
-            req_type = "General"
-            sentence = value
-
-        cursor.execute("""
-            INSERT INTO dbo.Requirements (Type, Description, Priority, Stakeholder, SubmissionID)
-            VALUES (?, ?, ?, ?, ?)
-        """, (req_type, sentence, "Medium", "Client", new_id))
-
-    conn.commit()
-    conn.close()
+    new_id = ingest.ingest_form(responses, owner=session["user"])
     return redirect(url_for("show_requirements", sid=new_id))
 
 @app.route("/templaterequirements")
@@ -143,23 +179,98 @@ def show_requirements():
     if "user" not in session:
         return redirect("/")
     sid = request.args.get("sid", type=int)
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    query = "SELECT Type, Description FROM dbo.Requirements"
-    params = ()
+    page = request.args.get("page", default=1, type=int)
     if sid:
-        query += " WHERE SubmissionID = ?"
-        params = (sid,)
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    conn.close()
-
-    categorized = {"Functional": [], "Non-Functional": [], "Domain": [], "Inverse": []}
-    for rtype, desc in rows:
-        if rtype in categorized:
-            categorized[rtype].append(desc)
-
-    return render_template("templaterequirements.html", categorized=categorized)
+        _own_submission(sid)
+
+    # submissions don't change after submit(), so a rendered page is reused
+    # until TTL/LRU eviction or invalidation (only when sid is explicit;
+    # "latest" (the user's newest) moves with every new submission)
+    cached = page_cache.pages.get((sid, page)) if sid else None
+    if cached:
+        etag, body = cached
+    else:
+        # SubmissionID-scoped, paginated; per-Type counts come from a GROUP BY in the DB
+        result = queries.requirements_page(sid, page, owner=session["user"])
+        body = render_template("templaterequirements.html", **result)
+        etag = page_cache.pages.put((sid, page), body) if sid else page_cache.make_etag(body)
+
+    response = make_response(body)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"  # browser must revalidate (-> 304)
+    return response.make_conditional(request)
+
+@app.route("/requirements/<int:sid>.json")
+def requirements_json(sid):
+    """All of a submission's requirements by Type (the page only holds one page of them; used by the PDF export)."""
+    if "user" not in session:
+        return redirect("/")
+    _own_submission(sid)
+    return jsonify(queries.all_requirements(sid))
+
+IMAGE_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+@app.route("/diagram/<int:sid>.<fmt>")
+def diagram_image(sid, fmt):
+    if "user" not in session:
+        return redirect("/")
+    if fmt not in IMAGE_TYPES:
+        abort(404)
+    _own_submission(sid)
+    requirements = class_diagram.fetch_submission_requirements(sid)
+    if not requirements:
+        abort(404)
+
+    # .puml and image both come from the content-addressed cache; a miss is
+    # rendered by the long-lived PlantUML processes (no JVM start per diagram)
+    cache = diagram_cache.get_cache()
+    key, text = class_diagram.cached_class_diagram(requirements, cache, dedup=similarity.DIAGRAM_DEDUP)
+    try:
+        data = cache.image(key, text, fmt, render=render_service.get_service().render)
+    except render_service.RenderError as e:
+        status = 504 if isinstance(e, render_service.RenderTimeout) else 503
+        response = make_response(f"Diagram not available: {e}", status)
+        response.headers["Retry-After"] = "5"
+        return response
+
+    response = make_response(data)
+    response.headers["Content-Type"] = IMAGE_TYPES[fmt]
+    response.set_etag(f"{key}.{fmt}")
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
+@app.route("/jobs/<int:sid>")
+def job_status(sid):
+    """Background job states for one submission (polled by the requirements page)."""
+    if "user" not in session:
+        return redirect("/")
+    _own_submission(sid)
+    return jsonify(jobs.status(sid))
+
+@app.route("/similar")
+def similar():
+    """Similar past requirements as JSON: /similar?q=<text>&limit=10&threshold=0.7"""
+    if "user" not in session:
+        return redirect("/")
+    text = request.args.get("q", "").strip()
+    if not text:
+        abort(400)
+    limit = min(request.args.get("limit", default=10, type=int), 100)
+    threshold = request.args.get("threshold", default=similarity.DEFAULT_THRESHOLD, type=float)
+    return jsonify(similarity.similar_requirements(text, limit, threshold, owner=session["user"]))
+
+@app.route("/search")
+def search():
+    """Ranked requirements as JSON: /search?q=<words>&sid=12&type=Functional&limit=20"""
+    if "user" not in session:
+        return redirect("/")
+    query = request.args.get("q", "").strip()
+    if not query:
+        abort(400)
+    limit = min(request.args.get("limit", default=20, type=int), 200)
+    sid = request.args.get("sid", type=int)
+    rtype = request.args.get("type") or None
+    return jsonify(search_index.search(query, limit, sid, rtype, owner=session["user"]))
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
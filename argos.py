@@ -0,0 +1,299 @@
+# argos.py
+# One command line for the generator scripts, with an optional warm daemon.
+# Usage:
+#   (venv) > python argos.py generate                          # class_diagram.py: latest submission
+#   (venv) > python argos.py generate --all --workers 4
+#   (venv) > python argos.py uml                               # uml_generator.py role diagram
+#   (venv) > python argos.py extract --format jsonl --out reqs.jsonl
+#   (venv) > python argos.py render class_diagram.puml --format svg
+#   (venv) > python argos.py bench suite --sizes 10,1000
+#   (venv) > python argos.py daemon                            # serve commands from a warm process
+#   (venv) > python argos.py daemon --status | --stop
+#   (venv) > python argos.py --local generate                  # never use the daemon
+#
+# Each command is the main(argv) of the script that always had it, imported
+# only when that command runs (`argos render` never loads the pipeline or the
+# database layer); arguments after the command go to it unchanged.
+#
+# With a daemon running, the client (os, sys and socket only: even json would
+# pull in re) sends the command line over a loopback socket and prints the
+# output streamed back, so a call costs an interpreter start and one round
+# trip: modules are imported, rules compiled, caches and PlantUML processes
+# warm already. The daemon's port and a random token are in DAEMON_FILE
+# (readable by the user only); it runs one command at a time, in the caller's
+# working directory (a call arriving meanwhile is refused and runs in the
+# caller instead), with ARGOS_DAEMON=0 so nothing it starts calls back into
+# it. Modules read their ARGOS_* settings when imported, so a command only
+# runs in the daemon when the caller's ARGOS_* variables are the ones the
+# daemon started with; otherwise it runs in the caller. Restart it after
+# updating the code (edits of mapping_rules.json are picked up anyway).
+# `python bench.py startup` measures import times and the daemon round trip.
+#
+# Wire format: frames of kind (1 byte) + payload length (4 bytes, big endian)
+# + payload. The request is a "q" frame (token, op, cwd and argv joined by
+# NUL) and a "v" frame (the caller's ARGOS_* variables as NAME=value joined by
+# NUL); the daemon answers with "o" (stdout) / "e" (stderr) text frames and a
+# final "x" frame holding the exit status, or one "r" frame (refused: busy,
+# wrong token or different ARGOS_* settings).
+
+import importlib
+import os
+import socket
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DAEMON_FILE = os.environ.get("ARGOS_DAEMON_FILE", os.path.join(HERE, ".argos_daemon"))
+CONNECT_TIMEOUT = 0.5
+# differ between the daemon and its callers by design
+DAEMON_ENV = ("ARGOS_DAEMON", "ARGOS_DAEMON_FILE")
+
+# command -> (module with main(argv), help)
+COMMANDS = {
+    "generate": ("class_diagram", "class diagram of the latest submission, or --all (class_diagram.py)"),
+    "uml": ("uml_generator", "role diagram from the Functional requirements (uml_generator.py)"),
+    "extract": ("extractor", "stream and categorize dbo.Requirements (extractor.py)"),
+    "render": ("render_service", "render .puml files to png / svg (render_service.py)"),
+    "bench": ("bench", "benchmarks (bench.py)"),
+}
+# imported by the daemon before it takes commands (bench stays lazy: it is big and rarely repeated)
+WARM_MODULES = ("class_diagram", "uml_generator", "extractor", "render_service")
+
+
+def usage():
+    lines = ["usage: argos.py [--local] <command> [args...]", "", "commands:"]
+    lines += [f"  {name:<10} {text}" for name, (_, text) in COMMANDS.items()]
+    lines.append(f"  {'daemon':<10} keep the modules warm for later calls [--status | --stop | --no-warm]")
+    lines.append("")
+    lines.append("`argos.py <command> --help` shows the command's own options.")
+    return "\n".join(lines)
+
+
+def run(argv):
+    """Run one command line in this process; returns its exit status."""
+    if not argv or argv[0] in ("-h", "--help", "help"):
+        print(usage())
+        return 0
+    name, rest = argv[0], argv[1:]
+    if name not in COMMANDS:
+        print(f"❌ unknown command {name!r}\n\n{usage()}", file=sys.stderr)
+        return 2
+    module = importlib.import_module(COMMANDS[name][0])
+    try:
+        module.main(rest)
+    except SystemExit as e:  # argparse --help and usage errors
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    return 0
+
+
+# ---------------------------------------
+# CLIENT
+# ---------------------------------------
+def _frame(kind, payload):
+    return kind + len(payload).to_bytes(4, "big") + payload
+
+
+def _read_frame(f):
+    """(kind, payload) or (None, None) at end of stream."""
+    head = f.read(5)
+    if len(head) < 5:
+        return None, None
+    n = int.from_bytes(head[1:], "big")
+    payload = f.read(n)
+    return (head[:1], payload) if len(payload) == n else (None, None)
+
+
+def _argos_env():
+    """The ARGOS_* settings the commands see, as sorted NAME=value strings."""
+    return sorted(f"{name}={value}" for name, value in os.environ.items()
+                  if name.startswith("ARGOS_") and name not in DAEMON_ENV)
+
+
+def _daemon_info():
+    """(port, token) from DAEMON_FILE ("port token pid"), or None."""
+    try:
+        with open(DAEMON_FILE, encoding="utf-8") as f:
+            port, token, _ = f.read().split()
+        return int(port), token
+    except (OSError, ValueError):
+        return None
+
+
+def call_daemon(op, argv=(), cwd=""):
+    """
+    Send one request to the daemon and copy its output here. Returns the exit
+    status, or None when no daemon took it (none running, or a stale file).
+    """
+    info = _daemon_info()
+    if info is None:
+        return None
+    port, token = info
+    try:
+        sock = socket.create_connection(("127.0.0.1", port), timeout=CONNECT_TIMEOUT)
+    except OSError:
+        return None
+    with sock:
+        sock.settimeout(None)  # commands may run for minutes
+        sock.sendall(_frame(b"q", "\0".join([token, op, cwd, *argv]).encode("utf-8"))
+                     + _frame(b"v", "\0".join(_argos_env()).encode("utf-8")))
+        with sock.makefile("rb") as f:
+            while True:
+                kind, payload = _read_frame(f)
+                if kind == b"o":
+                    sys.stdout.write(payload.decode("utf-8"))
+                elif kind == b"e":
+                    sys.stderr.write(payload.decode("utf-8"))
+                elif kind == b"x":
+                    sys.stdout.flush()
+                    return int(payload)
+                elif kind == b"r":  # busy, another daemon's token or other settings: nothing was run
+                    return None
+                else:
+                    break
+    print("❌ lost the connection to the daemon", file=sys.stderr)
+    return 1
+
+
+# ---------------------------------------
+# DAEMON
+# ---------------------------------------
+def serve(warm=True):
+    """Take commands on a loopback port until `daemon --stop` (or Ctrl+C)."""
+    import hmac
+    import io
+    import secrets
+    import socketserver
+    import threading
+    import time
+    import traceback
+    from contextlib import redirect_stderr, redirect_stdout
+
+    token = secrets.token_hex(16)
+    env = _argos_env()  # what the modules it imports are configured with
+    started = time.time()
+    served = [0]
+    busy = threading.Lock()  # redirected stdout and the working directory are process-wide
+    os.environ["ARGOS_DAEMON"] = "0"  # e.g. `bench startup` spawning argos.py must not wait for us
+
+    class Frames(io.TextIOBase):
+        """A text stream whose writes go to the client as frames of one kind."""
+
+        def __init__(self, wfile, kind):
+            self._wfile, self._kind = wfile, kind
+
+        def writable(self):
+            return True
+
+        def write(self, text):
+            if text:
+                self._wfile.write(_frame(self._kind, text.encode("utf-8")))
+                self._wfile.flush()
+            return len(text)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            kind, payload = _read_frame(self.rfile)
+            try:
+                client_token, op, cwd, *argv = payload.decode("utf-8").split("\0")
+            except (AttributeError, ValueError):  # not a request frame
+                return
+            if kind != b"q" or not hmac.compare_digest(client_token.encode("utf-8"), token.encode("ascii")):
+                self.wfile.write(_frame(b"r", b""))
+                return
+            if op == "stop":
+                self.wfile.write(_frame(b"o", "✅ daemon stopped\n".encode("utf-8")))
+                threading.Thread(target=server.shutdown).start()
+                code = 0
+            elif op == "status":
+                self.wfile.write(_frame(b"o", f"✅ daemon pid {os.getpid()}, up {time.time() - started:.0f}s, "
+                                              f"{served[0]} command(s) served\n".encode("utf-8")))
+                code = 0
+            else:
+                kind, payload = _read_frame(self.rfile)
+                if kind != b"v" or sorted(filter(None, payload.decode("utf-8").split("\0"))) != env:
+                    self.wfile.write(_frame(b"r", b""))  # configured differently: the client runs it itself
+                    return
+                if not busy.acquire(blocking=False):
+                    self.wfile.write(_frame(b"r", b""))  # the client runs the command itself
+                    return
+                try:
+                    code = self.run_command(argv, cwd)
+                finally:
+                    busy.release()
+            self.wfile.write(_frame(b"x", str(code).encode("ascii")))
+
+        def run_command(self, argv, cwd):
+            out, err = Frames(self.wfile, b"o"), Frames(self.wfile, b"e")
+            home = os.getcwd()
+            try:
+                os.chdir(cwd or home)
+                with redirect_stdout(out), redirect_stderr(err):
+                    return run(argv)
+            except Exception:  # a failing command must not take the daemon down
+                traceback.print_exc(file=err)
+                return 1
+            finally:
+                os.chdir(home)
+                served[0] += 1
+
+    if warm:
+        start = time.perf_counter()
+        for name in WARM_MODULES:
+            importlib.import_module(name)
+        import render_service
+        import rules_config
+        rules_config.current()
+        render_service.get_service()  # PlantUML processes start on the first render, then stay
+        print(f"⏱️ warmed up in {time.perf_counter() - start:.2f}s")
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    fd = os.open(DAEMON_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(f"{server.server_address[1]} {token} {os.getpid()}\n")
+    print(f"🚀 argos daemon on 127.0.0.1:{server.server_address[1]} (pid {os.getpid()}) -> {DAEMON_FILE}",
+          flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if _daemon_info() == (server.server_address[1], token):
+            os.remove(DAEMON_FILE)
+
+
+def _daemon_command(argv):
+    flags = set(argv)
+    unknown = flags - {"--status", "--stop", "--no-warm"}
+    if unknown:
+        print(f"❌ unknown option(s) {', '.join(sorted(unknown))}\n\n{usage()}", file=sys.stderr)
+        return 2
+    if "--status" in flags or "--stop" in flags:
+        code = call_daemon("stop" if "--stop" in flags else "status")
+        if code is None:
+            print("⚠️ no daemon running")
+            return 1
+        return code
+    if call_daemon("status") is not None:
+        print("⚠️ a daemon is running already (argos.py daemon --stop first)")
+        return 1
+    serve(warm="--no-warm" not in flags)
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    local = os.environ.get("ARGOS_DAEMON", "1") == "0"
+    if argv[:1] == ["--local"]:
+        local, argv = True, argv[1:]
+    if argv[:1] == ["daemon"]:
+        return _daemon_command(argv[1:])
+    if not local and argv[:1] and argv[0] in COMMANDS:
+        code = call_daemon("run", argv, os.getcwd())
+        if code is not None:
+            return code
+    return run(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
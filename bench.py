@@ -0,0 +1,663 @@
+# bench.py
+# Small benchmarks for the hot paths. Everything runs against a throw-away
+# SQLite database, so no SQL Server is needed.
+# Usage:
+#   (venv) > python bench.py submit --posts 2000 --threads 8
+#   (venv) > python bench.py categorize --rows 1000000
+#   (venv) > python bench.py store --rows 1000000
+#   (venv) > python bench.py startup                      # import times; argos.py daemon round trip
+#   (venv) > python bench.py load --servers dev,waitress --posts 2000 --threads 32
+#   (venv) > python bench.py login --costs 10000,100000,600000 --posts 500
+#   (venv) > python bench.py suite --sizes 10,1000,100000 --repeat 3
+#   (venv) > python bench.py suite --sizes 1000000 --cases clean_text,categorize --baseline 1a2b3c4
+#
+# `suite` times the requirement-processing hot paths on a synthetic corpus
+# and appends the results (tagged with the git commit) to bench_history.json;
+# each run is compared with the previous one (or --baseline) and slowdowns
+# over --threshold are flagged.
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+import class_diagram
+import credentials
+import db
+import extractor
+import ingest
+import uml_generator
+import uml_pipeline
+from requirement_store import RequirementStore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_default_form():
+    """Build a form post from requirements.txt (the near-default answers clients send)."""
+    form = {}
+    with open(os.path.join(HERE, "requirements.txt"), encoding="utf-8") as f:
+        for line in f:
+            m = re.match(r"^(\w+_\d+)\s+—\s+(.+)$", line.strip())
+            if m:
+                form[m.group(1)] = m.group(2)
+    form["functional_4"] = "email"  # radio button on the real form
+    return form
+
+
+def _legacy_submit(responses):
+    """The old /submit body: MAX(SubmissionID) + 1 and one INSERT per field."""
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT ISNULL(MAX(SubmissionID), 0) + 1 FROM dbo.Requirements")
+        new_id = cursor.fetchone()[0]
+        for rtype, sentence in ingest.form_to_requirements(responses):
+            cursor.execute(ingest.INSERT_REQUIREMENT, (rtype, sentence, "Medium", "Client", new_id))
+    return new_id
+
+
+def _replay(submit_fn, form, posts, threads):
+    per_thread = [posts // threads + (1 if i < posts % threads else 0) for i in range(threads)]
+
+    def worker(n):
+        for _ in range(n):
+            submit_fn(form)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in per_thread]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT SubmissionID FROM dbo.Requirements")
+        ids = Counter(r[0] for r in cursor.fetchall())
+    rows = sum(ids.values())
+    per_post = len(ingest.form_to_requirements(form))
+    collided = sum(1 for c in ids.values() if c > per_post)
+    return {"posts": posts, "rows": rows, "seconds": elapsed,
+            "rows_per_sec": rows / elapsed if elapsed else 0.0,
+            "colliding_ids": collided}
+
+
+@contextmanager
+def _scratch_dir(prefix):
+    """
+    A temp directory for throw-away databases. The shared pool (and KDF cost)
+    the benchmark db.configure()s over is put back afterwards: inside the
+    argos.py daemon it is the pool every later command uses.
+    """
+    tmp = tempfile.mkdtemp(prefix=prefix)
+    saved_pool, saved_cost = db.get_pool(), credentials.KDF_ITERATIONS
+    try:
+        yield tmp
+    finally:
+        scratch = db.use_pool(saved_pool)
+        if scratch is not saved_pool:
+            scratch.close_all()
+        credentials.KDF_ITERATIONS = saved_cost
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_submit(args):
+    form = load_default_form()
+    with _scratch_dir("argos_bench_") as tmp:
+        results = {}
+        for label, fn in (("before", _legacy_submit), ("after", ingest.ingest_form)):
+            db.configure("sqlite", path=os.path.join(tmp, f"{label}.db"), max_size=args.threads)
+            results[label] = _replay(fn, form, args.posts, args.threads)
+            r = results[label]
+            print(f"{label:>6}: {r['posts']} posts, {r['rows']} rows in {r['seconds']:.2f}s "
+                  f"-> {r['rows_per_sec']:.0f} rows/s, {r['colliding_ids']} colliding SubmissionIDs")
+        speedup = results["after"]["rows_per_sec"] / max(results["before"]["rows_per_sec"], 1e-9)
+        print(f"speedup: {speedup:.2f}x")
+        return results
+
+
+def synthetic_descriptions(n, seed=0):
+    """n requirement sentences built the way /submit builds them from requirements.txt answers."""
+    rnd = random.Random(seed)
+    base = [d for _, d in ingest.form_to_requirements(load_default_form())]
+    fillers = ["notify donors", "within 2 seconds", "never store card numbers", "for every campaign",
+               "with weekly reports", "using email", "at any time", "for admins"]
+    return [f"{rnd.choice(base)} {rnd.choice(fillers)}" for _ in range(n)]
+
+
+def bench_categorize(args):
+    results = {}
+    for corpus in ("repetitive", "unique"):
+        descs = synthetic_descriptions(args.rows)
+        if corpus == "unique":
+            descs = [f"{d} (#{i})" for i, d in enumerate(descs)]
+        print(f"{corpus} corpus:")
+        results[corpus] = _bench_categorize_corpus(args, descs)
+    return results
+
+
+def _bench_categorize_corpus(args, descs):
+    results = {}
+
+    start = time.perf_counter()
+    labels = [extractor.categorize_requirement(d) for d in descs]
+    results["per_row"] = time.perf_counter() - start
+    per_row_bytes = sys.getsizeof(labels)
+
+    for label, word in (("batch", False), ("batch_word_boundary", True)):
+        start = time.perf_counter()
+        codes = extractor.categorize_codes(descs, word_boundary=word)
+        results[label] = time.perf_counter() - start
+        if not word:
+            assert [extractor.CATEGORIES[c] for c in codes] == labels
+    batch_bytes = sys.getsizeof(codes)
+
+    for label, secs in results.items():
+        print(f"{label:>22}: {args.rows} rows in {secs:.2f}s -> {args.rows / secs / 1e6:.2f} M rows/s")
+    print(f"{'result size':>22}: list of str {per_row_bytes / 1e6:.1f} MB vs code array {batch_bytes / 1e6:.1f} MB")
+    return results
+
+
+# ---------- memory: list of rows vs RequirementStore ----------
+
+def _traced(build):
+    """(result, bytes still allocated by build())"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def bench_store(args):
+    """Bytes per million requirements and batch timings, rows as fetched vs RequirementStore."""
+    rnd = random.Random(args.seed)
+    corpus = synthetic_corpus(args.rows, args.seed)
+    encoded = [(rtype, desc.encode("utf-8")) for rtype, desc in corpus]
+    priorities, holders = ("High", "Medium", "Low"), ("Admin", "User", "Manager", "Customer")
+    extra = [(rnd.choice(priorities), rnd.choice(holders)) for _ in corpus]
+
+    def fetched_rows():
+        # one tuple and fresh str objects per row, as a driver hands them back
+        return [(i + 1, rtype.encode().decode(), desc.decode("utf-8"), p.encode().decode(), s.encode().decode())
+                for i, ((rtype, desc), (p, s)) in enumerate(zip(encoded, extra))]
+
+    rows, rows_bytes = _traced(fetched_rows)
+    start = time.perf_counter()
+    store, store_bytes = _traced(lambda: RequirementStore.from_rows(rows))
+    build_secs = time.perf_counter() - start
+    scale = 1e6 / args.rows
+    print(f"{args.rows} requirements (avg description {sum(len(d) for _, d in encoded) / args.rows:.0f} bytes):")
+    print(f"{'list of rows':>22}: {rows_bytes / 1e6:8.1f} MB -> {rows_bytes * scale / 2**20:7.1f} MiB per 1M")
+    print(f"{'RequirementStore':>22}: {store_bytes / 1e6:8.1f} MB -> {store_bytes * scale / 2**20:7.1f} MiB per 1M"
+          f" (columns {store.nbytes() * scale / 2**20:.1f} MiB, built in {build_secs:.2f}s)")
+    results = {"rows_bytes_per_1m": rows_bytes * scale, "store_bytes_per_1m": store_bytes * scale,
+               "build_seconds": build_secs}
+
+    pairs = [(r[1], r[2]) for r in rows]
+    cases = (
+        ("categorize_batch", lambda: extractor.categorize_batch(rows), lambda: extractor.categorize_batch(store)),
+        ("generate_class_diagram", lambda: class_diagram.generate_class_diagram(pairs),
+         lambda: class_diagram.generate_class_diagram(store)),
+    )
+    for label, on_rows, on_store in cases:
+        for source, fn in (("rows", on_rows), ("store", on_store)):
+            _clear_caches()
+            start = time.perf_counter()
+            fn()
+            secs = results[f"{label}_{source}"] = time.perf_counter() - start
+            print(f"{label + ' ' + source:>32}: {secs:.2f}s")
+    return results
+
+
+# ---------- HTTP load test (/submit and /templaterequirements) ----------
+
+LOAD_SERVERS = {
+    # what `python app.py` used to run (werkzeug dev server), without the reloader
+    "dev": [sys.executable, "-c", "import sys, app; app.app.run(port=int(sys.argv[1]), debug=False, use_reloader=False)"],
+    "waitress": [sys.executable, "server.py", "--server", "waitress", "--port"],
+    "gunicorn": [sys.executable, "server.py", "--server", "gunicorn", "--workers", "4", "--threads", "8", "--port"],
+}
+
+
+class _Client:
+    """One browser: keep-alive connection + session cookie."""
+
+    def __init__(self, port):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        self.cookie = None
+
+    def request(self, method, path, form=None):
+        headers = {"Cookie": self.cookie} if self.cookie else {}
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            resp = self.conn.getresponse()
+        except ConnectionError:
+            # the server dropped the idle keep-alive connection (gunicorn gthread
+            # after 2 s, e.g. while the other clients log in): reconnect, as a browser would
+            self.conn.close()
+            self.conn.request(method, path, body=body, headers=headers)
+            resp = self.conn.getresponse()
+        resp.read()
+        set_cookie = resp.getheader("Set-Cookie")
+        if set_cookie:
+            self.cookie = set_cookie.split(";", 1)[0]
+        return resp
+
+
+def _wait_for_port(port, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def _load_phase(clients, make_request, total):
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker(client):
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            make_request(client, i)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(c,)) for c in clients]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {"requests": total, "req_per_sec": total / elapsed,
+            "p50_ms": latencies[len(latencies) // 2] * 1000,
+            "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000}
+
+
+def bench_load(args):
+    form = load_default_form()
+    tmp = tempfile.mkdtemp(prefix="argos_load_")
+    results = {}
+    try:
+        for n, label in enumerate(args.servers.split(",")):
+            port = args.port + n
+            env = dict(os.environ, ARGOS_DB_BACKEND="sqlite", ARGOS_SQLITE_PATH=os.path.join(tmp, f"{label}.db"))
+            proc = subprocess.Popen(LOAD_SERVERS[label] + [str(port)], cwd=HERE, env=env,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                _wait_for_port(port)
+                clients = [_Client(port) for _ in range(args.threads)]
+                for i, c in enumerate(clients):
+                    c.request("POST", "/register", {"email": f"load{i}@example.com", "password": "pw"})
+                    c.request("POST", "/login", {"email": f"load{i}@example.com", "password": "pw"})
+                sids = []
+
+                def submit(client, i):
+                    resp = client.request("POST", "/submit", form)
+                    sids.append(resp.getheader("Location").rsplit("=", 1)[-1])
+
+                def page(client, i):
+                    client.request("GET", f"/templaterequirements?sid={sids[i % len(sids)]}")
+
+                results[label] = {"submit": _load_phase(clients, submit, args.posts),
+                                  "templaterequirements": _load_phase(clients, page, args.posts)}
+            finally:
+                proc.terminate()
+                proc.wait()
+            for route, r in results[label].items():
+                print(f"{label:>9} /{route:<21} {r['req_per_sec']:8.0f} req/s   "
+                      f"p50 {r['p50_ms']:6.1f} ms   p95 {r['p95_ms']:6.1f} ms")
+        return results
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# ---------- login throughput at several KDF costs ----------
+
+def bench_login(args):
+    results = {}
+    with _scratch_dir("argos_login_") as tmp:
+        for cost in (int(c) for c in args.costs.split(",")):
+            db.configure("sqlite", path=os.path.join(tmp, f"login_{cost}.db"), max_size=args.threads)
+            credentials.KDF_ITERATIONS = cost
+            users = [f"user{i}@example.com" for i in range(args.threads)]
+            for email in users:
+                credentials.register_user(email, "correct horse")
+            # 1 in 5 attempts is for an unknown account (served by the negative cache)
+            attempts = [(users[i % len(users)] if i % 5 else f"nobody{i % 50}@example.com")
+                        for i in range(args.posts)]
+            clients = list(range(args.threads))
+            r = _load_phase(clients, lambda _, i: credentials.authenticate(attempts[i], "correct horse"),
+                            len(attempts))
+            results[cost] = r
+            print(f"{cost:>9} iterations: {r['req_per_sec']:8.0f} logins/s   "
+                  f"p50 {r['p50_ms']:7.1f} ms   p95 {r['p95_ms']:7.1f} ms")
+        return results
+
+
+# ---------- CLI startup: imports and the argos.py daemon ----------
+
+STARTUP_MODULES = ("argos", "class_diagram", "uml_generator", "extractor", "render_service")
+
+
+def bench_startup(args):
+    """Wall time of fresh interpreters: bare, per-module import, argos.py commands local vs via the daemon."""
+    import argos
+
+    def wall(cmd):
+        best = float("inf")
+        for _ in range(max(args.repeat, 5)):
+            start = time.perf_counter()
+            subprocess.run(cmd, cwd=HERE, check=True, capture_output=True)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    results = {"bare": wall([sys.executable, "-c", "pass"])}
+    print(f"{'python -c pass':>36}: {results['bare'] * 1000:7.1f} ms")
+    for name in STARTUP_MODULES:
+        secs = results[f"import_{name}"] = wall([sys.executable, "-c", f"import {name}"])
+        print(f"{'import ' + name:>36}: {secs * 1000:7.1f} ms (+{(secs - results['bare']) * 1000:.1f})")
+    daemon = (os.environ.get("ARGOS_DAEMON", "1") != "0" and argos._daemon_info() is not None
+              and subprocess.run([sys.executable, "argos.py", "daemon", "--status"], cwd=HERE,
+                                 capture_output=True).returncode == 0)
+    for command in ("generate", "render"):
+        secs = results[f"{command}_local"] = wall([sys.executable, "argos.py", "--local", command, "--help"])
+        print(f"{'argos.py --local ' + command + ' --help':>36}: {secs * 1000:7.1f} ms")
+        if daemon:
+            secs = results[f"{command}_daemon"] = wall([sys.executable, "argos.py", command, "--help"])
+            print(f"{'argos.py ' + command + ' --help (daemon)':>36}: {secs * 1000:7.1f} ms")
+    if not daemon:
+        print("(start `python argos.py daemon` and run this outside it to time the daemon round trip too)")
+    return results
+
+
+# ---------- hot-path suite with a JSON history ----------
+
+def _read_choices(line):
+    m = re.search(r"\(([^)]*/[^)]*)\)", line)
+    return [c.strip() for c in m.group(1).split("/")] if m else []
+
+
+def corpus_templates():
+    """
+    (Type, sentence) templates from sample_reqs.txt and the default form
+    answers, plus the stakeholder roles listed in form_fields.txt.
+    """
+    templates, rtype = [], None
+    with open(os.path.join(HERE, "sample_reqs.txt"), encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.endswith("Requirements:"):
+                rtype = line[:-len(" Requirements:")]
+            elif rtype and re.match(r"^\d+\.\s", line):
+                templates.append((rtype, re.sub(r"^\d+\.\s*", "", line)))
+    templates += ingest.form_to_requirements(load_default_form())
+
+    roles = []
+    with open(os.path.join(HERE, "form_fields.txt"), encoding="utf-8") as f:
+        for line in f:
+            if "Stakeholder" in line:
+                roles = _read_choices(line)
+    return templates, roles or ["User", "Admin", "Manager"]
+
+
+_ROLE_RE = re.compile(r"\b(User|Admin|Manager|Customer)s?\b")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def synthetic_corpus(n, seed=0):
+    """
+    n (Type, Description) rows: template sentences with the stakeholder role,
+    the numbers and a scope varied, so most rows repeat (as real submissions
+    do) and the rest are new. Same n + seed -> same corpus.
+    """
+    rnd = random.Random(seed)
+    templates, roles = corpus_templates()
+    scopes = ("campaign", "donor", "report", "region", "branch")
+    rows = []
+    for _ in range(n):
+        rtype, text = rnd.choice(templates)
+        if rnd.random() < 0.5:
+            text = _ROLE_RE.sub(rnd.choice(roles), text)
+        if rnd.random() < 0.3:
+            text = _NUMBER_RE.sub(lambda m: str(rnd.randint(1, 9999)), text)
+        if rnd.random() < 0.2:
+            text = f"{text.rstrip('.')} for {rnd.choice(scopes)} {rnd.randint(1, n)}"
+        rows.append((rtype, text))
+    return rows
+
+
+def _submissions(corpus, size=20):
+    for i in range(0, len(corpus), size):
+        yield corpus[i:i + size]
+
+
+def _per_row(fn):
+    """Suite case calling fn(description) for every row."""
+    @contextmanager
+    def case(corpus, args):
+        descs = [d for _, d in corpus]
+
+        def run():
+            for d in descs:
+                fn(d)
+            return len(descs)
+        yield run
+    return case
+
+
+@contextmanager
+def _case_class_diagram(corpus, args):
+    def run():
+        for rows in _submissions(corpus):
+            class_diagram.generate_class_diagram(rows)
+        return len(corpus)
+    yield run
+
+
+@contextmanager
+def _case_uml(corpus, args):
+    batches = [[d for rtype, d in rows if rtype == "Functional"] for rows in _submissions(corpus)]
+
+    def run():
+        for descs in batches:
+            uml_generator.generate_uml(descs)
+        return len(corpus)
+    yield run
+
+
+@contextmanager
+def _case_roundtrip(corpus, args):
+    """/submit -> /templaterequirements through the Flask test client on SQLite; one post per 20 rows."""
+    import app
+
+    form = load_default_form()
+    posts = min(max(len(corpus) // 20, 1), args.posts)
+    with _scratch_dir("argos_suite_") as tmp:
+        db.configure("sqlite", path=os.path.join(tmp, "roundtrip.db"))
+        client = app.app.test_client()
+        client.post("/register", data={"email": "bench@example.com", "password": "pw"})
+        client.post("/login", data={"email": "bench@example.com", "password": "pw"})
+
+        def run():
+            for _ in range(posts):
+                location = client.post("/submit", data=form).headers["Location"]
+                if client.get(location).status_code != 200:
+                    raise RuntimeError(f"GET {location} failed")
+            return posts
+        yield run
+
+
+# name -> context manager (corpus, args) yielding run() -> items processed;
+# setup and cleanup stay outside the timed part
+SUITE_CASES = {
+    "clean_text": _per_row(class_diagram.clean_text),
+    "statement_to_method": _per_row(class_diagram.statement_to_method),
+    "statement_to_attribute": _per_row(class_diagram.statement_to_attribute),
+    "categorize": _per_row(extractor.categorize_requirement),
+    "generate_class_diagram": _case_class_diagram,
+    "generate_uml": _case_uml,
+    "roundtrip": _case_roundtrip,
+}
+
+SUITE_MIN_SECONDS = 0.2  # tiny corpora are repeated (cold each time) until this much was measured
+
+
+def _clear_caches():
+    # every repeat starts cold, so results don't depend on what ran before
+    for fn in (uml_pipeline.normalize_one, uml_pipeline.tokenize_one, uml_pipeline._apply,
+               class_diagram._classify_requirement, class_diagram.current_rules().classify, uml_generator.RULES.classify):
+        fn.cache_clear()
+
+
+def _git_commit():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=HERE,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return rev + ("+dirty" if dirty else "")
+
+
+def _load_history(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def _save_history(path, history):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=1)
+    os.replace(tmp, path)
+
+
+def _find_baseline(history, rev):
+    for run in reversed(history):
+        if rev is None or run["commit"].startswith(rev):
+            return run
+    return None
+
+
+def bench_suite(args):
+    cases = args.cases.split(",") if args.cases else list(SUITE_CASES)
+    unknown = set(cases) - set(SUITE_CASES)
+    if unknown:
+        raise SystemExit(f"unknown case(s): {', '.join(sorted(unknown))} (have {', '.join(SUITE_CASES)})")
+    sizes = [int(n) for n in args.sizes.split(",")]
+
+    history = _load_history(args.history)
+    baseline = _find_baseline(history, args.baseline)
+    if args.baseline and baseline is None:
+        print(f"⚠️ no run for commit {args.baseline} in {args.history}")
+
+    results = {}
+    print(f"{'case':<24} {'size':>9} {'seconds':>9} {'items/s':>12} {'vs ' + (baseline or {}).get('commit', '-'):>16}")
+    for case in cases:
+        results[case] = {}
+        for n in sizes:
+            corpus = synthetic_corpus(n, seed=args.seed)
+            best, spent, runs = None, 0.0, 0
+            with SUITE_CASES[case](corpus, args) as run_case:
+                while runs < args.repeat or (spent < SUITE_MIN_SECONDS and runs < 1000):
+                    _clear_caches()
+                    start = time.perf_counter()
+                    items = run_case()
+                    secs = time.perf_counter() - start
+                    best = secs if best is None else min(best, secs)
+                    spent += secs
+                    runs += 1
+            r = results[case][str(n)] = {"items": items, "seconds": best, "per_sec": items / best if best else 0.0}
+
+            delta = ""
+            old = (baseline or {}).get("results", {}).get(case, {}).get(str(n))
+            if old and old["per_sec"]:
+                change = r["per_sec"] / old["per_sec"] - 1
+                delta = f"{change:+.1%}" + (" ⚠️" if change < -args.threshold else "")
+            print(f"{case:<24} {n:>9} {best:>9.4f} {r['per_sec']:>12,.0f} {delta:>16}")
+
+    run = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    history.append(run)
+    _save_history(args.history, history)
+    print(f"✅ appended run {run['commit']} to {args.history} ({len(history)} runs)")
+    return run
+
+
+BENCHMARKS = {
+    "submit": bench_submit,
+    "categorize": bench_categorize,
+    "load": bench_load,
+    "login": bench_login,
+    "store": bench_store,
+    "startup": bench_startup,
+    "suite": bench_suite,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ARGOS benchmarks")
+    parser.add_argument("name", choices=sorted(BENCHMARKS))
+    parser.add_argument("--posts", type=int, default=2000, help="form posts to replay")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent posters")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="synthetic descriptions (categorize, store)")
+    parser.add_argument("--servers", default="dev,waitress", help="load: comma list of " + ",".join(LOAD_SERVERS))
+    parser.add_argument("--port", type=int, default=8500, help="load: first port to use")
+    parser.add_argument("--costs", default="10000,100000,200000,600000", help="login: KDF iterations to try")
+    parser.add_argument("--sizes", default="10,1000,100000", help="suite: corpus sizes (statements)")
+    parser.add_argument("--cases", default=None, help="suite: comma list of " + ",".join(SUITE_CASES))
+    parser.add_argument("--repeat", type=int, default=3, help="suite: best of at least N runs (caches cleared each time)")
+    parser.add_argument("--seed", type=int, default=0, help="suite/store: corpus seed")
+    parser.add_argument("--history", default=os.path.join(HERE, "bench_history.json"), help="suite: JSON history file")
+    parser.add_argument("--baseline", default=None, help="suite: compare with this commit (default: previous run)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="suite: flag slowdowns above this fraction")
+    args = parser.parse_args(argv)
+    return BENCHMARKS[args.name](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# bulk_io.py
+# Bulk import / export of requirement corpora, without the web form.
+# Usage:
+#   (venv) > python bulk_io.py import reqs.jsonl more_reqs.csv --chunk-rows 5000
+#   (venv) > python bulk_io.py export corpus.argosreq
+#   (venv) > python class_diagram.py --all --from-file corpus.argosreq     # no database needed
+#
+# import: JSONL or CSV files (the columns extractor.py writes: Type, Description,
+# Priority, Stakeholder, optionally SubmissionID; Id / Category are ignored)
+# are read through mmap and inserted in chunks of --chunk-rows, one
+# fast_executemany and one transaction per chunk. Each distinct SubmissionID in
+# a file gets a fresh one from the SubmissionIds table (rows without one form a
+# single new submission), so imported IDs never collide with live ones. The
+# rows go to the shard of --owner (shards.py; no owner is a shard of its own).
+#
+# export: dbo.Requirements of every shard, ordered by SubmissionID, into the
+# columnar file format of requirement_store.py; RequirementStore.load()
+# memory-maps it.
+
+import argparse
+import csv
+import json
+import mmap
+import os
+import time
+
+import ingest
+import metrics
+import shards
+from requirement_store import RequirementStore
+
+SELECT_EXPORT = ("SELECT Id, Type, Description, Priority, Stakeholder, SubmissionID "
+                 "FROM dbo.Requirements ORDER BY SubmissionID, Id")
+
+FORMATS = ("jsonl", "csv")
+
+
+# ---------- reading ----------
+
+def _mapped_lines(path):
+    """Decoded lines (newline kept) of a file, read through mmap instead of buffered reads."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = 3 if mm[:3] == b"\xef\xbb\xbf" else 0  # UTF-8 BOM (Excel CSVs)
+            end = len(mm)
+            while pos < end:
+                nl = mm.find(b"\n", pos)
+                nl = end if nl < 0 else nl + 1
+                yield mm[pos:nl].decode("utf-8")
+                pos = nl
+
+
+def read_jsonl(path):
+    for n, line in enumerate(_mapped_lines(path), 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{n}: {e}") from None
+
+
+def read_csv(path):
+    yield from csv.DictReader(_mapped_lines(path))
+
+
+def read_records(path, fmt=None):
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"{path}: unknown format {fmt!r} (use --format {'/'.join(FORMATS)})")
+    return read_jsonl(path) if fmt == "jsonl" else read_csv(path)
+
+
+# ---------- import ----------
+
+def import_records(records, chunk_rows=5000, priority="Medium", stakeholder="Client", owner=None):
+    """
+    Insert {Type, Description, Priority, Stakeholder, SubmissionID} records in
+    chunks, as submissions of `owner`. Returns (rows inserted, new
+    SubmissionIDs). Submission listeners run for the submissions touched by
+    each chunk once it is committed.
+    """
+    new_ids = {}  # SubmissionID in the file (None = none given) -> new SubmissionID
+    chunk = []
+    total = 0
+    shard = shards.shard_for(owner)
+
+    def flush():
+        touched = set()
+        allocated = []
+        try:
+            with shard.connection() as conn:
+                cursor = conn.cursor()
+                missing = list(dict.fromkeys(source for source, *_ in chunk if source not in new_ids))
+                allocated = shards.new_submission_ids(cursor, owner, shard, len(missing))
+                new_ids.update(zip(missing, allocated))
+                rows = []
+                for source, rtype, desc, prio, holder in chunk:
+                    sid = new_ids[source]
+                    touched.add(sid)
+                    rows.append((rtype, desc, prio, holder, sid))
+                cursor.fast_executemany = True
+                with metrics.timed("argos_db_query_seconds", query="bulk_insert_requirements"):
+                    cursor.executemany(ingest.INSERT_REQUIREMENT, rows)
+                cursor.close()
+        except BaseException:
+            shards.discard_submission_ids(shard, allocated)  # earlier chunks' submissions keep theirs
+            raise
+        metrics.inc("argos_requirements_written_total", len(rows))
+        chunk.clear()
+        for sid in sorted(touched):
+            ingest.notify_saved(sid)
+
+    for rec in records:
+        desc = rec.get("Description")
+        if not desc:
+            continue
+        source = rec.get("SubmissionID")
+        source = str(source) if source not in (None, "") else None
+        chunk.append((source, rec.get("Type") or "General", desc,
+                      rec.get("Priority") or priority, rec.get("Stakeholder") or stakeholder))
+        if len(chunk) >= chunk_rows:
+            total += len(chunk)
+            flush()
+    if chunk:
+        total += len(chunk)
+        flush()
+    metrics.inc("argos_submissions_written_total", len(new_ids))
+    return total, sorted(new_ids.values())
+
+
+def import_file(path, fmt=None, chunk_rows=5000, owner=None):
+    return import_records(read_records(path, fmt), chunk_rows, owner=owner)
+
+
+# ---------- export ----------
+
+def export_store(batch_size=5000):
+    """dbo.Requirements as a RequirementStore, ordered by SubmissionID (all shards merged)."""
+    store = RequirementStore()
+    for rid, rtype, desc, prio, holder, sid in shards.merged_rows(SELECT_EXPORT, column=5, batch_size=batch_size):
+        store.append(rtype, desc, rid, prio, holder, sid)
+    return store
+
+
+def export_file(path, batch_size=5000):
+    store = export_store(batch_size)
+    store.save(path)
+    return len(store)
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import / export of dbo.Requirements")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="insert JSONL / CSV requirement files")
+    imp.add_argument("files", nargs="+")
+    imp.add_argument("--format", choices=FORMATS, default=None, help="default: from the file extension")
+    imp.add_argument("--chunk-rows", type=int, default=5000, help="rows per INSERT batch / transaction")
+    imp.add_argument("--owner", default=None, help="user the submissions belong to (picks their shard)")
+    exp = sub.add_parser("export", help="write dbo.Requirements to a memory-mappable columnar file")
+    exp.add_argument("out")
+    exp.add_argument("--batch-size", type=int, default=5000)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    start = time.perf_counter()
+    if args.command == "import":
+        for path in args.files:
+            rows, sids = import_file(path, args.format, args.chunk_rows, args.owner)
+            print(f"✅ {path}: {rows} requirements in {len(sids)} submission(s)")
+    else:
+        rows = export_file(args.out, args.batch_size)
+        print(f"✅ {rows} requirements written to {args.out} ({os.path.getsize(args.out) / 1e6:.1f} MB)")
+    print(f"⏱️ {time.perf_counter() - start:.2f}s")
@@ -2,79 +2,99 @@
 # Mixed mapping: Functional -> methods, Non-Functional/Domain -> attributes
 # Usage:
 #   (venv) > python class_diagram.py
-#   > plantuml class_diagram.puml
-
-import pyodbc
+#   (venv) > python render_service.py class_diagram.puml     # -> class_diagram.png
+#
+# Rows go through the staged pipeline in uml_pipeline.py (this module holds the
+# class-diagram rules, RULES; their word lists are in mapping_rules.json). For
+# Mermaid / JSON output or per-stage timings:
+#   (venv) > python uml_pipeline.py --format mermaid --timings
+# --dedup 0.8 collapses near-duplicate requirements first (similarity.py).
+#
+# Batch mode (every submission, one .puml each):
+#   (venv) > python class_diagram.py --all --out-dir diagrams --workers 4 --chunk-size 16
+#   (venv) > python class_diagram.py --all --resume-from 1200
+#   (venv) > python class_diagram.py --all --from-file corpus.argosreq   # `bulk_io.py export` file, no DB
+
+import argparse
+import os
 import re
-import traceback
-from datetime import datetime
-
-# --- EDIT these to match your environment ---
-SQL_SERVER = r"DESKTOP-VEIPHS8\SQLEXPRESS"
-DATABASE = "AutoRE_DB"
-DRIVER = "{ODBC Driver 17 for SQL Server}"
-# --------------------------------------------
-
-
-def get_connection():
-    conn_str = (
-        f"DRIVER={DRIVER};"
-        f"SERVER={SQL_SERVER};"
-        f"DATABASE={DATABASE};"
-        "Trusted_Connection=yes;"
-    )
-    return pyodbc.connect(conn_str)
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from functools import lru_cache, partial
+from itertools import groupby, islice
+
+import shards
+import diagram_cache
+import rules_config
+import uml_pipeline
+from requirement_store import RequirementStore
+from uml_pipeline import clean_text  # noqa: F401  (moved to the normalize stage)
+
+# Database settings live in db.py (shared connection pool), shards in shards.py.
+
+# Bump whenever the rule code or the diagram layout change, so cached diagrams
+# from the old rules are not reused (edits of the rules file are covered by its
+# digest in RULES.version).
+GENERATOR_VERSION = "2"
 
 
 def fetch_latest_requirements():
     """Return list of (Type, Description) tuples for the latest SubmissionID."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    last_id = shards.latest_submission_id()
+    if not last_id:
+        return [], None
+    return fetch_submission_requirements(last_id), last_id
 
-    cursor.execute("SELECT MAX(SubmissionID) FROM dbo.Requirements")
-    row = cursor.fetchone()
-    last_id = row[0] if row and row[0] is not None else None
 
-    if not last_id:
+def fetch_submission_requirements(sid):
+    """Return list of (Type, Description) tuples for one SubmissionID."""
+    with shards.submission_connection(sid) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT Type, Description FROM dbo.Requirements WHERE SubmissionID = ?",
+            (sid,)
+        )
+        rows = cursor.fetchall()
         cursor.close()
-        conn.close()
-        return [], None
+    return rows
+
+
+def iter_submissions(resume_from=None, batch_size=1000):
+    """
+    Read dbo.Requirements once, ordered by SubmissionID, and yield
+    (SubmissionID, [(Type, Description), ...]) per submission.
+    Rows are pulled with fetchmany (one cursor per shard, merged by
+    SubmissionID) so the table is never held in memory.
+    """
+    query = "SELECT SubmissionID, Type, Description FROM dbo.Requirements"
+    params = ()
+    if resume_from is not None:
+        query += " WHERE SubmissionID >= ?"
+        params = (resume_from,)
+    query += " ORDER BY SubmissionID, Id"
+
+    rows = shards.merged_rows(query, params, batch_size=batch_size)
+    for sid, group in groupby(rows, key=lambda r: r[0]):
+        if sid is None:
+            continue
+        yield sid, [(r[1], r[2]) for r in group]
 
-    cursor.execute(
-        "SELECT Type, Description FROM dbo.Requirements WHERE SubmissionID = ?",
-        (last_id,)
-    )
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return rows, last_id
-
-
-# --- manual mappings ---
-manual_mappings = {
-    "within 2 seconds": ("responseTime", "sec"),
-    "within 3 seconds": ("responseTime", "sec"),
-    "daily backups": ("backupPolicy", "daily"),
-    "daily backup": ("backupPolicy", "daily"),
-    "99.9% uptime": ("uptime", "99.9%"),
-    "95%": ("successRate", "95%"),
-    "payment methods should be paypal": ("paymentMethods", "PayPal"),
-    "payment methods should be paypal and card": ("paymentMethods", "PayPal+Card"),
-    "data privacy": ("privacy", "required"),
-    "unauthorized access": ("unauthorizedAccess", "disallowed"),
-    "generate reports": ("generateReports", None),
-}
-
-
-def clean_text(txt: str) -> str:
-    if not txt:
-        return ""
-    s = txt.strip().replace("\r", " ").replace("\n", " ")
-    s = re.sub(r"\bthe\s+the\b", "the", s, flags=re.I)
-    s = re.sub(r"\b(system\s+){2,}", "system ", s, flags=re.I)
-    s = re.sub(r"\s+", " ", s).strip()
-    s = re.sub(r"\b(system\s+(shall|must|should)\s+)+", "the system shall ", s, flags=re.I)
-    return s.strip()
+
+# The word lists (manual mappings, verbs, stop words, nouns, action verbs) and
+# the default members per class are data: mapping_rules.json, compiled and
+# hot-reloaded by rules_config.py. Every reload gives a new Ruleset (see
+# current_rules), so memoized results of the old rules are never reused.
+FirstKeyMatcher = rules_config.FirstKeyMatcher
+
+# structural patterns, not word lists: these stay in code
+_RE_LEADING_SHALL = re.compile(r"^(the\s+)?system\s+(shall|must|should)\s+", re.I)
+_RE_NOT_ALNUM = re.compile(r"[^a-z0-9]+")
+_RE_LEADING_DIGITS = re.compile(r"^\d+")
+_RE_WITHIN_SECONDS = re.compile(r"within\s+(\d+(?:\.\d+)?)\s*seconds?")
+_RE_PERCENT = re.compile(r"(\d+(?:\.\d+)?%)\s*(uptime|availability|success|reliability)?")
+_RE_NOUN_VALUE = re.compile(r"(\d+(?:\.\d+)?%?)|daily|weekly|monthly|hourly")
 
 
 def _camel_case(parts):
@@ -83,257 +103,289 @@ def _camel_case(parts):
     return parts[0] + "".join(p.capitalize() for p in parts[1:])
 
 
-def statement_to_method(sentence: str) -> str:
-    s = clean_text(sentence).lower()
-
-    for k in manual_mappings:
-        if k in s:
-            key, val = manual_mappings[k]
-            return f"+{key}()"
+def _method_rule(token, rules):
+    """Method member for a pipeline Token (rules run on token.norm / token.words)."""
+    s = token.norm
+    k = rules.mapping_matcher.first(s)
+    if k is not None:
+        return f"+{rules.manual_mappings[k][0]}()"
 
-    s = re.sub(r"^(the\s+)?system\s+(shall|must|should)\s+", "", s, flags=re.I).strip()
-    s = re.sub(r"[^\w\s]", " ", s)
-    words = s.split()
+    # drop a leading "the system shall"; its words are plain letters, so the
+    # rest of the word list is what splitting the remainder would give
+    words = token.words
+    m = _RE_LEADING_SHALL.match(s)
+    if m:
+        words = words[len(m.group(0).split()):]
     if not words:
         return "+doAction()"
 
-    verbs = [
-        "enable", "allow", "process", "make", "create", "manage", "generate",
-        "view", "track", "notify", "approve", "login", "register", "update",
-        "delete", "add", "remove", "search", "filter", "download",
-        "upload"
-    ]
-
-    verb_idx = None
-    for i, w in enumerate(words):
-        if w in verbs:
-            verb_idx = i
-            verb = w
-            break
-    if verb_idx is None:
-        verb = words[0]
-        verb_idx = 0
-
-    obj = []
-    for w in words[verb_idx+1:verb_idx+4]:
-        if w in ("to","with","by","and","using","within","for","the","a","an","of","should","be"):
-            continue
-        obj.append(w)
+    verb_idx = next((i for i, w in enumerate(words) if w in rules.verbs), 0)
+    verb = words[verb_idx]
 
+    obj = [w for w in words[verb_idx+1:verb_idx+4] if w not in rules.stop_words]
     if not obj:
-        for w in words[verb_idx+1:]:
-            if len(w) > 2:
-                obj.append(w)
-                break
+        obj = [w for w in words[verb_idx+1:] if len(w) > 2][:1]
 
-    parts = [verb] + obj
-    parts = ["".join(re.findall(r"[a-z0-9]+", p)) for p in parts if p]
-    camel = _camel_case(parts)
-    return f"+{camel}()"
+    parts = [_RE_NOT_ALNUM.sub("", p) for p in [verb] + obj]
+    return f"+{_camel_case(parts)}()"
 
 
-def statement_to_attribute(sentence: str) -> str:
-    s = clean_text(sentence).lower()
-
-    for k, (name, val) in manual_mappings.items():
-        if k in s:
-            if val is None:
-                return f"+{name} : String"
-            return f"+{name} : {val}"
+def _attribute_rule(token, rules):
+    """Attribute member for a pipeline Token."""
+    s = token.norm
+    k = rules.mapping_matcher.first(s)
+    if k is not None:
+        name, val = rules.manual_mappings[k]
+        if val is None:
+            return f"+{name} : String"
+        return f"+{name} : {val}"
 
-    m = re.search(r"within\s+(\d+(?:\.\d+)?)\s*seconds?", s)
+    m = _RE_WITHIN_SECONDS.search(s)
     if m:
         return f"+responseTime : {m.group(1)}s"
 
-    m = re.search(r"(\d+(?:\.\d+)?%)\s*(uptime|availability|success|reliability)?", s)
+    m = _RE_PERCENT.search(s)
     if m:
         val = m.group(1)
         key = m.group(2) or "uptime"
         return f"+{key} : {val}"
 
-    if "daily backup" in s or "daily backups" in s:
-        return "+backupPolicy : daily"
-    if "weekly backup" in s or "weekly backups" in s:
+    # ("daily backup" is already a manual mapping)
+    if "weekly backup" in s:
         return "+backupPolicy : weekly"
 
-    nouns = {
-        "privacy": "privacy",
-        "encryption": "encryption",
-        "scalable": "scalability",
-        "scalability": "scalability",
-        "security": "security",
-        "latency": "latency",
-        "timeout": "timeout",
-        "reports": "reports",
-        "notifications": "notifications",
-    }
-
-    for token, key in nouns.items():
-        if token in s:
-            val_match = re.search(r'(\d+(?:\.\d+)?%?)|daily|weekly|monthly|hourly', s)
-            if val_match:
-                return f"+{key} : {val_match.group(0)}"
-            return f"+{key} : String"
-
-    s = re.sub(r"[^\w\s]", " ", s)
-    parts = s.split()
+    noun = rules.noun_matcher.first(s)
+    if noun is not None:
+        val_match = _RE_NOUN_VALUE.search(s)
+        if val_match:
+            return f"+{rules.nouns[noun]} : {val_match.group(0)}"
+        return f"+{rules.nouns[noun]} : String"
+
+    parts = token.words
     if not parts:
         return "+property : String"
 
-    key_words = parts[-2:] if len(parts) >= 2 else parts[-1:]
-    key = "".join(re.findall(r"[a-z0-9]+", " ".join(key_words)))
-    key = re.sub(r"^\d+", "", key)
+    key = _RE_NOT_ALNUM.sub("", " ".join(parts[-2:]))
+    key = _RE_LEADING_DIGITS.sub("", key)
     if not key:
         key = "property"
 
     return f"+{key} : String"
 
 
+def _sentence_token(sentence):
+    # the sentence as the pipeline's normalize stage would have left it
+    return uml_pipeline.tokenize_one(uml_pipeline.Statement(False, sentence))
+
+
+def statement_to_method(sentence: str) -> str:
+    return _method_rule(_sentence_token(sentence), rules_config.current())
+
+
+def statement_to_attribute(sentence: str) -> str:
+    return _attribute_rule(_sentence_token(sentence), rules_config.current())
+
+
+def _classify(token, rules, method_rule, attribute_rule):
+    """Pipeline classify stage: ((class name, "attr" | "method", rule),)."""
+    text_l = token.lower
+    is_functional = token.functional
+    if not is_functional and rules.action_verbs.any_in(text_l):
+        is_functional = True
+
+    if "admin" in text_l:
+        cls = "Admin"
+    elif "manager" in text_l or "campaign" in text_l:
+        cls = "CampaignManager"
+    elif "donor" in text_l or "user" in text_l or "client" in text_l:
+        cls = "Donor"
+    else:
+        cls = "System"
+
+    if is_functional:
+        return ((cls, "method", method_rule),)
+    return ((cls, "attr", attribute_rule),)
+
+
+@lru_cache(maxsize=65536)
+def _classify_requirement(ruleset, rtype, desc):
+    token = uml_pipeline.tokenize_one(uml_pipeline.normalize_one(rtype, desc))
+    (cls, kind, rule), = ruleset.classify(token)
+    return cls, kind, rule(token)
+
+
+def classify_requirement(rtype, desc):
+    """
+    Map one requirement row to (class name, "attr" | "method", member).
+    Memoized: batch jobs see the same near-default statements over and over.
+    """
+    return _classify_requirement(current_rules(), rtype, desc)
+
+
 # ---------------------------------------
 # CLASS DIAGRAM GENERATOR
 # ---------------------------------------
-def generate_class_diagram(requirements):
-    uml_lines = ["@startuml", "skinparam classAttributeIconSize 0"]
-    uml_lines.append("class Donor { }")
-    uml_lines.append("class Admin extends Donor { }")
-    uml_lines.append("class CampaignManager extends Donor { }")
-    uml_lines.append("class System { }")
-
-    # containers
-    donor_attrs, donor_methods = set(), set()
-    admin_attrs, admin_methods = set(), set()
-    manager_attrs, manager_methods = set(), set()
-    system_attrs, system_methods = set(), set()
-
-    # AUTO DEFAULT ATTRIBUTES
-    DEFAULT_AUTO_ATTRIBUTES = {
-        "Donor": {
-            "+donorID : int",
-            "+name : String",
-            "+email : String",
-            "+phone : String",
-        },
-        "Admin": {
-            "+adminID : int",
-            "+name : String",
-            "+email : String",
-            "+role : String",
-        },
-        "CampaignManager": {
-            "+managerID : int",
-            "+name : String",
-            "+email : String",
-            "+assignedCampaigns : int",
-        },
-        "System": {
-            "+systemVersion : String",
-            "+lastBackup : String",
-            "+uptime : String",
-        },
-    }
-
-    donor_attrs.update(DEFAULT_AUTO_ATTRIBUTES["Donor"])
-    admin_attrs.update(DEFAULT_AUTO_ATTRIBUTES["Admin"])
-    manager_attrs.update(DEFAULT_AUTO_ATTRIBUTES["CampaignManager"])
-    system_attrs.update(DEFAULT_AUTO_ATTRIBUTES["System"])
-
-    # ---------- AUTO DEFAULT METHODS ----------
-    DEFAULT_AUTO_METHODS = {
-        "Admin": {
-            "+manageUsers()",
-            "+viewLogs()",
-            "+configureSystem()",
-        },
-        "CampaignManager": {
-            "+createCampaign()",
-            "+reviewCampaignReports()",
-            "+assignCampaign()",
-        },
-        "Donor": {
-            "+viewProfile()",
-            "+donate()",
-        },
-        "System": {
-            "+performBackup()",
-            "+generateHealthReport()",
-        }
-    }
-
-    # Add default methods into method sets so they appear even if DB has none
-    admin_methods.update(DEFAULT_AUTO_METHODS.get("Admin", set()))
-    manager_methods.update(DEFAULT_AUTO_METHODS.get("CampaignManager", set()))
-    donor_methods.update(DEFAULT_AUTO_METHODS.get("Donor", set()))
-    system_methods.update(DEFAULT_AUTO_METHODS.get("System", set()))
-    # ------------------------------------------
-
-    # PROCESS REQUIREMENTS
-    for rtype, desc in requirements:
-        if not desc:
-            continue
+CLASSES = (("Donor", None), ("Admin", "Donor"), ("CampaignManager", "Donor"), ("System", None))
+DIAGRAM_CLASSES = tuple(cls for cls, _ in CLASSES)
+# fallback placeholders (still kept if absolutely empty)
+PLACEHOLDERS = {"Admin": "manageSystemSettings()", "CampaignManager": "reviewCampaignReports()"}
+
+
+def _ruleset(rules):
+    """uml_pipeline.Ruleset over one version of the rules file."""
+    method_rule = partial(_method_rule, rules=rules)
+    attribute_rule = partial(_attribute_rule, rules=rules)
+    return uml_pipeline.Ruleset(
+        "class_diagram", f"{GENERATOR_VERSION}+{rules.digest[:12]}",
+        classes=CLASSES,
+        classify=partial(_classify, rules=rules, method_rule=method_rule, attribute_rule=attribute_rule),
+        default_attrs=rules.default_attributes,
+        default_methods=rules.default_methods,
+        placeholders=PLACEHOLDERS,
+    )
 
-        text = clean_text(desc)
-        text_l = text.lower()
 
-        is_functional = (
-            isinstance(rtype, str)
-            and rtype.lower().startswith("functional")
-        )
+_rules_from = rules_config.current()
+RULES = _ruleset(_rules_from)
+_rules_lock = threading.Lock()
 
-        action_verbs = (
-            "allow","enable","create","process","generate",
-            "view","track","notify","approve","login",
-            "register","update","delete","add","remove",
-            "download","upload","manage"
-        )
 
-        if not is_functional:
-            if any(v in text_l for v in action_verbs):
-                is_functional = True
+def current_rules():
+    """The Ruleset for the rules file as it is now (RULES is replaced after a reload)."""
+    global RULES, _rules_from
+    rules = rules_config.current()
+    if rules is _rules_from:
+        return RULES
+    with _rules_lock:
+        if rules is not _rules_from:
+            RULES, _rules_from = _ruleset(rules), rules
+        return RULES
 
-        if is_functional:
-            method = statement_to_method(text)
 
-            if "admin" in text_l:
-                admin_methods.add(method)
-            elif "manager" in text_l or "campaign" in text_l:
-                manager_methods.add(method)
-            elif "donor" in text_l or "user" in text_l or "client" in text_l:
-                donor_methods.add(method)
-            else:
-                system_methods.add(method)
+@rules_config.on_reload
+def _evict(rules):
+    # entries of the old rules can never be hit again (their keys hold the old
+    # Ruleset / rule partials); drop them instead of waiting for LRU eviction
+    _classify_requirement.cache_clear()
+    uml_pipeline._apply.cache_clear()
 
-        else:
-            attr = statement_to_attribute(text)
-
-            if "admin" in text_l:
-                admin_attrs.add(attr)
-            elif "manager" in text_l or "campaign" in text_l:
-                manager_attrs.add(attr)
-            elif "donor" in text_l or "user" in text_l or "client" in text_l:
-                donor_attrs.add(attr)
+
+# shared pipeline; PIPELINE.report() shows where generation time went
+PIPELINE = uml_pipeline.get_pipeline(RULES)
+
+
+def generate_class_diagram(requirements, fmt="plantuml", dedup=None):
+    """
+    requirements: (Type, Description) pairs, e.g. a list of rows or a RequirementStore.
+    dedup: collapse near-duplicate requirements at this similarity (similarity.py) first.
+    """
+    return uml_pipeline.get_pipeline(current_rules(), fmt, dedup).run(requirements)
+
+
+# ---------------------------------------
+# INCREMENTAL MODEL (editing UIs)
+# ---------------------------------------
+class DiagramModel:
+    """
+    Class diagram that is updated one requirement at a time.
+
+    Every member keeps a reference count (how many requirements produce it),
+    so removing a requirement only drops a member when nothing else still
+    needs it; the built-in defaults are never dropped. Removing a requirement
+    that was not added raises KeyError. Members are kept in sorted lists, so
+    no re-sorting is needed on output.
+
+        model = DiagramModel(rows)
+        model.add("Functional", "The system shall allow donors to export receipts")
+        model.drain_changes()   # [("+", "Donor : +allowDonorsExport()")]
+        model.to_plantuml()     # same text generate_class_diagram(rows + [...]) gives
+    """
+
+    def __init__(self, requirements=()):
+        self._rules = current_rules()  # the model keeps the rules it was built with
+        self._refs = {}           # (class, kind, member) -> requirements producing it
+        self._added = Counter()   # (Type, Description) -> times added
+        self._defaults = set()
+        self._members = {(cls, kind): [] for cls in DIAGRAM_CLASSES for kind in ("attr", "method")}
+        self._changes = []
+        for cls in DIAGRAM_CLASSES:
+            for a in self._rules.default_attrs.get(cls, ()):
+                self._defaults.add((cls, "attr", a))
+            for m in self._rules.default_methods.get(cls, ()):
+                self._defaults.add((cls, "method", m))
+        for key in self._defaults:
+            self._show(key)
+        for rtype, desc in requirements:
+            self.add(rtype, desc)
+        self._changes.clear()
+
+    def _show(self, key):
+        cls, kind, member = key
+        insort(self._members[(cls, kind)], member)
+        self._changes.append(("+", f"{cls} : {member}"))
+
+    def _hide(self, key):
+        cls, kind, member = key
+        members = self._members[(cls, kind)]
+        del members[bisect_left(members, member)]
+        self._changes.append(("-", f"{cls} : {member}"))
+
+    def add(self, rtype, desc):
+        if desc:
+            self._added[(rtype, desc)] += 1
+            key = _classify_requirement(self._rules, rtype, desc)
+            count = self._refs[key] = self._refs.get(key, 0) + 1
+            if count == 1 and key not in self._defaults:
+                self._show(key)
+
+    def remove(self, rtype, desc):
+        if desc:
+            if not self._added[(rtype, desc)]:
+                raise KeyError(f"requirement was never added: {(rtype, desc)!r}")
+            self._added[(rtype, desc)] -= 1
+            if not self._added[(rtype, desc)]:
+                del self._added[(rtype, desc)]
+            key = _classify_requirement(self._rules, rtype, desc)
+            count = self._refs[key] - 1
+            if count:
+                self._refs[key] = count
             else:
-                system_attrs.add(attr)
+                del self._refs[key]
+                if key not in self._defaults:
+                    self._hide(key)
+
+    def replace(self, old, new):
+        """An edited field: (Type, Description) old -> new."""
+        self.remove(*old)
+        self.add(*new)
+
+    def drain_changes(self):
+        """PlantUML member lines added ("+") / removed ("-") since the last call."""
+        changes, self._changes = self._changes, []
+        return changes
+
+    def members(self, cls, kind):
+        return list(self._members[(cls, kind)])
 
-    # Append items
-    def append_items(cls, attrs, methods):
-        for a in sorted(attrs):
-            uml_lines.append(f"{cls} : {a}")
-        for m in sorted(methods):
-            uml_lines.append(f"{cls} : {m}")
+    def to_plantuml(self):
+        return self.emit("plantuml")
 
-    append_items("Donor", donor_attrs, donor_methods)
-    append_items("Admin", admin_attrs, admin_methods)
-    append_items("CampaignManager", manager_attrs, manager_methods)
-    append_items("System", system_attrs, system_methods)
+    def emit(self, fmt="plantuml"):
+        """Current diagram through any uml_pipeline emitter (plantuml, mermaid, json)."""
+        attrs = {cls: self._members[(cls, "attr")] for cls in DIAGRAM_CLASSES}
+        methods = {cls: self._members[(cls, "method")] for cls in DIAGRAM_CLASSES}
+        return uml_pipeline.EMITTERS[fmt](self._rules.diagram(attrs, methods))
 
-    # fallback placeholders (still kept if absolutely empty)
-    if not admin_attrs and not admin_methods:
-        uml_lines.append("Admin : manageSystemSettings()")
-    if not manager_attrs and not manager_methods:
-        uml_lines.append("CampaignManager : reviewCampaignReports()")
 
-    uml_lines.append("@enduml")
-    return "\n".join(uml_lines)
+def cached_class_diagram(requirements, cache=None, dedup=None):
+    """generate_class_diagram through the content-addressed cache. Returns (key, text)."""
+    cache = cache or diagram_cache.get_cache()
+    rules = current_rules()  # its version names the rules file, so an edit is a cache miss
+    name = "class_diagram" if dedup is None else f"class_diagram+dedup{dedup:g}"
+    # dedup keeps the first of each near-duplicate group, so row order matters then
+    return cache.puml(name, rules.version, requirements,
+                      lambda reqs: uml_pipeline.get_pipeline(rules, "plantuml", dedup).run(reqs),
+                      ordered=dedup is not None)
 
 
 def save_to_file(content, filename="class_diagram.puml"):
@@ -342,23 +394,128 @@ def save_to_file(content, filename="class_diagram.puml"):
     print(f"✅ UML code saved to {filename}")
 
 
-# MAIN
-if __name__ == "__main__":
+# ---------------------------------------
+# BATCH MODE (all submissions)
+# ---------------------------------------
+def _generate_chunk(chunk, out_dir, use_cache=True, dedup=None):
+    """Worker process: write one .puml per (SubmissionID, rows); return timings."""
+    done = []
+    for sid, rows in chunk:
+        start = time.perf_counter()
+        if use_cache:
+            _, uml_text = cached_class_diagram(rows, dedup=dedup)
+        else:
+            uml_text = generate_class_diagram(rows, dedup=dedup)
+        with open(os.path.join(out_dir, f"class_diagram_{sid}.puml"), "w", encoding="utf-8") as f:
+            f.write(uml_text)
+        done.append((sid, len(rows), time.perf_counter() - start))
+    return done
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def generate_all(out_dir="diagrams", workers=None, chunk_size=16, resume_from=None, verbose=True,
+                 use_cache=True, submissions=None, dedup=None):
+    """
+    Generate a diagram for every submission with a process pool.
+    At most 2 * workers chunks are in flight, so memory stays bounded.
+    `submissions` replaces the database read, e.g. RequirementStore.load(path).submissions().
+    Returns [(SubmissionID, items, seconds), ...].
+    """
+    # imported here: concurrent.futures.process pulls in multiprocessing, which
+    # single-diagram runs (and the web app) never need
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    if submissions is None:
+        submissions = iter_submissions(resume_from)
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    timings = []
+
+    def collect(futures):
+        for fut in futures:
+            for sid, items, secs in fut.result():
+                timings.append((sid, items, secs))
+                if verbose:
+                    print(f"  SubmissionID {sid}: {items} items in {secs * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk in _chunks(submissions, chunk_size):
+            pending.add(pool.submit(_generate_chunk, chunk, out_dir, use_cache, dedup))
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        collect(pending)
+    elapsed = time.perf_counter() - start
+
+    if timings:
+        last = max(sid for sid, _, _ in timings)
+        mean_ms = sum(secs for _, _, secs in timings) / len(timings) * 1000
+        print(f"✅ {len(timings)} diagrams in {elapsed:.2f}s "
+              f"(mean {mean_ms:.1f} ms/submission, last SubmissionID {last}) -> {out_dir}")
+    else:
+        print("⚠️ No submissions found.")
+    return timings
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate PlantUML class diagrams from dbo.Requirements")
+    parser.add_argument("--all", action="store_true", help="batch mode: one diagram per submission")
+    parser.add_argument("--out-dir", default="diagrams", help="batch mode output folder")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=16, help="submissions per worker task")
+    parser.add_argument("--resume-from", type=int, default=None, help="start at this SubmissionID")
+    parser.add_argument("--no-cache", action="store_true", help="always regenerate, skip the diagram cache")
+    parser.add_argument("--dedup", type=float, default=None, help="collapse near-duplicate requirements "
+                                                                      "at this similarity (e.g. 0.8)")
+    parser.add_argument("--from-file", default=None, help="batch mode: read a bulk_io.py export instead of the DB")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from datetime import datetime
+    import traceback
+
+    args = _parse_args(argv)
     print("⏳ UML generator start:", datetime.now().isoformat())
 
     try:
-        rows, sid = fetch_latest_requirements()
-
-        if not rows:
-            print("⚠️ No requirements found for latest submission.")
+        if args.all:
+            submissions = None
+            if args.from_file:
+                submissions = RequirementStore.load(args.from_file).submissions(args.resume_from)
+            generate_all(args.out_dir, args.workers, args.chunk_size, args.resume_from,
+                         use_cache=not args.no_cache, submissions=submissions, dedup=args.dedup)
         else:
-            print(f"📋 Generating UML for SubmissionID = {sid} (items: {len(rows)})")
+            rows, sid = fetch_latest_requirements()
+
+            if not rows:
+                print("⚠️ No requirements found for latest submission.")
+            else:
+                print(f"📋 Generating UML for SubmissionID = {sid} (items: {len(rows)})")
 
-            uml_text = generate_class_diagram(rows)
-            save_to_file(uml_text)
+                if args.no_cache:
+                    uml_text = generate_class_diagram(rows, dedup=args.dedup)
+                else:
+                    _, uml_text = cached_class_diagram(rows, dedup=args.dedup)
+                save_to_file(uml_text)
 
-            print("🎨 Run: plantuml class_diagram.puml")
+                print("🎨 Run: plantuml class_diagram.puml")
 
     except Exception:
         print("❌ Unexpected error:")
         traceback.print_exc()
+
+
+# MAIN
+if __name__ == "__main__":
+    main()
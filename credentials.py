@@ -0,0 +1,203 @@
+# credentials.py
+# Salted password hashing and the login / register checks behind app.py.
+#
+# - passwords are stored as "pbkdf2_sha256$<iterations>$<salt>$<hash>"
+#   (ARGOS_KDF_ITERATIONS sets the cost)
+# - the KDF runs on a small bounded thread pool; hashlib releases the GIL
+#   while it works, so a login never stalls the other request threads, and
+#   at most KDF_WORKERS hashes burn CPU at the same time
+# - a stored hash made with other parameters (or an old plain-text password)
+#   is replaced with a fresh hash on the next successful login
+# - emails that do not exist are remembered briefly, so a flood of attempts
+#   against unknown accounts does not reach the database (per process: with
+#   several worker processes server.py turns this off, ARGOS_LOGIN_NEGATIVE_TTL=0,
+#   since a registration on one worker could not clear it on the others);
+#   their password is still run through the KDF, against a dummy hash, so
+#   the response time does not tell whether an account exists
+
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import db
+import metrics
+
+KDF_ITERATIONS = int(os.environ.get("ARGOS_KDF_ITERATIONS", "200000"))
+KDF_WORKERS = int(os.environ.get("ARGOS_KDF_WORKERS", str(os.cpu_count() or 2)))
+KDF_QUEUE = int(os.environ.get("ARGOS_KDF_QUEUE", str(KDF_WORKERS * 8)))  # waiting + running
+KDF_TIMEOUT = float(os.environ.get("ARGOS_KDF_TIMEOUT", "10"))
+NEGATIVE_TTL = float(os.environ.get("ARGOS_LOGIN_NEGATIVE_TTL", "30"))  # seconds, 0 = off
+NEGATIVE_SIZE = 100_000
+
+ALGORITHM = "pbkdf2_sha256"
+
+
+class CredentialsBusy(Exception):
+    """Too many password hashes queued; the caller should ask the user to retry."""
+
+
+# ---------------------------------------
+# HASHING
+# ---------------------------------------
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def hash_password(password, iterations=None, salt=None):
+    iterations = iterations or KDF_ITERATIONS
+    salt = salt or os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{ALGORITHM}${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(password, stored):
+    """
+    (matches, needs_rehash). Plain-text values from before hashing still verify
+    once; a malformed hash never matches.
+    """
+    if not stored:
+        return False, False
+    parts = stored.split("$")
+    if len(parts) != 4 or parts[0] != ALGORITHM:
+        legacy_ok = hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+        return legacy_ok, legacy_ok
+    _, iterations, salt, expected = parts
+    try:
+        iterations = int(iterations)
+        if iterations < 1:
+            raise ValueError(iterations)
+        salt, expected = _unb64(salt), _unb64(expected)
+    except ValueError:  # binascii.Error is a ValueError too
+        return False, False
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    ok = hmac.compare_digest(digest, expected)
+    return ok, ok and iterations != KDF_ITERATIONS
+
+
+def _dummy_hash():
+    # random salt and digest at the current cost: verifying against it takes as
+    # long as against a real hash and never matches
+    return f"{ALGORITHM}${KDF_ITERATIONS}${_b64(os.urandom(16))}${_b64(os.urandom(32))}"
+
+
+# ---------------------------------------
+# BOUNDED KDF POOL
+# ---------------------------------------
+_pool = ThreadPoolExecutor(max_workers=KDF_WORKERS, thread_name_prefix="kdf")
+_slots = threading.BoundedSemaphore(KDF_QUEUE)
+
+
+def _run_kdf(fn, *args):
+    if not _slots.acquire(timeout=KDF_TIMEOUT):
+        raise CredentialsBusy("password hashing queue is full")
+    try:
+        future = _pool.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    # the slot is held until the hash is done, not until we stop waiting for it,
+    # so abandoned hashes still count against KDF_QUEUE
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=KDF_TIMEOUT)
+    except FutureTimeout:
+        raise CredentialsBusy(f"password hashing took longer than {KDF_TIMEOUT}s") from None
+
+
+# ---------------------------------------
+# NEGATIVE EMAIL CACHE
+# ---------------------------------------
+_unknown = {}  # email -> expires at (insertion order = age)
+_unknown_lock = threading.Lock()
+
+
+def _is_known_unknown(email):
+    if NEGATIVE_TTL <= 0:
+        return False
+    with _unknown_lock:
+        expires = _unknown.get(email)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del _unknown[email]
+            return False
+        return True
+
+
+def _remember_unknown(email):
+    if NEGATIVE_TTL <= 0:
+        return
+    with _unknown_lock:
+        _unknown[email] = time.monotonic() + NEGATIVE_TTL
+        while len(_unknown) > NEGATIVE_SIZE:
+            del _unknown[next(iter(_unknown))]
+
+
+def _forget_unknown(email):
+    with _unknown_lock:
+        _unknown.pop(email, None)
+
+
+# ---------------------------------------
+# LOGIN / REGISTER
+# ---------------------------------------
+def authenticate(email, password):
+    """True if the email/password pair is valid. May raise CredentialsBusy."""
+    row = None
+    if not _is_known_unknown(email):
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            with metrics.timed("argos_db_query_seconds", query="user_lookup"):
+                cursor.execute("SELECT Password FROM Users WHERE Email = ?", (email,))
+                row = cursor.fetchone()
+            cursor.close()
+        if row is None:
+            _remember_unknown(email)
+    if row is None:
+        with metrics.timed("argos_kdf_seconds", op="verify"):
+            _run_kdf(verify_password, password, _dummy_hash())
+        return False
+
+    with metrics.timed("argos_kdf_seconds", op="verify"):
+        ok, needs_rehash = _run_kdf(verify_password, password, row[0])
+    if ok and needs_rehash:
+        try:
+            new_hash = _run_kdf(hash_password, password)
+        except CredentialsBusy:
+            return ok  # keep the old hash; a later login replaces it
+        with db.connection() as conn:
+            conn.cursor().execute("UPDATE Users SET Password = ? WHERE Email = ? AND Password = ?",
+                                  (new_hash, email, row[0]))
+    return ok
+
+
+def register_user(email, password):
+    """Create the account; False if the email is already registered."""
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT Email FROM Users WHERE Email = ?", (email,))
+        exists = cursor.fetchone() is not None
+        cursor.close()
+    if exists:
+        return False
+    with metrics.timed("argos_kdf_seconds", op="hash"):
+        stored = _run_kdf(hash_password, password)
+    try:
+        with db.connection() as conn:
+            conn.cursor().execute("INSERT INTO Users (Email, Password) VALUES (?, ?)", (email, stored))
+    except Exception as e:
+        # same email registered concurrently (sqlite3 / pyodbc IntegrityError)
+        if type(e).__name__ == "IntegrityError":
+            return False
+        raise
+    _forget_unknown(email)
+    return True
@@ -1,15 +1,425 @@
 # AutoRE_Project/db.py
-import pyodbc
+"""
+Shared, pooled database access for the Flask app and the generator scripts.
+
+Usage:
+    with db.connection() as conn:          # checkout, commit/rollback, return to pool
+        conn.cursor().execute(...)
+
+    conn = db.get_connection()             # old style still works;
+    ...                                    # conn.close() returns it to the pool
+    conn.close()
+
+The backend is picked with ARGOS_DB_BACKEND ("sqlserver" or "sqlite").
+SQLite stands in for SQL Server in local and benchmark runs; queries written
+for SQL Server (dbo.<table>, ISNULL) are translated on the fly.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+
+import metrics
+import schema
+
+# --- EDIT these to match your environment (or set the ARGOS_* env vars) ---
+BACKEND = os.environ.get("ARGOS_DB_BACKEND", "sqlserver")
+SQLSERVER_CONN_STR = os.environ.get(
+    "ARGOS_SQLSERVER_DSN",
+    "DRIVER={ODBC Driver 17 for SQL Server};"
+    "SERVER=localhost\\SQLEXPRESS;"  # agar named instance use karte ho to: localhost\SQLEXPRESS
+    "DATABASE=AutoRE_DB;"            # apne actual DB name se replace karo
+    "Trusted_Connection=yes;"
+)
+SQLITE_PATH = os.environ.get("ARGOS_SQLITE_PATH", ":memory:")
+POOL_SIZE = int(os.environ.get("ARGOS_DB_POOL_SIZE", "5"))
+POOL_TIMEOUT = float(os.environ.get("ARGOS_DB_POOL_TIMEOUT", "30"))   # seconds to wait for a free slot
+POOL_MAX_IDLE = float(os.environ.get("ARGOS_DB_POOL_MAX_IDLE", "300"))  # idle connections older than this are closed
+POOL_PING_AFTER = float(os.environ.get("ARGOS_DB_POOL_PING_AFTER", "30"))  # health-check connections idle this long
+# ---------------------------------------------------------------------------
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool timeout."""
+
+
+# ---------------------------------------
+# BACKENDS
+# ---------------------------------------
+class SqlServerBackend:
+    """pyodbc connections to SQL Server (the production setup)."""
+
+    name = "sqlserver"
+    max_connections = None
+
+    def __init__(self, conn_str=None):
+        self.conn_str = conn_str or SQLSERVER_CONN_STR
+        self._bootstrapped = False
+
+    def connect(self):
+        import pyodbc  # imported here so the SQLite stand-in works without the ODBC driver
+        conn = pyodbc.connect(self.conn_str)
+        if not self._bootstrapped:
+            schema.migrate(conn, self.name)
+            self._bootstrapped = True
+        return conn
+
+    def next_submission_id(self, cursor, owner=None, shard=None):
+        cursor.execute("INSERT INTO dbo.SubmissionIds (Owner, Shard) OUTPUT INSERTED.SubmissionID VALUES (?, ?)",
+                       (owner, shard))
+        return cursor.fetchone()[0]
+
+    def limit(self, sql, n, offset=0):
+        if offset:  # needs an ORDER BY in sql
+            return f"{sql} OFFSET {int(offset)} ROWS FETCH NEXT {int(n)} ROWS ONLY"
+        return re.sub(r"^\s*SELECT\s", f"SELECT TOP ({int(n)}) ", sql, count=1, flags=re.I)
+
+    def ping(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+
+_DBO_PREFIX = re.compile(r"\bdbo\.", re.I)
+_ISNULL = re.compile(r"\bISNULL\s*\(", re.I)
+
+
+def _sqlite_sql(sql):
+    """Translate the SQL Server flavoured statements used in this project to SQLite."""
+    return _ISNULL.sub("IFNULL(", _DBO_PREFIX.sub("", sql))
+
+
+class _SqliteCursor(sqlite3.Cursor):
+    def execute(self, sql, params=()):
+        return super().execute(_sqlite_sql(sql), params)
+
+    def executemany(self, sql, seq_of_params):
+        return super().executemany(_sqlite_sql(sql), seq_of_params)
+
+
+class _SqliteConnection(sqlite3.Connection):
+    def cursor(self, factory=_SqliteCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+
+class SqliteBackend:
+    """
+    SQLite stand-in for SQL Server. path=":memory:" gives one shared in-memory
+    database for the whole process (kept alive by a keeper connection).
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path=None):
+        self.path = path or SQLITE_PATH
+        self._keeper = None
+        if self.path == ":memory:":
+            # every pool connection must see the same in-memory database
+            self._uri = f"file:argos_mem_{id(self)}?mode=memory&cache=shared"
+            # shared-cache tables lock per connection, so keep it to one at a time
+            self.max_connections = 1
+            self._keeper = self._open()
+        else:
+            self._uri = None
+            self.max_connections = None
+        conn = self.connect()
+        schema.migrate(conn, self.name)
+        conn.close()
+
+    def _open(self):
+        if self._uri:
+            return sqlite3.connect(self._uri, uri=True, check_same_thread=False,
+                                   factory=_SqliteConnection)
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False,
+                               factory=_SqliteConnection)
+        # switching a fresh file to WAL can fail with "database is locked" without
+        # waiting on the busy timeout when other processes open it at the same time
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                return conn
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or time.monotonic() > deadline:
+                    conn.close()
+                    raise
+                time.sleep(0.01)
+
+    def connect(self):
+        return self._open()
+
+    def next_submission_id(self, cursor, owner=None, shard=None):
+        cursor.execute("INSERT INTO SubmissionIds (Owner, Shard) VALUES (?, ?)", (owner, shard))
+        return cursor.lastrowid
+
+    def limit(self, sql, n, offset=0):
+        return f"{sql} LIMIT {int(n)} OFFSET {int(offset)}"
+
+    def ping(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+
+def make_backend(name=None, **kwargs):
+    name = (name or BACKEND).lower()
+    if name == "sqlite":
+        return SqliteBackend(**kwargs)
+    if name == "sqlserver":
+        return SqlServerBackend(**kwargs)
+    raise ValueError(f"Unknown database backend: {name!r}")
+
+
+# ---------------------------------------
+# POOL
+# ---------------------------------------
+class PooledConnection:
+    """
+    Thin proxy around a driver connection. close() hands it back to the pool
+    instead of closing it; everything else goes to the real connection.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._pid = os.getpid()
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise AttributeError(f"connection already returned to the pool ({name})")
+        return getattr(raw, name)
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None and self._pid == os.getpid():  # checked out before a fork: the parent's
+            self._pool._release(raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self._raw.commit()
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Bounded pool of database connections.
+
+    - at most max_size connections are checked out at once; callers wait up
+      to `timeout` seconds for a free slot, then get PoolTimeout
+    - idle connections are reused newest-first and closed after `max_idle`
+    - a connection idle longer than `ping_after` is health-checked before reuse
+    - uncommitted work is rolled back when a connection comes back
+    - a forked child (ProcessPoolExecutor, multiprocessing, gunicorn) starts
+      with an empty pool: the driver connections inherited from the parent
+      are still the parent's, so they are forgotten, never used or closed
+    """
+
+    def __init__(self, backend, max_size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 max_idle=POOL_MAX_IDLE, ping_after=POOL_PING_AFTER):
+        if backend.max_connections:
+            max_size = min(max_size, backend.max_connections)
+        self.backend = backend
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.ping_after = ping_after
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = deque()  # (raw connection, last returned at); right end = newest
+        self._lock = threading.Lock()
+        self.created = 0
+        self.discarded = 0
+        _pools.add(self)
+
+    def _after_fork(self):
+        # locks may have been held by parent threads that do not exist here
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.discarded = 0
+
+    def acquire(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            metrics.inc("argos_db_checkout_timeouts_total")
+            raise PoolTimeout(f"no database connection free after {self.timeout}s")
+        try:
+            raw = self._take_idle()
+            if raw is None:
+                raw = self.backend.connect()
+                self.created += 1
+        except BaseException:
+            self._slots.release()
+            raise
+        metrics.observe("argos_db_checkout_seconds", time.perf_counter() - start)
+        return PooledConnection(self, raw)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection; commit on success, roll back on error."""
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()  # rolls back anything left uncommitted
+
+    def _take_idle(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                raw, returned_at = self._idle.pop()
+            idle_for = time.monotonic() - returned_at
+            if idle_for > self.max_idle or (
+                idle_for > self.ping_after and not self.backend.ping(raw)
+            ):
+                self._discard(raw)
+                continue
+            return raw
+
+    def _release(self, raw):
+        try:
+            if not self._rollback(raw):
+                self._discard(raw)
+            else:
+                with self._lock:
+                    self._idle.append((raw, time.monotonic()))
+            self.evict_idle()
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _rollback(raw):
+        try:
+            raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, raw):
+        self.discarded += 1
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def evict_idle(self):
+        """Close idle connections that have not been used for max_idle seconds."""
+        cutoff = time.monotonic() - self.max_idle
+        stale = []
+        with self._lock:
+            while self._idle and self._idle[0][1] < cutoff:
+                stale.append(self._idle.popleft()[0])
+        for raw in stale:
+            self._discard(raw)
+        return len(stale)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+        return {"backend": self.backend.name, "max_size": self.max_size, "idle": idle,
+                "created": self.created, "discarded": self.discarded}
+
+
+_pools = weakref.WeakSet()  # every ConnectionPool, reset in forked children
+
+
+def _reset_pools_after_fork():
+    for pool in list(_pools):
+        pool._after_fork()
+
+
+if hasattr(os, "register_at_fork"):  # POSIX; spawned processes import db afresh anyway
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+# ---------------------------------------
+# MODULE-LEVEL DEFAULT POOL
+# ---------------------------------------
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure(backend=None, **pool_kwargs):
+    """
+    Replace the shared pool, e.g. configure("sqlite", path="bench.db").
+    `backend` may be a name or a backend object; extra kwargs go to the backend
+    (path / conn_str) or the pool (max_size, timeout, max_idle, ping_after).
+    """
+    global _pool
+    backend_kwargs = {k: pool_kwargs.pop(k) for k in ("path", "conn_str") if k in pool_kwargs}
+    if backend is None or isinstance(backend, str):
+        backend = make_backend(backend, **backend_kwargs)
+    with _pool_lock:
+        old, _pool = _pool, ConnectionPool(backend, **pool_kwargs)
+    if old is not None:
+        old.close_all()
+    return _pool
+
+
+def use_pool(pool):
+    """Make `pool` the shared pool again (e.g. one saved before configure()); returns the replaced one."""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, pool
+    return old
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(make_backend())
+    return _pool
+
+
+def connection():
+    """Context-manager checkout from the shared pool."""
+    return get_pool().connection()
+
 
 def get_connection():
     """
-    Returns a connection to SQL Server database.
-    Update SERVER and DATABASE names as per your setup.
+    Returns a pooled connection. Call close() when done; that hands it back
+    to the pool rather than closing the socket.
     """
-    conn = pyodbc.connect(
-        "DRIVER={ODBC Driver 17 for SQL Server};"
-        "SERVER=localhost\\SQLEXPRESS;"  # agar named instance use karte ho to: localhost\SQLEXPRESS
-        "DATABASE=AutoRE_DB;"            # apne actual DB name se replace karo
-        "Trusted_Connection=yes;"
-    )
-    return conn
+    return get_pool().acquire()
+
+
+def next_submission_id(cursor, owner=None, shard=None):
+    """
+    Allocate a fresh SubmissionID from the identity table (safe under
+    concurrency), recording who submitted it and the shard its rows go to.
+    """
+    return get_pool().backend.next_submission_id(cursor, owner, shard)
+
+
+def limit(sql, n, offset=0):
+    """Cap a SELECT at n rows (after skipping `offset`) in the active backend's dialect."""
+    return get_pool().backend.limit(sql, n, offset)
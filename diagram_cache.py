@@ -0,0 +1,167 @@
+# diagram_cache.py
+# Content-addressed on-disk cache for generated UML (.puml text and rendered images).
+#
+# Key = sha256(generator name + generator version + normalized requirement list).
+# Identical requirement sets (very common: most clients send near-default
+# answers) cost no generation and no PlantUML render.
+#
+# Layout:  <cache dir>/<key[:2]>/<key>.puml   and   <key>.png / <key>.svg
+# Eviction: least recently used files go first once the folder is over max_bytes
+# (a hit touches the file's mtime).
+
+import hashlib
+import json
+import os
+import threading
+
+CACHE_DIR = os.environ.get("ARGOS_DIAGRAM_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".diagram_cache"))
+CACHE_MAX_BYTES = int(os.environ.get("ARGOS_DIAGRAM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+PLANTUML_CMD = os.environ.get("ARGOS_PLANTUML", "plantuml.bat" if os.name == "nt" else "plantuml")
+
+
+def normalize_requirements(requirements, ordered=False):
+    """
+    Canonical form of a (Type, Description) list for hashing: whitespace
+    collapsed, empty descriptions dropped (the generators skip them too).
+    Unless `ordered`, duplicates and row order are ignored (the class diagram
+    is built from sets).
+    """
+    items = []
+    for rtype, desc in requirements:
+        if not desc:
+            continue
+        items.append((rtype or "", " ".join(desc.split())))
+    if not ordered:
+        items = sorted(set(items))
+    return items
+
+
+def cache_key(generator, version, requirements, ordered=False):
+    payload = json.dumps([generator, version, normalize_requirements(requirements, ordered)],
+                         ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render_with_plantuml(puml_text, fmt="png"):
+    """Render via the plantuml command line (one JVM per call)."""
+    import subprocess  # only the fallback renderer needs it; keeps `import diagram_cache` light
+    proc = subprocess.run([PLANTUML_CMD, f"-t{fmt}", "-pipe"], input=puml_text.encode("utf-8"),
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return proc.stdout
+
+
+class DiagramCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.counters = {"puml_hits": 0, "puml_misses": 0, "image_hits": 0, "image_misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+
+    # --- low level ---
+    def _path(self, key, ext):
+        return os.path.join(self.directory, key[:2], f"{key}.{ext}")
+
+    def _read(self, key, ext):
+        path = self._path(key, ext)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return data
+
+    def _write(self, key, ext, data):
+        path = self._path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        # write-then-rename so a concurrent reader never sees half a file
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._size += len(data) - old_size
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                st = entry.stat()
+                yield entry.path, st.st_mtime, st.st_size
+
+    def evict(self, target_bytes=None):
+        """Delete least recently used files until the cache fits in target_bytes (default 90% of max)."""
+        target = self.max_bytes * 0.9 if target_bytes is None else target_bytes
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[1])
+            self._size = sum(size for _, _, size in entries)
+            for path, _, size in entries:
+                if self._size <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self._size -= size
+                self.counters["evictions"] += 1
+
+    # --- public API ---
+    def get_puml(self, key):
+        data = self._read(key, "puml")
+        self.counters["puml_hits" if data is not None else "puml_misses"] += 1
+        return None if data is None else data.decode("utf-8")
+
+    def put_puml(self, key, text):
+        self._write(key, "puml", text.encode("utf-8"))
+
+    def get_image(self, key, fmt="png"):
+        data = self._read(key, fmt)
+        self.counters["image_hits" if data is not None else "image_misses"] += 1
+        return data
+
+    def put_image(self, key, data, fmt="png"):
+        self._write(key, fmt, data)
+
+    def puml(self, generator, version, requirements, build, ordered=False):
+        """Return (key, puml text); `build(requirements)` only runs on a miss."""
+        key = cache_key(generator, version, requirements, ordered)
+        text = self.get_puml(key)
+        if text is None:
+            text = build(requirements)
+            self.put_puml(key, text)
+        return key, text
+
+    def image(self, key, puml_text, fmt="png", render=render_with_plantuml):
+        """Rendered image for a cached diagram; `render(text, fmt)` only runs on a miss."""
+        data = self.get_image(key, fmt)
+        if data is None:
+            data = render(puml_text, fmt)
+            self.put_image(key, data, fmt)
+        return data
+
+    def stats(self):
+        return dict(self.counters, bytes=self._size, max_bytes=self.max_bytes)
+
+
+_default = None
+
+
+def get_cache():
+    global _default
+    if _default is None:
+        _default = DiagramCache()
+    return _default
@@ -1,30 +1,264 @@
+# extractor.py
+# Usage:
+#   (venv) > python extractor.py                                   # print, like before
+#   (venv) > python extractor.py --format jsonl --out reqs.jsonl --batch-size 5000
+#   (venv) > python extractor.py --format csv --out reqs.csv --keyset --checkpoint extract.ckpt
+#   (venv) > python extractor.py --word-boundary                   # "not" no longer matches "notify"
+#
+# Rows are streamed in batches (fetchmany), categorized per batch and written
+# to the sink straight away, so memory stays flat however big the table is.
+# With --keyset each batch is its own "WHERE Id > last ORDER BY Id" query and
+# --checkpoint (which implies --keyset) records the last Id written, so a
+# stopped run resumes there.
+#
+# With shards (shards.py) every shard is read: the plain stream merges them by
+# Id, keyset paging goes through the shards one after the other, and the
+# checkpoint holds the last Id per shard ({"main": 120, "s1": 57}; a bare Id
+# is the main database's). --after-id applies on every shard.
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+from array import array
+from itertools import islice
+
 import db
+import shards
+from requirement_store import RequirementStore
+
+COLUMNS = ("Id", "Type", "Description", "Priority", "Stakeholder")
+SELECT_REQUIREMENTS = "SELECT Id, Type, Description, Priority, Stakeholder FROM dbo.Requirements"
 
 def fetch_requirements():
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT Id, Type, Description, Priority, Stakeholder FROM dbo.Requirements")
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return rows
-
-def categorize_requirement(desc):
+    return [row for batch in iter_batches() for row in batch]
+
+def fetch_store(batch_size=1000):
+    """The whole table as a RequirementStore, filled batch by batch (no full list of Rows)."""
+    store = RequirementStore()
+    for batch in iter_batches(batch_size):
+        store.extend_rows(batch)
+    return store
+
+def iter_batches(batch_size=1000):
+    """Yield lists of up to batch_size rows from one streaming cursor per shard."""
+    if not shards.get_map().sharded:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SELECT_REQUIREMENTS)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
+            cursor.close()
+        return
+    rows = shards.merged_rows(SELECT_REQUIREMENTS + " ORDER BY Id", column=0, batch_size=batch_size)
+    yield from iter(lambda: list(islice(rows, batch_size)), [])
+
+def iter_batches_keyset(batch_size=1000, after_id=0, shard=None):
+    """Yield batches of one shard (default: main) ordered by Id, one short query per batch (resumable from after_id)."""
+    shard = shard or shards.get(shards.MAIN)
+    query = db.limit(SELECT_REQUIREMENTS + " WHERE Id > ? ORDER BY Id", batch_size)
+    last_id = after_id or 0
+    while True:
+        with shard.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (last_id,))
+            batch = cursor.fetchall()
+            cursor.close()
+        if not batch:
+            break
+        yield batch
+        last_id = batch[-1][0]
+
+# category codes used by the batch API (index into CATEGORIES)
+CATEGORIES = ("Uncategorized", "Functional", "Non-Functional", "Domain-Specific", "Inverse")
+UNCATEGORIZED, FUNCTIONAL, NON_FUNCTIONAL, DOMAIN, INVERSE = range(5)
+
+# word-boundary mode ("not" no longer fires inside "notify" / "notification"):
+# (code, cheap substring gate, whole-word check) in priority order
+_WORD_RULES = (
+    (FUNCTIONAL, ("functional",), re.compile(r"\bfunctional\b")),
+    (NON_FUNCTIONAL, ("nonfunc", "time", "privacy", "security"), re.compile(r"\b(?:nonfunc\w*|time|privacy|security)\b")),
+    (DOMAIN, ("domain",), re.compile(r"\bdomain\b")),
+    (INVERSE, ("inverse", "not", "never"), re.compile(r"\b(?:inverse|not|never)\b")),
+)
+
+def _substring_code(desc):
+    if not desc:
+        return UNCATEGORIZED
     desc = desc.lower()
     if "functional" in desc:
-        return "Functional"
+        return FUNCTIONAL
     elif "nonfunc" in desc or "time" in desc or "privacy" in desc or "security" in desc:
-        return "Non-Functional"
+        return NON_FUNCTIONAL
     elif "domain" in desc:
-        return "Domain-Specific"
+        return DOMAIN
     elif "inverse" in desc or "not" in desc or "never" in desc:
-        return "Inverse"
+        return INVERSE
+    else:
+        return UNCATEGORIZED
+
+def _word_code(desc):
+    if not desc:
+        return UNCATEGORIZED
+    desc = desc.lower()
+    for code, gate, word_re in _WORD_RULES:
+        for token in gate:
+            if token in desc:
+                if word_re.search(desc):
+                    return code
+                break
+    return UNCATEGORIZED
+
+def categorize_requirement(desc, word_boundary=False):
+    code_of = _word_code if word_boundary else _substring_code
+    return CATEGORIES[code_of(desc)]
+
+_DEDUP_SAMPLE = 4096
+
+def categorize_codes(descs, word_boundary=False):
+    """
+    Categorize a whole batch of descriptions. Returns an array('B') of codes
+    (index into CATEGORIES): one byte per row instead of a list of strings;
+    numpy.frombuffer(codes, dtype="u1") gives a NumPy view without copying.
+
+    Submissions repeat the same near-default sentences, so when a sample of
+    the batch is at least half duplicates each distinct text is categorized
+    once and the codes are fanned back out with a C-level map.
+    """
+    code_of = _word_code if word_boundary else _substring_code
+    sample = descs[:_DEDUP_SAMPLE]
+    if len(set(sample)) * 2 <= len(sample):
+        distinct = dict.fromkeys(descs)
+        for desc in distinct:
+            distinct[desc] = code_of(desc)
+        return array("B", map(distinct.__getitem__, descs))
+    return array("B", map(code_of, descs))
+
+def categorize_batch(rows, word_boundary=False):
+    """
+    [(Id, Type, Description, Priority, Stakeholder)] or a RequirementStore
+    -> list of the same rows with a Category appended.
+    """
+    if isinstance(rows, RequirementStore):
+        descs = list(rows.descriptions())
+        codes = categorize_codes(descs, word_boundary)
+        rows = rows.rows(descs)
+    else:
+        codes = categorize_codes([row[2] for row in rows], word_boundary)
+    return [tuple(row) + (CATEGORIES[code],) for row, code in zip(rows, codes)]
+
+# ---------- sinks: write(rows) per batch, close() at the end ----------
+
+class PrintSink:
+    def __init__(self, out=None):
+        self.out = out or sys.stdout
+
+    def write(self, rows):
+        for rid, rtype, desc, priority, stakeholder, category in rows:
+            print(f"[{category}] {desc} (Priority: {priority}, Stakeholder: {stakeholder})", file=self.out)
+
+    def close(self):
+        self.out.flush()
+
+class CsvSink:
+    def __init__(self, path, append=False):
+        new_file = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        self.f = open(path, "a" if append else "w", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.f)
+        if new_file:
+            self.writer.writerow(COLUMNS + ("Category",))
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+class JsonlSink:
+    def __init__(self, path, append=False):
+        self.f = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, rows):
+        keys = COLUMNS + ("Category",)
+        self.f.writelines(json.dumps(dict(zip(keys, row)), ensure_ascii=False) + "\n" for row in rows)
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+def read_checkpoint(path):
+    """{shard name: last Id written} ({} when there is no checkpoint yet)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read().strip()
+    except FileNotFoundError:
+        return {}
+    if text.startswith("{"):
+        return {name: int(last_id) for name, last_id in json.loads(text).items()}
+    return {shards.MAIN: int(text)} if text else {}
+
+def write_checkpoint(path, positions):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        if set(positions) <= {shards.MAIN}:
+            f.write(str(positions.get(shards.MAIN, 0)))  # the format from before shards
+        else:
+            json.dump(positions, f)
+    os.replace(tmp, path)
+
+def run(sink, batch_size=1000, keyset=False, after_id=0, checkpoint=None, word_boundary=False):
+    """Stream -> categorize per batch -> sink. Returns number of rows written."""
+    positions = read_checkpoint(checkpoint) if checkpoint else {}
+    total = 0
+    # a checkpoint is "last Id written": only valid for batches in Id order
+    if keyset or after_id or checkpoint:
+        for shard in sorted(shards.get_map().all(), key=lambda s: (not s.is_main, s.name)):
+            start = max(after_id or 0, positions.get(shard.name, 0))
+            for batch in iter_batches_keyset(batch_size, start, shard):
+                sink.write(categorize_batch(batch, word_boundary))
+                total += len(batch)
+                if checkpoint:
+                    positions[shard.name] = batch[-1][0]
+                    write_checkpoint(checkpoint, positions)
+    else:
+        for batch in iter_batches(batch_size):
+            sink.write(categorize_batch(batch, word_boundary))
+            total += len(batch)
+    sink.close()
+    return total
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stream and categorize dbo.Requirements")
+    parser.add_argument("--format", choices=("print", "csv", "jsonl"), default="print")
+    parser.add_argument("--out", help="output file for csv/jsonl")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--keyset", action="store_true", help="page by Id instead of one long cursor")
+    parser.add_argument("--after-id", type=int, default=0, help="start after this Id (implies --keyset)")
+    parser.add_argument("--checkpoint", help="file holding the last Id written; resume from it (implies --keyset)")
+    parser.add_argument("--word-boundary", action="store_true", help="match category keywords as whole words")
+    args = parser.parse_args(argv)
+    if args.format != "print" and not args.out:
+        parser.error("--out is required for csv/jsonl")
+    return args
+
+def main(argv=None):
+    args = _parse_args(argv)
+    resuming = bool(args.after_id or (args.checkpoint and any(read_checkpoint(args.checkpoint).values())))
+    if args.format == "csv":
+        sink = CsvSink(args.out, append=resuming)
+    elif args.format == "jsonl":
+        sink = JsonlSink(args.out, append=resuming)
     else:
-        return "Uncategorized"
+        sink = PrintSink()
+    total = run(sink, args.batch_size, args.keyset, args.after_id, args.checkpoint, args.word_boundary)
+    if args.format != "print":
+        print(f"✅ {total} requirements written to {args.out}")
 
 if __name__ == "__main__":
-    data = fetch_requirements()
-    for row in data:
-        rid, rtype, desc, priority, stakeholder = row
-        category = categorize_requirement(desc)
-        print(f"[{category}] {desc} (Priority: {priority}, Stakeholder: {stakeholder})")
+    main()
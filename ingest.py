@@ -0,0 +1,106 @@
+# ingest.py
+# Form post -> requirement rows -> one batched INSERT inside one transaction.
+#
+# SubmissionIDs come from the SubmissionIds identity table (see db.py), not
+# from MAX(SubmissionID) + 1, so concurrent submits never share an ID. The
+# rows go to the submitter's shard (shards.py).
+
+import sys
+import traceback
+
+import metrics
+import rules_config
+import shards
+
+INSERT_REQUIREMENT = """
+    INSERT INTO dbo.Requirements (Type, Description, Priority, Stakeholder, SubmissionID)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+# callables run with the SubmissionID after a submission is committed
+# (cache invalidation etc.); register with on_submission_saved(). The rows are
+# saved by then, so a failing listener is reported and the others still run:
+# the caller must not see an error and submit the same form again.
+submission_listeners = []
+
+
+def on_submission_saved(fn):
+    submission_listeners.append(fn)
+    return fn
+
+
+def notify_saved(submission_id):
+    for listener in submission_listeners:
+        try:
+            listener(submission_id)
+        except Exception:
+            name = getattr(listener, "__qualname__", repr(listener))
+            print(f"⚠️ submission listener {name} failed for SubmissionID {submission_id}:", file=sys.stderr)
+            traceback.print_exc()
+            metrics.inc("argos_submission_listener_errors_total",
+                        listener=f"{getattr(listener, '__module__', '?')}.{name}")
+
+
+def form_to_requirements(responses):
+    """Turn the posted form dict into a list of (Type, Description) tuples."""
+    functional_mapping = rules_config.current().functional_mapping  # fixed answers -> sentences
+    reqs = []
+    for key, value in responses.items():
+        value = value.strip()
+        if not value:
+            continue
+
+        if key in functional_mapping and value in functional_mapping[key]:
+            sentence = f"The system shall {functional_mapping[key][value]}"
+            req_type = "Functional"
+        elif key.startswith("functional"):
+            req_type = "Functional"
+            sentence = f"The system shall {value}"
+        elif key.startswith("nonfunc"):
+            req_type = "Non-Functional"
+            sentence = f"The system must {value}"
+        elif key.startswith("domain"):
+            req_type = "Domain"
+            sentence = f"The system shall support {value}"
+        elif key.startswith("inverse"):
+            req_type = "Inverse"
+            sentence = f"The system shall not {value}"
+        else:
+            req_type = "General"
+            sentence = value
+        reqs.append((req_type, sentence))
+    return reqs
+
+
+def save_submission(requirements, priority="Medium", stakeholder="Client", owner=None):
+    """
+    Write one submission of `owner` (the session user): allocate its ID and
+    insert all rows with a single executemany, in one transaction on the
+    owner's shard. Returns the new SubmissionID.
+    """
+    shard = shards.shard_for(owner)
+    new_ids = []
+    try:
+        with shard.connection() as conn:
+            cursor = conn.cursor()
+            with metrics.timed("argos_db_query_seconds", query="next_submission_id"):
+                new_ids = shards.new_submission_ids(cursor, owner, shard)
+            new_id, = new_ids
+            rows = [(rtype, desc, priority, stakeholder, new_id) for rtype, desc in requirements]
+            if rows:
+                cursor.fast_executemany = True  # pyodbc: one round trip for the whole batch
+                with metrics.timed("argos_db_query_seconds", query="insert_requirements"):
+                    cursor.executemany(INSERT_REQUIREMENT, rows)
+            cursor.close()
+    except BaseException:
+        shards.discard_submission_ids(shard, new_ids)
+        raise
+    metrics.inc("argos_submissions_written_total")
+    metrics.inc("argos_requirements_written_total", len(rows))
+    notify_saved(new_id)
+    return new_id
+
+
+def ingest_form(responses, owner=None):
+    """Convenience wrapper used by app.submit()."""
+    return save_submission(form_to_requirements(responses), owner=owner)
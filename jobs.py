@@ -0,0 +1,337 @@
+# jobs.py
+# Background jobs for the work that follows a submit (categorize, diagram, render).
+# Usage:
+#   (venv) > python jobs.py worker --processes 2        # run queued jobs until stopped
+#   (venv) > python jobs.py status --sid 12
+#   (venv) > python jobs.py enqueue --sid 12            # queue a submission by hand
+#   (venv) > python jobs.py retry-failed
+#
+# The queue is one SQLite file (ARGOS_JOBS_DB, WAL mode), separate from the
+# requirements database so it works the same on SQL Server deployments.
+# app.py enqueues SUBMISSION_JOBS for every committed submission through
+# ingest.on_submission_saved; the request returns straight away and worker
+# processes do the rest.
+#
+# - one row per (kind, SubmissionID): enqueueing twice is a no-op unless the
+#   job has failed for good, which puts it back in the queue
+# - a worker claims the oldest ready job in a BEGIN IMMEDIATE transaction, so
+#   two workers never take the same job; a claim is a lease: a job whose
+#   worker died is claimed again after LEASE_SECONDS, and the result of a
+#   worker whose lease ran out (the job may be someone else's by then) is
+#   discarded
+# - a failing job is retried after BACKOFF_SECONDS * 2**(attempt - 1) (with
+#   jitter) until MAX_ATTEMPTS, then marked failed with its last error; so is
+#   one that kept killing its worker (lease expired on the last attempt)
+#
+# /jobs/<sid> serves status() as JSON; the requirements page polls it.
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import time
+import traceback
+from collections import Counter
+
+import class_diagram
+import diagram_cache
+import extractor
+import metrics
+import render_service
+import shards
+import similarity
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+JOBS_PATH = os.environ.get("ARGOS_JOBS_DB", os.path.join(HERE, "jobs.db"))
+JOBS_ENABLED = os.environ.get("ARGOS_JOBS", "1") != "0"
+MAX_ATTEMPTS = int(os.environ.get("ARGOS_JOB_ATTEMPTS", "5"))
+BACKOFF_SECONDS = float(os.environ.get("ARGOS_JOB_BACKOFF", "2"))
+LEASE_SECONDS = float(os.environ.get("ARGOS_JOB_LEASE", "300"))  # longest a job may run
+POLL_SECONDS = 0.5
+
+SUBMISSION_JOBS = ("extract", "diagram", "render")
+STATES = ("queued", "running", "done", "failed")
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        submission_id INTEGER NOT NULL,
+        state TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        run_after REAL NOT NULL,
+        lease_until REAL,
+        created REAL NOT NULL,
+        updated REAL NOT NULL,
+        error TEXT,
+        result TEXT,
+        UNIQUE (kind, submission_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, run_after)",
+)
+
+
+# ---------------------------------------
+# QUEUE
+# ---------------------------------------
+_ready_paths = set()
+
+
+def _connect(path=None):
+    path = path or JOBS_PATH
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    if path not in _ready_paths:
+        conn.execute("PRAGMA journal_mode=WAL")
+        for sql in SCHEMA:
+            conn.execute(sql)
+        _ready_paths.add(path)
+    conn.execute("PRAGMA synchronous=NORMAL")  # WAL: durable across crashes of the app, not of the OS
+    return conn
+
+
+def enqueue(sid, kinds=SUBMISSION_JOBS, path=None):
+    """Queue jobs for one submission (duplicates of live or finished jobs are ignored)."""
+    now = time.time()
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            """
+            INSERT INTO jobs (kind, submission_id, run_after, created, updated) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (kind, submission_id) DO UPDATE
+                SET state = 'queued', attempts = 0, run_after = excluded.run_after,
+                    updated = excluded.updated, error = NULL
+                WHERE jobs.state = 'failed'
+            """,
+            [(kind, sid, now, now, now) for kind in kinds])
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def enqueue_submission(sid):
+    """ingest listener (see app.py)."""
+    if JOBS_ENABLED:
+        enqueue(sid)
+
+
+def claim(path=None):
+    """Take the oldest ready job: (id, kind, submission_id, attempt, lease_until) or None."""
+    now = time.time()
+    lease_until = now + LEASE_SECONDS
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        # lease ran out on the last attempt: the job crashed or hung its worker every time
+        conn.execute(
+            """
+            UPDATE jobs SET state = 'failed', lease_until = NULL, updated = ?,
+                error = COALESCE(error || '; ', '') || 'lease expired on attempt ' || attempts
+            WHERE state = 'running' AND lease_until < ? AND attempts >= ?
+            """, (now, now, MAX_ATTEMPTS))
+        row = conn.execute(
+            """
+            SELECT id, kind, submission_id, attempts FROM jobs
+            WHERE (state = 'queued' AND run_after <= ?) OR (state = 'running' AND lease_until < ?)
+            ORDER BY run_after, id LIMIT 1
+            """, (now, now)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE jobs SET state = 'running', attempts = attempts + 1, lease_until = ?, updated = ? "
+                         "WHERE id = ?", (lease_until, now, row[0]))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    job_id, kind, sid, attempts = row
+    return job_id, kind, sid, attempts + 1, lease_until
+
+
+# _finish / _fail only touch the job while this worker's lease is the current
+# one: after it ran out the job may have been claimed (and finished) again.
+def _finish(job_id, lease_until, result, path=None):
+    """True if the result was recorded, False if the lease had been lost."""
+    now = time.time()
+    conn = _connect(path)
+    try:
+        cursor = conn.execute("UPDATE jobs SET state = 'done', result = ?, error = NULL, lease_until = NULL, "
+                              "updated = ? WHERE id = ? AND state = 'running' AND lease_until = ?",
+                              (json.dumps(result), now, job_id, lease_until))
+        return cursor.rowcount == 1
+    finally:
+        conn.close()
+
+
+def _fail(job_id, attempt, lease_until, error, path=None):
+    """The job's new state ("queued" / "failed"), or "lost" if the lease had been lost."""
+    now = time.time()
+    if attempt >= MAX_ATTEMPTS:
+        state, run_after = "failed", now
+    else:
+        state = "queued"
+        run_after = now + BACKOFF_SECONDS * 2 ** (attempt - 1) * random.uniform(0.8, 1.2)
+    conn = _connect(path)
+    try:
+        cursor = conn.execute("UPDATE jobs SET state = ?, run_after = ?, error = ?, lease_until = NULL, updated = ? "
+                              "WHERE id = ? AND state = 'running' AND lease_until = ?",
+                              (state, run_after, error, now, job_id, lease_until))
+        return state if cursor.rowcount == 1 else "lost"
+    finally:
+        conn.close()
+
+
+def status(sid, path=None):
+    """[{"kind", "state", "attempts", "error", "result", "updated"}] for one submission."""
+    conn = _connect(path)
+    try:
+        rows = conn.execute("SELECT kind, state, attempts, error, result, updated FROM jobs "
+                            "WHERE submission_id = ? ORDER BY id", (sid,)).fetchall()
+    finally:
+        conn.close()
+    return [{"kind": kind, "state": state, "attempts": attempts, "error": error,
+             "result": json.loads(result) if result else None, "updated": updated}
+            for kind, state, attempts, error, result, updated in rows]
+
+
+def counts(path=None):
+    """{(kind, state): n} over the whole queue."""
+    conn = _connect(path)
+    try:
+        return {(kind, state): n for kind, state, n in
+                conn.execute("SELECT kind, state, COUNT(*) FROM jobs GROUP BY kind, state")}
+    finally:
+        conn.close()
+
+
+def retry_failed(path=None):
+    now = time.time()
+    conn = _connect(path)
+    try:
+        cursor = conn.execute("UPDATE jobs SET state = 'queued', attempts = 0, run_after = ?, updated = ? "
+                              "WHERE state = 'failed'", (now, now))
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+# ---------------------------------------
+# HANDLERS: SubmissionID -> JSON-able result
+# ---------------------------------------
+def job_extract(sid):
+    """Categorize the submission's rows (extractor.py rules); result: counts per category."""
+    with shards.submission_connection(sid) as conn:
+        cursor = conn.cursor()
+        cursor.execute(extractor.SELECT_REQUIREMENTS + " WHERE SubmissionID = ?", (sid,))
+        rows = cursor.fetchall()
+        cursor.close()
+    categorized = extractor.categorize_batch(rows)
+    return {"requirements": len(rows), "categories": Counter(row[-1] for row in categorized)}
+
+
+def _diagram(sid):
+    rows = class_diagram.fetch_submission_requirements(sid)
+    if not rows:
+        return None, None
+    return class_diagram.cached_class_diagram(rows, dedup=similarity.DIAGRAM_DEDUP)
+
+
+def job_diagram(sid):
+    """Generate the class diagram into the diagram cache."""
+    key, _ = _diagram(sid)
+    return {"key": key}
+
+
+def job_render(sid):
+    """Render the diagram's SVG into the cache, so /diagram/<sid>.svg is a cache hit."""
+    key, text = _diagram(sid)
+    if key is None:
+        return {"key": None}
+    data = diagram_cache.get_cache().image(key, text, "svg", render=render_service.get_service().render)
+    return {"key": key, "bytes": len(data)}
+
+
+HANDLERS = {"extract": job_extract, "diagram": job_diagram, "render": job_render}
+
+
+def run_one(path=None):
+    """Claim and run one job. Returns (kind, sid, state) or None when nothing is ready
+    (state "lost": the lease ran out before the job finished, its outcome was not recorded)."""
+    job = claim(path)
+    if job is None:
+        return None
+    job_id, kind, sid, attempt, lease_until = job
+    start = time.perf_counter()
+    try:
+        result = HANDLERS[kind](sid)
+    except Exception as e:
+        traceback.print_exc()
+        state = _fail(job_id, attempt, lease_until, f"{type(e).__name__}: {e}", path)
+    else:
+        state = "done" if _finish(job_id, lease_until, result, path) else "lost"
+    metrics.observe("argos_job_seconds", time.perf_counter() - start, kind=kind, outcome=state)
+    return kind, sid, state
+
+
+def work(path=None, poll=POLL_SECONDS, stop_when_idle=False):
+    """Worker loop: run ready jobs, sleep `poll` seconds when there are none."""
+    while True:
+        done = run_one(path)
+        if done is None:
+            if stop_when_idle:
+                return
+            time.sleep(poll)
+            continue
+        kind, sid, state = done
+        print(f"[{os.getpid()}] {kind} SubmissionID {sid}: {state}", flush=True)
+
+
+def _queue_counts():
+    return {(("kind", kind), ("state", state)): n for (kind, state), n in counts().items()}
+
+
+metrics.function("argos_jobs", _queue_counts)
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Background jobs after submit (SQLite-backed queue)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="run jobs")
+    worker.add_argument("--processes", type=int, default=1)
+    worker.add_argument("--until-idle", action="store_true", help="exit once the queue is empty")
+    st = sub.add_parser("status", help="job states")
+    st.add_argument("--sid", type=int, default=None, help="one submission (default: totals)")
+    enq = sub.add_parser("enqueue", help="queue the post-submit jobs for a submission")
+    enq.add_argument("--sid", type=int, required=True)
+    sub.add_parser("retry-failed", help="queue every failed job again")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    if args.command == "worker":
+        if args.processes <= 1:
+            work(stop_when_idle=args.until_idle)
+        else:
+            procs = [multiprocessing.Process(target=work, kwargs={"stop_when_idle": args.until_idle})
+                     for _ in range(args.processes)]
+            for p in procs:
+                p.start()
+            for p in procs:
+                p.join()
+    elif args.command == "status":
+        if args.sid is not None:
+            for job in status(args.sid):
+                print(f"{job['kind']:<8} {job['state']:<8} attempts={job['attempts']} "
+                      f"{job['error'] or json.dumps(job['result'])}")
+        else:
+            for (kind, state), n in sorted(counts().items()):
+                print(f"{kind:<8} {state:<8} {n}")
+    elif args.command == "enqueue":
+        enqueue(args.sid)
+        print(f"✅ queued {', '.join(SUBMISSION_JOBS)} for SubmissionID {args.sid}")
+    else:
+        print(f"✅ {retry_failed()} failed job(s) queued again")
@@ -0,0 +1,222 @@
+# metrics.py
+# In-process counters and timing histograms; app.py serves them on /metrics
+# in the Prometheus text format.
+#
+#   with metrics.timed("argos_db_query_seconds", query="page_rows"):
+#       cursor.execute(...)
+#
+#   @metrics.timed("argos_render_seconds")
+#   def render(...): ...
+#
+#   metrics.inc("argos_requirements_written_total", len(rows))
+#
+# Metrics are created on first use (HELP text from DESCRIPTIONS). Values live
+# in this process only: each gunicorn worker reports its own.
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DESCRIPTIONS = {
+    "argos_http_request_seconds": "Request latency by endpoint, method and status",
+    "argos_db_checkout_seconds": "Time spent waiting for a pooled DB connection",
+    "argos_db_checkout_timeouts_total": "Connection checkouts that gave up (PoolTimeout)",
+    "argos_db_query_seconds": "Query execution time by query name",
+    "argos_kdf_seconds": "Password hashing time including the wait for a KDF worker",
+    "argos_template_render_seconds": "Jinja template rendering time",
+    "argos_pipeline_stage_seconds_total": "UML pipeline time by generator and stage",
+    "argos_diagrams_generated_total": "Diagrams generated by generator and format",
+    "argos_requirements_written_total": "Requirement rows written",
+    "argos_submissions_written_total": "Submissions written",
+    "argos_submission_listener_errors_total": "Post-commit submission listeners that raised, by listener",
+    "argos_slow_requests_total": "Requests over the profiler threshold",
+    "argos_jobs": "Background jobs by kind and state",
+    "argos_job_seconds": "Background job run time by kind and outcome",
+    "argos_rules_reloads_total": "Rules file reloads by outcome (ok, error)",
+}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in key) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, key, value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help="", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            i = bisect_left(self.buckets, value)  # first bucket with value <= bound
+            if i < len(self.buckets):
+                state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            running = 0
+            for bound, n in zip(self.buckets, state):
+                running += n
+                yield f"{self.name}_bucket", key + (("le", _format_value(float(bound))),), running
+            yield f"{self.name}_bucket", key + (("le", "+Inf"),), state[-1]
+            yield f"{self.name}_sum", key, state[-2]
+            yield f"{self.name}_count", key, state[-1]
+
+
+class FunctionMetric:
+    """Read at scrape time: fn() returns a number or {((label, value), ...): number}."""
+
+    def __init__(self, name, help, fn, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.kind = kind
+
+    def samples(self):
+        value = self.fn()
+        if isinstance(value, dict):
+            for key, v in value.items():
+                yield self.name, tuple(key), v
+        elif value is not None:
+            yield self.name, (), value
+
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def _get(name, cls, **kw):
+    metric = _metrics.get(name)
+    if metric is None:
+        with _metrics_lock:
+            metric = _metrics.get(name)
+            if metric is None:
+                metric = _metrics[name] = cls(name, DESCRIPTIONS.get(name, ""), **kw)
+    if type(metric) is not cls:
+        raise TypeError(f"{name} is a {metric.kind}, not a {cls.kind}")
+    return metric
+
+
+def counter(name):
+    return _get(name, Counter)
+
+
+def histogram(name, buckets=DEFAULT_BUCKETS):
+    return _get(name, Histogram, buckets=buckets)
+
+
+def inc(name, amount=1, **labels):
+    counter(name).inc(amount, **labels)
+
+
+def observe(name, value, **labels):
+    histogram(name).observe(value, **labels)
+
+
+def function(name, fn, kind="gauge", help=None):
+    """
+    Register (or replace) a metric computed by fn() on every scrape, for
+    values a module already keeps (pool stats, per-stage totals): no cost
+    on the hot path. kind is "gauge" or "counter".
+    """
+    with _metrics_lock:
+        _metrics[name] = FunctionMetric(name, help or DESCRIPTIONS.get(name, ""), fn, kind)
+
+
+class timed(ContextDecorator):
+    """Context manager / decorator observing the elapsed seconds into a histogram."""
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self._starts = threading.local()
+
+    def __enter__(self):
+        stack = getattr(self._starts, "stack", None)
+        if stack is None:
+            stack = self._starts.stack = []
+        stack.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._starts.stack.pop()
+        observe(self.name, elapsed, **self.labels)
+        return False
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    with _metrics_lock:
+        metrics = sorted(_metrics.values(), key=lambda m: m.name)
+    for metric in metrics:
+        try:
+            samples = list(metric.samples())
+        except Exception:  # a failing gauge must not break the scrape
+            continue
+        if metric.help:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, key, value in samples:
+            lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _metrics_lock:
+        _metrics.clear()
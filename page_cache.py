@@ -0,0 +1,72 @@
+# page_cache.py
+# In-process cache for rendered /templaterequirements pages.
+#
+# A submission never changes after submit() commits it, so the rendered page
+# for (SubmissionID, page) can be reused until it expires (TTL) or gets pushed
+# out by newer entries (LRU, max_entries). Each entry carries an ETag so
+# browsers that already have the page get a 304 with no body.
+# ingest.py notifies invalidate_submission() whenever a submission is written.
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+PAGE_CACHE_TTL = float(os.environ.get("ARGOS_PAGE_CACHE_TTL", "600"))  # seconds
+PAGE_CACHE_SIZE = int(os.environ.get("ARGOS_PAGE_CACHE_SIZE", "1024"))  # entries
+
+
+def make_etag(body):
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    def __init__(self, max_entries=PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, etag, body); oldest first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """(etag, body) or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key, body):
+        etag = make_etag(body)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+    def invalidate_submission(self, sid):
+        """Drop every cached page of one submission (keys are (sid, page))."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == sid]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        return {"entries": size, "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+
+pages = PageCache()
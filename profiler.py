@@ -0,0 +1,134 @@
+# profiler.py
+# Opt-in sampling profiler for slow requests.
+# Usage:
+#   (venv) > set ARGOS_PROFILE_SLOW_MS=250       (Linux: export ...)
+#   (venv) > python server.py
+#   ... requests slower than 250 ms leave a file in profiles/:
+#   $ flamegraph.pl profiles/20250101-120000-042-show_requirements-412ms.folded > slow.svg
+#
+# While enabled, one background thread looks at the stack of every thread
+# that is inside a request every ARGOS_PROFILE_INTERVAL_MS (sys._current_frames,
+# no tracing hooks, so requests run at full speed). When a request ends over
+# the threshold its samples are written in the collapsed ("folded") format:
+# one "outer;...;inner count" line per distinct stack, which flamegraph.pl
+# and speedscope read as is. Requests under the threshold are just dropped.
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import metrics
+
+PROFILE_SLOW_MS = os.environ.get("ARGOS_PROFILE_SLOW_MS")  # unset = profiler off
+PROFILE_INTERVAL_MS = float(os.environ.get("ARGOS_PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.environ.get("ARGOS_PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+
+
+class _Request:
+    __slots__ = ("label", "started", "stacks")
+
+    def __init__(self, label):
+        self.label = label
+        self.started = time.perf_counter()
+        self.stacks = Counter()
+
+
+class SamplingProfiler:
+    def __init__(self, slow_ms, interval_ms=PROFILE_INTERVAL_MS, out_dir=PROFILE_DIR):
+        self.slow = slow_ms / 1000
+        self.interval = interval_ms / 1000
+        self.out_dir = out_dir
+        self._active = {}  # thread ident -> _Request
+        self._lock = threading.Lock()
+        self._sampling = threading.Lock()  # held for one pass over the active requests
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample_loop, daemon=True, name="sampling-profiler")
+        self._thread.start()
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            with self._sampling:
+                with self._lock:
+                    active = list(self._active.items())
+                if not active:
+                    continue
+                frames = sys._current_frames()
+                for ident, req in active:
+                    frame = frames.get(ident)
+                    if frame is None or ident == own:
+                        continue
+                    req.stacks[_collapse(frame)] += 1
+
+    def begin(self, label):
+        req = _Request(label)
+        with self._lock:
+            self._active[threading.get_ident()] = req
+        return req
+
+    def end(self, req):
+        """Stop sampling this request; returns the file written if it was slow."""
+        with self._lock:
+            if self._active.get(threading.get_ident()) is req:
+                del self._active[threading.get_ident()]
+        with self._sampling:
+            pass  # a pass that took req before it was removed finishes first; later ones skip it
+        elapsed = time.perf_counter() - req.started
+        if elapsed < self.slow:
+            return None
+        metrics.inc("argos_slow_requests_total", endpoint=req.label)
+        if not req.stacks:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")[:-3]
+        path = os.path.join(self.out_dir, f"{stamp}-{_safe(req.label)}-{elapsed * 1000:.0f}ms.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {n}\n" for stack, n in req.stacks.most_common())
+        return path
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def _collapse(frame):
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    parts.reverse()
+    return ";".join(parts)
+
+
+def _safe(label):
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in label)[:60] or "request"
+
+
+_profiler = None
+
+
+def enable(slow_ms, interval_ms=PROFILE_INTERVAL_MS, out_dir=PROFILE_DIR):
+    global _profiler
+    disable()
+    _profiler = SamplingProfiler(slow_ms, interval_ms, out_dir)
+    return _profiler
+
+
+def disable():
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.stop()
+
+
+def get_profiler():
+    """The running profiler, or None when profiling is off."""
+    return _profiler
+
+
+if PROFILE_SLOW_MS:
+    enable(float(PROFILE_SLOW_MS))
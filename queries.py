@@ -0,0 +1,87 @@
+# queries.py
+# Read queries behind /templaterequirements. Everything is scoped to one
+# SubmissionID and served by IX_Requirements_Submission_Type (schema.py) on
+# the shard holding it (shards.py): the per-Type counts are a GROUP BY in the
+# database, and the rows come one page at a time.
+
+import db
+import metrics
+import shards
+
+PAGE_TYPES = ("Functional", "Non-Functional", "Domain", "Inverse")
+PER_PAGE = 50
+
+TYPE_COUNTS = """
+    SELECT Type, COUNT(*) FROM dbo.Requirements
+    WHERE SubmissionID = ?
+    GROUP BY Type
+"""
+PAGE_ROWS = (
+    "SELECT Type, Description FROM dbo.Requirements"
+    " WHERE SubmissionID = ? AND Type IN (?, ?, ?, ?)"
+    " ORDER BY Id"
+)
+
+
+def requirements_page(sid=None, page=1, per_page=PER_PAGE, owner=None):
+    """
+    One page of a submission's requirements, bucketed by Type, plus the
+    per-Type totals for the whole submission. sid=None means the latest one
+    of `owner` (of anyone when owner is None).
+    """
+    page = max(page or 1, 1)
+    if not sid:
+        sid = shards.latest_submission_id(owner)
+
+    counts = dict.fromkeys(PAGE_TYPES, 0)
+    rows = []
+    if sid:
+        with shards.submission_connection(sid) as conn:
+            cursor = conn.cursor()
+            with metrics.timed("argos_db_query_seconds", query="type_counts"):
+                cursor.execute(TYPE_COUNTS, (sid,))
+            for rtype, n in cursor.fetchall():
+                if rtype in counts:
+                    counts[rtype] = n
+            with metrics.timed("argos_db_query_seconds", query="page_rows"):
+                cursor.execute(db.limit(PAGE_ROWS, per_page, (page - 1) * per_page), (sid,) + PAGE_TYPES)
+                rows = cursor.fetchall()
+            cursor.close()
+
+    categorized = {t: [] for t in PAGE_TYPES}
+    for rtype, desc in rows:
+        categorized[rtype].append(desc)
+
+    total = sum(counts.values())
+    return {
+        "sid": sid,
+        "categorized": categorized,
+        "counts": counts,
+        "page": page,
+        "pages": max((total + per_page - 1) // per_page, 1),
+        "total": total,
+    }
+
+
+def all_requirements(sid):
+    """Every requirement of a submission, bucketed by Type (the PDF export of a paginated page)."""
+    categorized = {t: [] for t in PAGE_TYPES}
+    with shards.submission_connection(sid) as conn:
+        cursor = conn.cursor()
+        with metrics.timed("argos_db_query_seconds", query="all_rows"):
+            cursor.execute(PAGE_ROWS, (sid,) + PAGE_TYPES)
+            for rtype, desc in cursor.fetchall():
+                categorized[rtype].append(desc)
+        cursor.close()
+    return categorized
+
+
+def explained_queries():
+    """(label, sql, params) of the page queries, for `python schema.py --explain`."""
+    return [
+        ("latest submission", shards.SHARD_LATEST, ()),
+        ("owner's latest submission", shards.OWNER_LATEST, ("someone@example.com",)),
+        ("type counts", TYPE_COUNTS, (1,)),
+        ("page rows", db.limit(PAGE_ROWS, PER_PAGE, 0), (1,) + PAGE_TYPES),
+        ("uml_generator functional", "SELECT Description FROM dbo.Requirements WHERE Type='Functional'", ()),
+    ]
@@ -0,0 +1,320 @@
+# render_service.py
+# Renders .puml text to PNG/SVG bytes through long-lived PlantUML processes.
+# Usage:
+#   (venv) > python render_service.py class_diagram.puml               # -> class_diagram.png
+#   (venv) > python render_service.py diagrams/*.puml --format svg --workers 4
+#
+# `plantuml -pipe` reads diagram after diagram from stdin and, with
+# -pipedelimitor, writes a marker after each image, so one JVM serves any
+# number of renders and JVM startup is paid once per worker, not per diagram.
+# Jobs go through a bounded queue to ARGOS_RENDER_WORKERS worker threads,
+# each owning one process per format. A render that takes longer than
+# ARGOS_RENDER_TIMEOUT kills its process; the next job starts a fresh one.
+#
+# app.py serves /diagram/<sid>.<fmt> through get_service().render, behind the
+# content-addressed diagram cache, so each distinct diagram is rendered once.
+
+import argparse
+import atexit
+import os
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from diagram_cache import PLANTUML_CMD
+
+RENDER_WORKERS = int(os.environ.get("ARGOS_RENDER_WORKERS", "2"))
+RENDER_QUEUE = int(os.environ.get("ARGOS_RENDER_QUEUE", "64"))  # jobs waiting for a worker
+RENDER_TIMEOUT = float(os.environ.get("ARGOS_RENDER_TIMEOUT", "30"))  # seconds per render
+RENDER_MAX_JOBS = int(os.environ.get("ARGOS_RENDER_MAX_JOBS", "1000"))  # then recycle the JVM
+
+FORMATS = ("png", "svg")
+
+
+class RenderError(Exception):
+    """A diagram could not be rendered."""
+
+
+class RenderBusy(RenderError):
+    """The render queue is full; the caller should retry later."""
+
+
+class RenderTimeout(RenderError):
+    """The render did not finish in time."""
+
+
+class RenderUnavailable(RenderError):
+    """PlantUML could not be started (not installed / not on PATH)."""
+
+
+# ---------------------------------------
+# ONE PLANTUML PROCESS
+# ---------------------------------------
+class PlantUMLProcess:
+    """One `plantuml -pipe` JVM for one output format; one render at a time."""
+
+    def __init__(self, fmt="png", cmd=PLANTUML_CMD):
+        if fmt not in FORMATS:
+            raise ValueError(f"unsupported format: {fmt}")
+        self.fmt = fmt
+        self.cmd = cmd
+        self.renders = 0
+        self._delimiter = f"--argos-render-{os.urandom(16).hex()}--"
+        self._proc = None
+        self._pending = deque()
+
+    def start(self):
+        args = [self.cmd, f"-t{self.fmt}", "-charset", "UTF-8", "-pipe", "-pipedelimitor", self._delimiter]
+        try:
+            self._proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                          stderr=subprocess.DEVNULL, bufsize=0)
+        except OSError as e:
+            raise RenderUnavailable(f"cannot start {self.cmd}: {e}") from e
+        self._pending = deque()  # per process: a dying reader must not touch the next one's jobs
+        threading.Thread(target=self._read_output, args=(self._proc, self._pending), daemon=True,
+                         name=f"plantuml-{self.fmt}-reader").start()
+
+    def alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def _read_output(self, proc, pending):
+        # split stdout on the delimiter; each piece completes the oldest pending job
+        marker = self._delimiter.encode("ascii")
+        buf = b""
+        while True:
+            chunk = proc.stdout.read(65536)
+            if not chunk:
+                break
+            buf += chunk
+            while True:
+                idx = buf.find(marker)
+                if idx < 0:
+                    break
+                image, buf = buf[:idx], buf[idx + len(marker):].lstrip(b"\r\n")
+                if pending:
+                    pending.popleft().set_result(image)
+        while pending:
+            pending.popleft().set_exception(RenderError("plantuml exited"))
+
+    def render(self, text, timeout=RENDER_TIMEOUT):
+        if not self.alive():
+            self.start()
+        result = Future()
+        self._pending.append(result)
+        if not text.endswith("\n"):
+            text += "\n"
+        try:
+            self._proc.stdin.write(text.encode("utf-8"))
+            self._proc.stdin.flush()
+            image = result.result(timeout=timeout)
+        except FutureTimeout:
+            self.close(kill=True)
+            raise RenderTimeout(f"render took longer than {timeout:g}s") from None
+        except OSError as e:
+            self.close(kill=True)
+            raise RenderError(f"plantuml pipe closed: {e}") from e
+        self.renders += 1
+        return image
+
+    def close(self, kill=False):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        if kill:
+            proc.kill()
+            proc.wait()
+            return
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+# ---------------------------------------
+# QUEUE + WORKERS
+# ---------------------------------------
+class RenderService:
+    """
+    Bounded job queue in front of `workers` threads, each owning one
+    PlantUMLProcess per format (started on first use). Identical jobs that
+    are queued or running at the same time share one render.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS, queue_size=RENDER_QUEUE, timeout=RENDER_TIMEOUT,
+                 max_jobs=RENDER_MAX_JOBS, cmd=PLANTUML_CMD):
+        self.timeout = timeout
+        self.max_jobs = max_jobs
+        self.cmd = cmd
+        self.counters = {"renders": 0, "shared": 0, "failures": 0, "timeouts": 0, "rejected": 0, "restarts": 0}
+        self._jobs = queue.Queue(maxsize=queue_size)
+        self._inflight = {}  # (fmt, text) -> Future
+        self._lock = threading.Lock()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._worker, daemon=True, name=f"render-{i}")
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, text, fmt="png"):
+        """Queue a render; returns a Future of the image bytes. Raises RenderBusy when full."""
+        if fmt not in FORMATS:
+            raise ValueError(f"unsupported format: {fmt}")
+        job = (fmt, text)
+        with self._lock:
+            if self._closed:
+                raise RenderError("render service is closed")
+            future = self._inflight.get(job)
+            if future is not None:
+                self.counters["shared"] += 1
+                return future
+            future = Future()
+            try:
+                self._jobs.put_nowait((job, future))
+            except queue.Full:
+                self.counters["rejected"] += 1
+                raise RenderBusy("render queue is full") from None
+            self._inflight[job] = future
+        future.add_done_callback(lambda _: self._forget(job, future))
+        return future
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _forget(self, job, future):
+        with self._lock:
+            if self._inflight.get(job) is future:
+                del self._inflight[job]
+
+    def render(self, text, fmt="png", timeout=None):
+        """Image bytes for `text`; same call shape as diagram_cache.render_with_plantuml."""
+        timeout = self.timeout * 2 if timeout is None else timeout  # queue wait + render
+        future = self.submit(text, fmt)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            raise RenderTimeout(f"no render within {timeout:g}s") from None
+
+    def _worker(self):
+        processes = {}
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                break
+            (fmt, text), future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            proc = processes.get(fmt)
+            if proc is None or proc.renders >= self.max_jobs:
+                if proc is not None:
+                    proc.close()
+                    self._count("restarts")
+                proc = processes[fmt] = PlantUMLProcess(fmt, self.cmd)
+            try:
+                image = proc.render(text, self.timeout)
+            except RenderError as e:
+                self._count("timeouts" if isinstance(e, RenderTimeout) else "failures")
+                future.set_exception(e)
+            else:
+                self._count("renders")
+                future.set_result(image)
+        for proc in processes.values():
+            proc.close()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for _ in self._threads:
+            self._jobs.put(None)
+        for t in self._threads:
+            t.join()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return dict(counters, queued=self._jobs.qsize(), workers=len(self._threads))
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_service():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = RenderService()
+            atexit.register(_default.close)
+    return _default
+
+
+def started():
+    """True once get_service() has created the shared service."""
+    return _default is not None
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render .puml files with long-lived PlantUML processes")
+    parser.add_argument("files", nargs="+", help=".puml files; the image is written next to each")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS)
+    parser.add_argument("--timeout", type=float, default=RENDER_TIMEOUT, help="seconds per render")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    # a long-lived process (argos.py daemon) already has warm PlantUML workers
+    shared = started()
+    service = get_service() if shared else RenderService(workers=args.workers, timeout=args.timeout)
+    start = time.perf_counter()
+    pending = deque()
+    failed = 0
+
+    def finish_oldest():
+        path, future = pending.popleft()
+        out = os.path.splitext(path)[0] + "." + args.format
+        try:
+            data = future.result()
+        except RenderError as e:
+            print(f"❌ {path}: {e}")
+            return 1
+        with open(out, "wb") as f:
+            f.write(data)
+        print(f"✅ {out} ({len(data)} bytes)")
+        return 0
+
+    for path in args.files:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        while True:
+            try:
+                pending.append((path, service.submit(text, args.format)))
+                break
+            except RenderBusy:
+                # queue full: wait for our oldest job (or, if the daemon's other users
+                # filled it, for them) instead of failing the rest of the files
+                if pending:
+                    failed += finish_oldest()
+                else:
+                    time.sleep(0.05)
+    while pending:
+        failed += finish_oldest()
+    if not shared:
+        service.close()
+    print(f"{len(args.files) - failed}/{len(args.files)} rendered in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
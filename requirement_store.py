@@ -0,0 +1,292 @@
+# requirement_store.py
+# Columnar in-memory container for large requirement batches.
+#
+# A list of pyodbc Rows (or tuples) costs a row object plus one str per
+# column for every requirement. RequirementStore keeps
+#   - Type / Priority / Stakeholder as array('H') codes into interned value tables
+#   - Id and SubmissionID as array('q')
+#   - every Description in one UTF-8 bytearray, located through an array('Q')
+#     of offsets (row i is text[offsets[i]:offsets[i + 1]])
+# so a row costs ~30 bytes plus its UTF-8 text. numpy.frombuffer(store.type_codes,
+# dtype="u2") gives a NumPy view of a code column without copying.
+#
+# Iterating a store yields (Type, Description) pairs, so generate_class_diagram,
+# cached_class_diagram and DiagramModel take it as is; rows() yields the
+# extractor's (Id, Type, Description, Priority, Stakeholder) tuples and store[i]
+# is a small __slots__ view. `python bench.py store` measures bytes per row.
+#
+# save(path) writes the same columns to a flat file; RequirementStore.load(path)
+# memory-maps it back (read-only, nothing is parsed or copied up front), which
+# is what `bulk_io.py export` and `class_diagram.py --all --from-file` use.
+#
+# File layout (native byte order, recorded in the metadata; sections 8-aligned):
+#   "ARGOSRQ1" | rows u64 | metadata length u64 | metadata JSON (value tables, NULL rows)
+#   | ids q | sids q | type codes H | priority codes H | stakeholder codes H
+#   | offsets Q (rows + 1, absolute file positions) | UTF-8 text
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import groupby
+from operator import itemgetter
+
+_DECODE_CHUNK = 4096  # rows decoded per bytes -> str call
+
+_MAGIC = b"ARGOSRQ1"
+_HEADER = struct.Struct("<8sQQ")
+_FILE_COLUMNS = (("ids", "q"), ("sids", "q"), ("type_codes", "H"), ("priority_codes", "H"),
+                 ("stakeholder_codes", "H"))
+
+
+def _align(pos):
+    return (pos + 7) & ~7
+
+
+class _Interner:
+    """value <-> small int code; values are kept once."""
+    __slots__ = ("values", "_codes")
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self._codes = {v: i for i, v in enumerate(self.values)}
+
+    def code(self, value):
+        c = self._codes.get(value)
+        if c is None:
+            c = len(self.values)
+            if c > 0xFFFF:
+                raise ValueError("more than 65536 distinct values in a code column")
+            self._codes[value] = c
+            self.values.append(value)
+        return c
+
+    def find(self, value):
+        return self._codes.get(value)
+
+
+class RequirementView:
+    """One row of a RequirementStore, read lazily."""
+    __slots__ = ("_store", "_i")
+
+    def __init__(self, store, i):
+        self._store = store
+        self._i = i
+
+    @property
+    def id(self):
+        return self._store.ids[self._i]
+
+    @property
+    def submission_id(self):
+        return self._store.sids[self._i]
+
+    @property
+    def type(self):
+        return self._store.type_values[self._store.type_codes[self._i]]
+
+    @property
+    def description(self):
+        return self._store.description(self._i)
+
+    @property
+    def priority(self):
+        return self._store.priority_values[self._store.priority_codes[self._i]]
+
+    @property
+    def stakeholder(self):
+        return self._store.stakeholder_values[self._store.stakeholder_codes[self._i]]
+
+    def __repr__(self):
+        return f"<RequirementView #{self._i} {self.type}: {self.description!r}>"
+
+
+class RequirementStore:
+    __slots__ = ("ids", "sids", "type_codes", "priority_codes", "stakeholder_codes",
+                 "offsets", "_text", "_nulls", "_types", "_priorities", "_stakeholders")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.sids = array("q")
+        self.type_codes = array("H")
+        self.priority_codes = array("H")
+        self.stakeholder_codes = array("H")
+        self.offsets = array("Q", [0])
+        self._text = bytearray()
+        self._nulls = set()  # rows whose Description is NULL (stored as "")
+        self._types = _Interner()
+        self._priorities = _Interner()
+        self._stakeholders = _Interner()
+
+    # --- building ---
+    def append(self, rtype, desc, id=0, priority=None, stakeholder=None, sid=0):
+        if isinstance(self.ids, memoryview):
+            raise TypeError("a memory-mapped RequirementStore is read-only")
+        if desc is None:
+            self._nulls.add(len(self.ids))
+        else:
+            self._text += desc.encode("utf-8")
+        self.offsets.append(len(self._text))
+        self.ids.append(id or 0)
+        self.sids.append(sid or 0)
+        self.type_codes.append(self._types.code(rtype))
+        self.priority_codes.append(self._priorities.code(priority))
+        self.stakeholder_codes.append(self._stakeholders.code(stakeholder))
+
+    def extend_pairs(self, pairs):
+        for rtype, desc in pairs:
+            self.append(rtype, desc)
+        return self
+
+    def extend_rows(self, rows):
+        """(Id, Type, Description, Priority, Stakeholder) rows, as extractor.SELECT_REQUIREMENTS returns them."""
+        for rid, rtype, desc, priority, stakeholder in rows:
+            self.append(rtype, desc, rid, priority, stakeholder)
+        return self
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        return cls().extend_pairs(pairs)
+
+    @classmethod
+    def from_rows(cls, rows):
+        return cls().extend_rows(rows)
+
+    # --- reading ---
+    @property
+    def type_values(self):
+        return self._types.values
+
+    @property
+    def priority_values(self):
+        return self._priorities.values
+
+    @property
+    def stakeholder_values(self):
+        return self._stakeholders.values
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        n = len(self.ids)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("requirement index out of range")
+        return RequirementView(self, i)
+
+    def description(self, i):
+        if i in self._nulls:
+            return None
+        return self._text[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def descriptions(self):
+        offsets, nulls = self.offsets, self._nulls
+        for lo in range(0, len(self.ids), _DECODE_CHUNK):
+            hi = min(lo + _DECODE_CHUNK, len(self.ids))
+            base = offsets[lo]
+            raw = self._text[base:offsets[hi]]
+            if raw.isascii():
+                # one decode per chunk; byte offsets are str offsets for ASCII
+                text = raw.decode("ascii")
+                descs = [text[a - base:b - base] for a, b in zip(offsets[lo:hi], offsets[lo + 1:hi + 1])]
+            else:
+                descs = [raw[a - base:b - base].decode("utf-8") for a, b in zip(offsets[lo:hi], offsets[lo + 1:hi + 1])]
+            if nulls:
+                for i in range(lo, hi):
+                    if i in nulls:
+                        descs[i - lo] = None
+            yield from descs
+
+    def __iter__(self):
+        """(Type, Description) pairs, the shape every generator takes."""
+        types = self._types.values
+        return zip(map(types.__getitem__, self.type_codes), self.descriptions())
+
+    def rows(self, descriptions=None):
+        """
+        (Id, Type, Description, Priority, Stakeholder) tuples (extractor.COLUMNS).
+        Pass a list already taken from descriptions() to skip decoding twice.
+        """
+        descriptions = self.descriptions() if descriptions is None else descriptions
+        types, prios, holders = self._types.values, self._priorities.values, self._stakeholders.values
+        return zip(self.ids, map(types.__getitem__, self.type_codes), descriptions,
+                   map(prios.__getitem__, self.priority_codes), map(holders.__getitem__, self.stakeholder_codes))
+
+    def type_mask(self, rtype):
+        """Row indexes with this Type (a code compare, no strings touched)."""
+        code = self._types.find(rtype)
+        if code is None:
+            return []
+        return [i for i, c in enumerate(self.type_codes) if c == code]
+
+    def nbytes(self):
+        """Bytes held by the columns (interned value tables excluded: they are tiny)."""
+        columns = (self.ids, self.sids, self.type_codes, self.priority_codes, self.stakeholder_codes, self.offsets)
+        return sum(len(c) * c.itemsize for c in columns) + self.offsets[-1] - self.offsets[0]
+
+    def submissions(self, resume_from=None):
+        """
+        (SubmissionID, [(Type, Description), ...]) per run of equal SubmissionIDs,
+        the shape class_diagram.iter_submissions yields. Rows without one are skipped.
+        """
+        for sid, group in groupby(zip(self.sids, self), key=itemgetter(0)):
+            if not sid or (resume_from is not None and sid < resume_from):
+                continue
+            yield sid, [pair for _, pair in group]
+
+    # --- files ---
+    def save(self, path):
+        n = len(self.ids)
+        meta = json.dumps({"byteorder": sys.byteorder, "types": self._types.values,
+                           "priorities": self._priorities.values, "stakeholders": self._stakeholders.values,
+                           "nulls": sorted(self._nulls)}, ensure_ascii=False).encode("utf-8")
+        pos = _align(_HEADER.size + len(meta))
+        for name, code in _FILE_COLUMNS:
+            pos = _align(pos + n * array(code).itemsize)
+        text_start = _align(pos + (n + 1) * 8)
+        first = self.offsets[0]
+        offsets = array("Q", (o - first + text_start for o in self.offsets))
+
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            def section(data):
+                f.write(data)
+                f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            section(_HEADER.pack(_MAGIC, n, len(meta)) + meta)
+            for name, code in _FILE_COLUMNS:
+                section(getattr(self, name))
+            section(offsets)
+            f.write(self._text[first:self.offsets[-1]])
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a file written by save(); columns are views into the mapping."""
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(mm) < _HEADER.size:
+            raise ValueError(f"{path}: not a requirement store file")
+        magic, n, meta_len = _HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path}: not a requirement store file")
+        meta = json.loads(mm[_HEADER.size:_HEADER.size + meta_len].decode("utf-8"))
+        if meta["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path}: written on a {meta['byteorder']}-endian machine")
+
+        store = cls.__new__(cls)
+        view = memoryview(mm)
+        pos = _align(_HEADER.size + meta_len)
+        for name, code in _FILE_COLUMNS + (("offsets", "Q"),):
+            size = (n + (name == "offsets")) * array(code).itemsize
+            setattr(store, name, view[pos:pos + size].cast(code))
+            pos = _align(pos + size)
+        store._text = mm
+        store._nulls = set(meta["nulls"])
+        store._types = _Interner(meta["types"])
+        store._priorities = _Interner(meta["priorities"])
+        store._stakeholders = _Interner(meta["stakeholders"])
+        return store
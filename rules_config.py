@@ -0,0 +1,340 @@
+# rules_config.py
+# The class-diagram word lists and form mappings, read from a rules file
+# (mapping_rules.json, or ARGOS_RULES_FILE) instead of being hard-coded.
+# Usage:
+#   (venv) > python rules_config.py                         # validate + compile, print sizes and timings
+#   (venv) > python rules_config.py --file my_rules.json
+#
+# The file is compiled once into matcher structures (CompiledRules); edits are
+# picked up without a restart: current() looks at the file's mtime / size at
+# most every RELOAD_SECONDS and, if it changed, compiles the new contents and
+# swaps them in with one assignment. Callers take current() once and use that
+# object throughout, so a reload never mixes two versions in one diagram. A
+# file that does not validate is reported and the previous rules stay active.
+#
+# Compiled rules are pickled to ARGOS_RULES_CACHE, keyed by the sha256 of the
+# file plus COMPILER_VERSION, so a cold start with thousands of rules loads the
+# matchers instead of building them. Bump COMPILER_VERSION whenever compile()
+# or the matchers change.
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+import metrics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RULES_PATH = os.environ.get("ARGOS_RULES_FILE", os.path.join(HERE, "mapping_rules.json"))
+CACHE_DIR = os.environ.get("ARGOS_RULES_CACHE", os.path.join(HERE, ".rules_cache"))
+RELOAD_SECONDS = float(os.environ.get("ARGOS_RULES_RELOAD", "2"))  # 0 = never look for edits
+FORMAT_VERSION = 1
+COMPILER_VERSION = "1"
+
+# up to this many keys a matcher is one regex alternation; above it the regex
+# (which tries every alternative at every position) loses to an automaton
+REGEX_MAX_KEYS = 64
+
+
+# ---------------------------------------
+# MATCHERS
+# ---------------------------------------
+class _Automaton:
+    """
+    Aho-Corasick automaton over keys: one pass over the text finds every key
+    occurring in it. Nodes are plain lists / dicts, so it pickles and loads
+    at C speed.
+    """
+
+    def __init__(self, keys):
+        goto, fail, best = [{}], [0], [None]  # best: lowest key rank ending at the node
+        for rank, key in enumerate(keys):
+            node = 0
+            for ch in key:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    best.append(None)
+                node = nxt
+            if best[node] is None:
+                best[node] = rank
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                inherited = best[fail[nxt]]
+                if inherited is not None and (best[nxt] is None or inherited < best[nxt]):
+                    best[nxt] = inherited
+        self.goto, self.fail, self.best = goto, fail, best
+
+    def first_rank(self, text):
+        goto, fail, best = self.goto, self.fail, self.best
+        node, found = 0, None
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            rank = best[node]
+            if rank is not None and (found is None or rank < found):
+                found = rank
+                if rank == 0:
+                    break
+        return found
+
+
+class FirstKeyMatcher:
+    """
+    Compiled matcher over a list of substrings. first(text) returns the key
+    that comes earliest in the list among all keys occurring in text, i.e. the
+    same answer as `next((k for k in keys if k in text), None)`.
+    """
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self._rank = {k: i for i, k in enumerate(self.keys)}
+        self._automaton = _Automaton(self.keys) if len(self.keys) > REGEX_MAX_KEYS else None
+        self._compile()
+
+    def _compile(self):
+        self._any = self._pattern = None
+        if self._automaton is None and self.keys:
+            # zero-width lookahead so overlapping keys ("daily backups" / "daily backup") are all seen
+            alternation = "|".join(re.escape(k) for k in self.keys)
+            self._any = re.compile(alternation)
+            self._pattern = re.compile(f"(?=({alternation}))")
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_any"], state["_pattern"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._compile()
+
+    def first(self, text):
+        if self._automaton is not None:
+            rank = self._automaton.first_rank(text)
+            return None if rank is None else self.keys[rank]
+        if self._any is None:
+            return None
+        hit = self._any.search(text)
+        if hit is None:
+            return None
+        best = None
+        for m in self._pattern.finditer(text, hit.start()):
+            rank = self._rank[m.group(1)]
+            if best is None or rank < best:
+                best = rank
+                if rank == 0:
+                    break
+        return None if best is None else self.keys[best]
+
+    def any_in(self, text):
+        """Does any key occur in text?"""
+        if self._automaton is not None:
+            return self._automaton.first_rank(text) is not None
+        return self._any is not None and self._any.search(text) is not None
+
+
+# ---------------------------------------
+# COMPILE
+# ---------------------------------------
+class CompiledRules:
+    """One version of the rules file, ready to match with (treat as read-only)."""
+
+    def __init__(self, data, digest):
+        self.digest = digest
+        self.manual_mappings = {k: (v[0], v[1]) for k, v in data["manual_mappings"].items()}
+        self.mapping_matcher = FirstKeyMatcher(self.manual_mappings)
+        self.verbs = frozenset(data["verbs"])
+        self.stop_words = frozenset(data["stop_words"])
+        self.nouns = dict(data["nouns"])
+        self.noun_matcher = FirstKeyMatcher(self.nouns)
+        self.action_verbs = FirstKeyMatcher(data["action_verbs"])
+        self.default_attributes = {cls: frozenset(v) for cls, v in data["default_attributes"].items()}
+        self.default_methods = {cls: frozenset(v) for cls, v in data["default_methods"].items()}
+        self.functional_mapping = {k: dict(v) for k, v in data["functional_mapping"].items()}
+
+    def sizes(self):
+        return {"manual_mappings": len(self.manual_mappings), "verbs": len(self.verbs),
+                "stop_words": len(self.stop_words), "nouns": len(self.nouns),
+                "action_verbs": len(self.action_verbs.keys),
+                "default members": sum(map(len, self.default_attributes.values()))
+                + sum(map(len, self.default_methods.values())),
+                "functional_mapping": sum(map(len, self.functional_mapping.values()))}
+
+
+def _strings(value, where):
+    if not isinstance(value, list) or not all(isinstance(s, str) and s for s in value):
+        raise ValueError(f"{where}: expected a list of non-empty strings")
+
+
+def validate(data):
+    """Raise ValueError naming the first problem in a parsed rules file."""
+    if not isinstance(data, dict):
+        raise ValueError("rules file: expected a JSON object")
+    if data.get("version") != FORMAT_VERSION:
+        raise ValueError(f"version: expected {FORMAT_VERSION}, got {data.get('version')!r}")
+    for key in ("manual_mappings", "nouns", "default_attributes", "default_methods", "functional_mapping"):
+        if not isinstance(data.get(key), dict):
+            raise ValueError(f"{key}: expected an object")
+    for key in ("verbs", "stop_words", "action_verbs"):
+        _strings(data.get(key), key)
+    for phrase, target in data["manual_mappings"].items():
+        if not phrase or not (isinstance(target, list) and len(target) == 2 and isinstance(target[0], str)
+                              and target[0] and (target[1] is None or isinstance(target[1], str))):
+            raise ValueError(f"manual_mappings[{phrase!r}]: expected [\"name\", \"value\" or null]")
+    for noun, name in data["nouns"].items():
+        if not noun or not isinstance(name, str) or not name:
+            raise ValueError(f"nouns[{noun!r}]: expected a non-empty attribute name")
+    for key in ("default_attributes", "default_methods"):
+        for cls, members in data[key].items():
+            _strings(members, f"{key}[{cls!r}]")
+    for field, answers in data["functional_mapping"].items():
+        if not isinstance(answers, dict) or not all(isinstance(s, str) for s in answers.values()):
+            raise ValueError(f"functional_mapping[{field!r}]: expected {{\"answer\": \"sentence\"}}")
+
+
+def _digest(raw):
+    version = f"{COMPILER_VERSION}/{sys.version_info[0]}.{sys.version_info[1]}".encode()
+    return hashlib.sha256(version + b"\0" + raw).hexdigest()
+
+
+def compile_rules(raw, cache_dir=CACHE_DIR):
+    """Rules file bytes -> CompiledRules, from the compiled-artifact cache when it has them."""
+    digest = _digest(raw)
+    cached = os.path.join(cache_dir, f"{digest}.pickle") if cache_dir else None
+    if cached:
+        try:
+            with open(cached, "rb") as f:
+                rules = pickle.load(f)
+            if isinstance(rules, CompiledRules) and rules.digest == digest:
+                return rules
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+    data = json.loads(raw)
+    validate(data)
+    rules = CompiledRules(data, digest)
+    if cached:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f"{cached}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(rules, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cached)
+        except OSError:
+            pass  # read-only checkout: compile on every cold start
+    return rules
+
+
+# ---------------------------------------
+# CURRENT RULES (hot reload)
+# ---------------------------------------
+_current = None
+_stamp = None        # (mtime_ns, size) of the file _current came from
+_next_check = 0.0
+_lock = threading.Lock()
+reload_listeners = []  # fn(rules) after new rules were swapped in (cache eviction etc.)
+
+
+def on_reload(fn):
+    reload_listeners.append(fn)
+    return fn
+
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _load(path):
+    stamp = _file_stamp(path)
+    with open(path, "rb") as f:
+        raw = f.read()
+    return compile_rules(raw), stamp
+
+
+def _check(path):
+    global _current, _stamp, _next_check
+    if not _lock.acquire(blocking=_current is None):
+        return  # another thread is checking; it swaps the new rules in
+    try:
+        if _current is None:
+            _current, _stamp = _load(path)  # no rules to fall back on: errors propagate
+        else:
+            try:
+                if _file_stamp(path) == _stamp:
+                    return
+                rules, _stamp = _load(path)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ {path}: {e}; keeping the previous rules", file=sys.stderr)
+                metrics.inc("argos_rules_reloads_total", outcome="error")
+                try:
+                    _stamp = _file_stamp(path)  # report a broken file once, not on every check
+                except OSError:
+                    pass
+                return
+            if rules.digest != _current.digest:
+                _current = rules
+                metrics.inc("argos_rules_reloads_total", outcome="ok")
+                for listener in reload_listeners:
+                    listener(rules)
+    finally:
+        _next_check = time.monotonic() + RELOAD_SECONDS
+        _lock.release()
+
+
+def current(path=None):
+    """The active CompiledRules (the rules file is checked for edits every RELOAD_SECONDS)."""
+    if _current is None or (RELOAD_SECONDS and time.monotonic() >= _next_check):
+        _check(path or RULES_PATH)
+    return _current
+
+
+def reload(path=None):
+    """Check the rules file for edits now."""
+    global _next_check
+    _next_check = 0.0
+    return current(path)
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Validate and compile a mapping rules file")
+    parser.add_argument("--file", default=RULES_PATH)
+    parser.add_argument("--no-cache", action="store_true", help="compile without the artifact cache")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    try:
+        with open(args.file, "rb") as f:
+            raw = f.read()
+        cache_dir = None if args.no_cache else CACHE_DIR
+        start = time.perf_counter()
+        compiled = compile_rules(raw, cache_dir)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        compile_rules(raw, cache_dir)
+        second = time.perf_counter() - start
+    except (OSError, ValueError) as e:
+        print(f"❌ {args.file}: {e}")
+        sys.exit(1)
+    print(", ".join(f"{n} {name}" for name, n in compiled.sizes().items()))
+    print(f"✅ {args.file} ({compiled.digest[:12]}): loaded in {first * 1000:.1f} ms, "
+          f"again in {second * 1000:.1f} ms")
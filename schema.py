@@ -0,0 +1,238 @@
+# schema.py
+# Versioned schema for the project tables, for SQL Server and the SQLite stand-in.
+# Usage:
+#   (venv) > python schema.py              # apply pending migrations, print version
+#   (venv) > python schema.py --explain    # SQLite: show the query plans of the page queries
+#
+# db.py runs migrate() the first time a backend connects, so a fresh SQLite
+# file or in-memory database is ready to use. Migrations only ever get
+# appended; applied versions are recorded in SchemaVersion. Every process
+# (gunicorn and job workers) migrates on its first connect, so each migration
+# runs under a database-wide write lock (BEGIN IMMEDIATE on SQLite,
+# sp_getapplock on SQL Server) and the version is read again once it is held.
+
+MIGRATE_LOCK_MS = 60000
+
+
+def _sqlite_add_column(table, column, decl):
+    """An ALTER TABLE ADD COLUMN step that is skipped when the column exists already."""
+    def step(cursor):
+        cursor.execute(f"PRAGMA table_info({table})")
+        if column not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    return step
+
+
+MIGRATIONS = [
+    (1, "Users and Requirements tables", {
+        "sqlserver": [
+            """
+            IF OBJECT_ID('dbo.Users', 'U') IS NULL
+                CREATE TABLE dbo.Users (
+                    Email NVARCHAR(255) NOT NULL PRIMARY KEY,
+                    Password NVARCHAR(255) NOT NULL
+                )
+            """,
+            """
+            IF OBJECT_ID('dbo.Requirements', 'U') IS NULL
+                CREATE TABLE dbo.Requirements (
+                    Id INT IDENTITY(1,1) PRIMARY KEY,
+                    Type NVARCHAR(50),
+                    Description NVARCHAR(MAX),
+                    Priority NVARCHAR(20),
+                    Stakeholder NVARCHAR(50),
+                    SubmissionID INT
+                )
+            """,
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS Users (
+                Email TEXT PRIMARY KEY,
+                Password TEXT NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS Requirements (
+                Id INTEGER PRIMARY KEY AUTOINCREMENT,
+                Type TEXT,
+                Description TEXT,
+                Priority TEXT,
+                Stakeholder TEXT,
+                SubmissionID INTEGER
+            )
+            """,
+        ],
+    }),
+    # SubmissionIds hands out SubmissionIDs through IDENTITY, so two concurrent
+    # submits can never get the same ID. It is seeded with the current MAX once.
+    (2, "SubmissionIds identity table", {
+        "sqlserver": [
+            """
+            IF OBJECT_ID('dbo.SubmissionIds', 'U') IS NULL
+            BEGIN
+                CREATE TABLE dbo.SubmissionIds (SubmissionID INT IDENTITY(1,1) PRIMARY KEY);
+                SET IDENTITY_INSERT dbo.SubmissionIds ON;
+                INSERT INTO dbo.SubmissionIds (SubmissionID)
+                    SELECT ISNULL(MAX(SubmissionID), 0) FROM dbo.Requirements;
+                SET IDENTITY_INSERT dbo.SubmissionIds OFF;
+            END
+            """,
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS SubmissionIds (
+                SubmissionID INTEGER PRIMARY KEY AUTOINCREMENT
+            )
+            """,
+            """
+            INSERT INTO SubmissionIds (SubmissionID)
+                SELECT MAX(SubmissionID) FROM Requirements
+                HAVING MAX(SubmissionID) IS NOT NULL
+                   AND NOT EXISTS (SELECT 1 FROM SubmissionIds)
+            """,
+        ],
+    }),
+    # (SubmissionID, Type) covers the page query, its GROUP BY and MAX(SubmissionID);
+    # (Type) covers uml_generator's WHERE Type='Functional'.
+    (3, "covering indexes for the page and generator queries", {
+        "sqlserver": [
+            """
+            IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Requirements_Submission_Type')
+                CREATE INDEX IX_Requirements_Submission_Type
+                    ON dbo.Requirements (SubmissionID, Type) INCLUDE (Id, Description)
+            """,
+            """
+            IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Requirements_Type')
+                CREATE INDEX IX_Requirements_Type
+                    ON dbo.Requirements (Type) INCLUDE (Description)
+            """,
+        ],
+        "sqlite": [
+            "CREATE INDEX IF NOT EXISTS IX_Requirements_Submission_Type ON Requirements (SubmissionID, Type, Description)",
+            "CREATE INDEX IF NOT EXISTS IX_Requirements_Type ON Requirements (Type, Description)",
+        ],
+    }),
+    # salted hashes (credentials.py) are longer than the passwords stored before
+    (4, "room for password hashes", {
+        "sqlserver": [
+            "ALTER TABLE dbo.Users ALTER COLUMN Password NVARCHAR(255) NOT NULL",
+        ],
+        "sqlite": [],
+    }),
+    # SubmissionIds doubles as the directory of submissions (shards.py): who
+    # submitted (session["user"]) and which shard holds the rows. NULL Shard =
+    # rows written before sharding, in this database.
+    (5, "submission owner and shard", {
+        "sqlserver": [
+            """
+            IF COL_LENGTH('dbo.SubmissionIds', 'Owner') IS NULL
+                ALTER TABLE dbo.SubmissionIds ADD Owner NVARCHAR(255) NULL, Shard NVARCHAR(64) NULL
+            """,
+            """
+            IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_SubmissionIds_Owner')
+                CREATE INDEX IX_SubmissionIds_Owner ON dbo.SubmissionIds (Owner, SubmissionID) INCLUDE (Shard)
+            """,
+        ],
+        "sqlite": [
+            _sqlite_add_column("SubmissionIds", "Owner", "TEXT"),
+            _sqlite_add_column("SubmissionIds", "Shard", "TEXT"),
+            "CREATE INDEX IF NOT EXISTS IX_SubmissionIds_Owner ON SubmissionIds (Owner, SubmissionID, Shard)",
+        ],
+    }),
+]
+
+VERSION_TABLE = {
+    "sqlserver": """
+        IF OBJECT_ID('dbo.SchemaVersion', 'U') IS NULL
+            CREATE TABLE dbo.SchemaVersion (
+                Version INT NOT NULL PRIMARY KEY,
+                Description NVARCHAR(200),
+                AppliedAt DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME()
+            )
+    """,
+    "sqlite": """
+        CREATE TABLE IF NOT EXISTS SchemaVersion (
+            Version INTEGER PRIMARY KEY,
+            Description TEXT,
+            AppliedAt TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+}
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(cursor):
+    cursor.execute("SELECT MAX(Version) FROM dbo.SchemaVersion")
+    row = cursor.fetchone()
+    return row[0] if row and row[0] is not None else 0
+
+
+def _lock(cursor, dialect):
+    """Start a transaction holding the migration lock (released by its commit / rollback)."""
+    if dialect == "sqlite":
+        cursor.execute("BEGIN IMMEDIATE")
+    else:
+        # EXEC does not open an implicit transaction, and a Transaction-owned applock needs one
+        cursor.execute("IF @@TRANCOUNT = 0 BEGIN TRANSACTION; "
+                       "DECLARE @r INT; EXEC @r = sp_getapplock @Resource = 'argos_schema_migrate', "
+                       "@LockMode = 'Exclusive', @LockOwner = 'Transaction', @LockTimeout = ?; "
+                       "IF @r < 0 THROW 50000, 'schema migration lock not granted', 1;", (MIGRATE_LOCK_MS,))
+
+
+def migrate(conn, dialect, target=None):
+    """
+    Apply every migration newer than the recorded version (up to `target`),
+    each in its own transaction under the migration lock, so processes
+    starting together apply each one once. `conn` is a raw driver connection.
+    Returns the version the database is at afterwards.
+    """
+    target = LATEST_VERSION if target is None else target
+    cursor = conn.cursor()
+    try:
+        while True:
+            _lock(cursor, dialect)
+            cursor.execute(VERSION_TABLE[dialect])
+            version = current_version(cursor)  # another process may have moved it on
+            pending = [m for m in MIGRATIONS if version < m[0] <= target]
+            if not pending:
+                conn.commit()
+                break
+            number, description, statements = pending[0]
+            for sql in statements[dialect]:
+                if callable(sql):
+                    sql(cursor)
+                else:
+                    cursor.execute(sql)
+            cursor.execute("INSERT INTO dbo.SchemaVersion (Version, Description) VALUES (?, ?)",
+                           (number, description))
+            conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return version
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import db
+    import queries
+
+    parser = argparse.ArgumentParser(description="Apply schema migrations")
+    parser.add_argument("--explain", action="store_true", help="SQLite: print query plans of the page queries")
+    args = parser.parse_args()
+
+    pool = db.get_pool()  # connecting runs the migrations
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        print(f"✅ {pool.backend.name} schema at version {current_version(cursor)} (latest {LATEST_VERSION})")
+        if args.explain and pool.backend.name == "sqlite":
+            for label, sql, params in queries.explained_queries():
+                print(f"\n-- {label}")
+                for row in cursor.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall():
+                    print("  ", row[-1])
+        cursor.close()
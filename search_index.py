@@ -0,0 +1,428 @@
+# search_index.py
+# Full-text search over dbo.Requirements through a local inverted index.
+# Usage:
+#   (venv) > python search_index.py "recurring donations"                    # ranked matches
+#   (venv) > python search_index.py "payment" --type Functional --sid 12
+#   (venv) > python search_index.py --rebuild                                 # index from scratch
+#
+# Terms are the words the pipeline's tokenize stage gives (the same split the
+# statement_to_method rules work on). Each term has a posting list of
+# (document number, term frequency) in two arrays, in the order rows were
+# added; per document the index keeps shard, Id, SubmissionID, Type code and
+# length, so filters and ranking never go back to the database. Row Ids are
+# only unique per shard (shards.py): a document is (shard, Id).
+#
+# A query matches rows containing every term: the shortest posting list is
+# walked and the others are probed by binary search, then BM25 ranks the
+# matches. Cost follows the rarest term, not the table size; terms found in
+# over half the rows ("system", "shall") are skipped when rarer ones are given.
+#
+# The index catches up with `WHERE Id > last indexed Id` (an index seek) on
+# every shard in parallel before a search when it is older than
+# REFRESH_SECONDS, and on the submission's shard after every submit (ingest
+# listener, see app.py: it only marks the shard, a background thread catches
+# up, so /submit never waits for it), so rows written by other workers show
+# up too.
+# IDENTITY values are handed out before the commit, so a row can become
+# visible after higher Ids were indexed: each catch-up also lists the Ids of
+# the last RESCAN_IDS below the shard's watermark and adds the ones it has
+# not seen. Hits whose row is gone (deleted, or moved by shards.py
+# rebalance, which the catch-up on the new shard picks up again) are dropped
+# from the results and left out of later searches.
+# It is pickled to ARGOS_SEARCH_INDEX every SAVE_EVERY new rows (by the same
+# background thread, never during a request) and at exit, and the next
+# process starts from that file plus the rows written since.
+
+import argparse
+import atexit
+import heapq
+import math
+import os
+import pickle
+import sys
+import threading
+import time
+import traceback
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+import metrics
+import shards
+import uml_pipeline
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INDEX_PATH = os.environ.get("ARGOS_SEARCH_INDEX", os.path.join(HERE, "search_index.pickle"))
+REFRESH_SECONDS = 1.0
+SAVE_EVERY = 10000  # rows added since the last save
+RESCAN_IDS = 1000   # Ids below the watermark checked again for late commits
+FORMAT_VERSION = 2
+
+COMMON_FRACTION = 0.5  # terms in more rows than this are dropped from queries that have rarer ones
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+SELECT_SINCE = "SELECT Id, SubmissionID, Type, Description FROM dbo.Requirements WHERE Id > ? ORDER BY Id"
+SELECT_WINDOW_IDS = "SELECT Id FROM dbo.Requirements WHERE Id > ? AND Id <= ?"
+SELECT_BY_IDS = "SELECT Id, SubmissionID, Type, Description FROM dbo.Requirements WHERE Id IN ({})"
+IN_CHUNK = 500
+
+
+def terms(text):
+    """Index / query terms of one text: the pipeline's word split of its clean_text form."""
+    return uml_pipeline.tokenize_one(uml_pipeline.Statement(False, text or "")).words
+
+
+class SearchIndex:
+    def __init__(self):
+        self.doc_shards = array("H")
+        self.doc_ids = array("q")
+        self.doc_sids = array("q")
+        self.doc_types = array("H")
+        self.doc_lens = array("H")
+        self.types = []        # Type code -> Type
+        self.shard_names = []  # shard code -> shard name
+        self.postings = {}     # term -> (array('I') document numbers, array('H') term frequencies)
+        self.total_len = 0
+        self.last_ids = {}     # shard name -> last Id indexed
+        self.unsaved = 0
+        self.recent = {}       # shard name -> Ids indexed within RESCAN_IDS of its last Id
+        self.dropped = set()   # (shard name, Id) indexed whose row no longer exists
+        self._type_codes = {}
+        self._shard_codes = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def last_id(self, shard_name):
+        return self.last_ids.get(shard_name, 0)
+
+    def add(self, shard_name, rid, sid, rtype, text):
+        words = terms(text)
+        with self._lock:
+            doc = len(self.doc_ids)
+            code = self._type_codes.get(rtype)
+            if code is None:
+                code = self._type_codes[rtype] = len(self.types)
+                self.types.append(rtype)
+            shard_code = self._shard_codes.get(shard_name)
+            if shard_code is None:
+                shard_code = self._shard_codes[shard_name] = len(self.shard_names)
+                self.shard_names.append(shard_name)
+            self.doc_shards.append(shard_code)
+            self.doc_ids.append(rid)
+            self.doc_sids.append(sid or 0)
+            self.doc_types.append(code)
+            self.doc_lens.append(min(len(words), 0xFFFF))
+            self.total_len += len(words)
+            for term, tf in Counter(words).items():
+                posting = self.postings.get(term)
+                if posting is None:
+                    posting = self.postings[term] = (array("I"), array("H"))
+                posting[0].append(doc)
+                posting[1].append(min(tf, 0xFFFF))
+            self.last_ids[shard_name] = max(self.last_id(shard_name), rid)
+            self.recent.setdefault(shard_name, set()).add(rid)
+            self.unsaved += 1
+
+    def prune_recent(self):
+        with self._lock:
+            self.recent = {name: {rid for rid in ids if rid > self.last_id(name) - RESCAN_IDS}
+                           for name, ids in self.recent.items()}
+
+    def drop(self, keys):
+        """Leave these (shard name, Id) out of later results (their rows are gone)."""
+        with self._lock:
+            self.dropped.update(keys)
+            self.unsaved += len(keys)
+
+    def search(self, query, limit=20, sid=None, rtype=None, sids=None):
+        """
+        [(score, shard name, Id, SubmissionID, Type)] of rows containing every
+        query term, best first; `sids` limits them to a set of SubmissionIDs.
+        """
+        wanted = list(dict.fromkeys(terms(query)))
+        if not wanted:
+            return []
+        with self._lock:
+            lists = [self.postings.get(t) for t in wanted]
+            if any(p is None for p in lists):
+                return []
+            type_code = None
+            if rtype is not None:
+                type_code = self._type_codes.get(rtype)
+                if type_code is None:
+                    return []
+            n = len(self.doc_ids)
+            avg_len = self.total_len / n if n else 1.0
+            lists.sort(key=lambda p: len(p[0]))
+            # "the", "system", "shall" are in nearly every row: probing them costs
+            # time and (idf ~ 0) changes no ranking
+            rare = [p for p in lists if len(p[0]) <= n * COMMON_FRACTION]
+            lists = rare or lists[:1]
+            idfs = [math.log(1 + (n - len(p[0]) + 0.5) / (len(p[0]) + 0.5)) for p in lists]
+            rarest_docs, rarest_tfs = lists[0]
+            others = list(zip(lists[1:], idfs[1:]))
+            doc_ids, doc_sids, doc_types, doc_lens = self.doc_ids, self.doc_sids, self.doc_types, self.doc_lens
+            doc_shards, shard_names, dropped = self.doc_shards, self.shard_names, self.dropped
+
+            def scored():
+                for doc, tf in zip(rarest_docs, rarest_tfs):
+                    if sid is not None and doc_sids[doc] != sid:
+                        continue
+                    if sids is not None and doc_sids[doc] not in sids:
+                        continue
+                    if type_code is not None and doc_types[doc] != type_code:
+                        continue
+                    if dropped and (shard_names[doc_shards[doc]], doc_ids[doc]) in dropped:
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lens[doc] / avg_len)
+                    score = idfs[0] * tf * (BM25_K1 + 1) / (tf + norm)
+                    for (docs, tfs), idf in others:
+                        i = bisect_left(docs, doc)
+                        if i == len(docs) or docs[i] != doc:
+                            break
+                        score += idf * tfs[i] * (BM25_K1 + 1) / (tfs[i] + norm)
+                    else:
+                        yield score, doc
+
+            best = heapq.nlargest(limit, scored(), key=lambda sd: (sd[0], -sd[1]))
+            return [(score, self.shard_names[self.doc_shards[doc]], self.doc_ids[doc], self.doc_sids[doc],
+                     self.types[self.doc_types[doc]])
+                    for score, doc in best]
+
+    # --- persistence ---
+    def save(self, path=INDEX_PATH):
+        with self._lock:
+            state = {"version": FORMAT_VERSION, "doc_shards": self.doc_shards, "doc_ids": self.doc_ids,
+                     "doc_sids": self.doc_sids, "doc_types": self.doc_types, "doc_lens": self.doc_lens,
+                     "types": self.types, "shard_names": self.shard_names, "postings": self.postings,
+                     "total_len": self.total_len, "last_ids": self.last_ids, "dropped": self.dropped}
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+            self.unsaved = 0
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        """The index saved at path, or None if there is none (or it is from another version)."""
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if not isinstance(state, dict) or state.get("version") != FORMAT_VERSION:
+            return None
+        index = cls()
+        for name in ("doc_shards", "doc_ids", "doc_sids", "doc_types", "doc_lens", "types", "shard_names",
+                     "postings", "total_len", "last_ids", "dropped"):
+            setattr(index, name, state[name])
+        index._type_codes = {t: i for i, t in enumerate(index.types)}
+        index._shard_codes = {name: i for i, name in enumerate(index.shard_names)}
+        for code, rid in zip(index.doc_shards, index.doc_ids):
+            name = index.shard_names[code]
+            if rid > index.last_id(name) - RESCAN_IDS:
+                index.recent.setdefault(name, set()).add(rid)
+        return index
+
+
+# ---------------------------------------
+# SHARED INDEX OVER dbo.Requirements
+# ---------------------------------------
+_index = None
+_index_lock = threading.Lock()
+_refreshed = 0.0
+_refresh_lock = threading.Lock()  # one catch-up at a time, or rows would be added twice
+
+
+def refresh(index, batch_size=5000, wait=True, only=None):
+    """Add the rows written since the index's last Id of every shard (or `only` these). Returns the number added."""
+    if not _refresh_lock.acquire(blocking=wait):
+        return 0  # another thread is catching up already
+    try:
+        return _refresh(index, batch_size, only)
+    finally:
+        _refresh_lock.release()
+
+
+def _refresh(index, batch_size, only=None):
+    global _refreshed
+    added = sum(n for _, n in shards.fan_out(lambda shard: _refresh_shard(index, shard, batch_size), only))
+    index.prune_recent()
+    if only is None:
+        _refreshed = time.monotonic()
+    if index.unsaved >= SAVE_EVERY:
+        _wake_catch_up()  # saves off the request path
+    return added
+
+
+def _refresh_shard(index, shard, batch_size):
+    added = 0
+    last_id, recent = index.last_id(shard.name), index.recent.get(shard.name, set())
+    with shard.connection() as conn:
+        cursor = conn.cursor()
+        # rows below the watermark that committed after it moved past them
+        with metrics.timed("argos_db_query_seconds", query="search_index_window"):
+            cursor.execute(SELECT_WINDOW_IDS, (last_id - RESCAN_IDS, last_id))
+            late = [rid for (rid,) in cursor.fetchall() if rid not in recent]
+        for i in range(0, len(late), IN_CHUNK):
+            chunk = late[i:i + IN_CHUNK]
+            cursor.execute(SELECT_BY_IDS.format(", ".join("?" * len(chunk))), chunk)
+            for rid, sid, rtype, desc in cursor.fetchall():
+                index.add(shard.name, rid, sid, rtype, desc)
+                added += 1
+        with metrics.timed("argos_db_query_seconds", query="search_index_since"):
+            cursor.execute(SELECT_SINCE, (last_id,))
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for rid, sid, rtype, desc in batch:
+                index.add(shard.name, rid, sid, rtype, desc)
+            added += len(batch)
+        cursor.close()
+    return added
+
+
+def _max_id(shard):
+    with shard.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(Id) FROM dbo.Requirements")
+        row = cursor.fetchone()
+        cursor.close()
+    return (row[0] if row else None) or 0
+
+
+def _save_at_exit():
+    if _index is not None and _index.unsaved:
+        _index.save()
+
+
+def get_index(rebuild=False):
+    """The shared index: loaded from INDEX_PATH (or built), then caught up with the table."""
+    global _index
+    with _index_lock:
+        if _index is None or rebuild:
+            index = None if rebuild else SearchIndex.load()
+            if index is not None and any(index.last_id(shard.name) > max_id
+                                         for shard, max_id in shards.fan_out(_max_id)):
+                index = None  # a table was reset or restored: start over
+            index = index or SearchIndex()
+            refresh(index)
+            if _index is None:
+                atexit.register(_save_at_exit)
+            _index = index
+    return _index
+
+
+# ---------------------------------------
+# BACKGROUND CATCH-UP
+# ---------------------------------------
+_dirty = {}  # shard name -> Shard with rows the index has not caught up with
+_dirty_lock = threading.Lock()
+_wake = threading.Event()
+_catch_up_thread = None
+
+
+def _wake_catch_up():
+    global _catch_up_thread
+    with _dirty_lock:
+        if _catch_up_thread is None:
+            _catch_up_thread = threading.Thread(target=_catch_up_loop, daemon=True, name="search-index")
+            _catch_up_thread.start()
+    _wake.set()
+
+
+def _catch_up_loop():
+    while True:
+        _wake.wait()
+        _wake.clear()
+        with _dirty_lock:
+            dirty = list(_dirty.values())
+            _dirty.clear()
+        index = _index
+        if index is None:
+            continue
+        try:
+            if dirty:
+                refresh(index, only=dirty)
+            if index.unsaved >= SAVE_EVERY:
+                index.save()
+        except Exception:
+            print("⚠️ search index catch-up failed:", file=sys.stderr)
+            traceback.print_exc()
+
+
+def _forget_thread_after_fork():
+    global _catch_up_thread, _dirty_lock, _wake
+    _catch_up_thread, _dirty_lock, _wake = None, threading.Lock(), threading.Event()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_thread_after_fork)
+
+
+def index_submission(sid):
+    """ingest listener: mark the submission's shard for the background catch-up, if this process has the index loaded."""
+    if _index is None:
+        return
+    shard = shards.for_submission(sid)
+    with _dirty_lock:
+        _dirty[shard.name] = shard
+    _wake_catch_up()
+
+
+def search(query, limit=20, sid=None, rtype=None, owner=None):
+    """
+    Ranked requirements: [{"score", "shard", "id", "submission_id", "type", "description"}];
+    with `owner`, only from that user's submissions.
+    """
+    index = get_index()
+    if time.monotonic() - _refreshed > REFRESH_SECONDS:
+        refresh(index, wait=False)
+    sids = shards.owner_submission_ids(owner) if owner is not None else None
+    hits = index.search(query, limit, sid, rtype, sids)
+    if not hits:
+        return []
+    descs = shards.rows_by_id("SELECT Id, Description FROM dbo.Requirements WHERE Id IN ({})",
+                              [(name, rid) for _, name, rid, _, _ in hits])
+    gone = [(name, rid) for _, name, rid, _, _ in hits if (name, rid) not in descs]
+    if gone:
+        index.drop(gone)
+    return [{"score": round(score, 3), "shard": name, "id": rid, "submission_id": hit_sid, "type": hit_type,
+             "description": descs[(name, rid)][1]}
+            for score, name, rid, hit_sid, hit_type in hits if (name, rid) in descs]
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Search dbo.Requirements through the inverted index")
+    parser.add_argument("query", nargs="?")
+    parser.add_argument("--sid", type=int, default=None, help="only this SubmissionID")
+    parser.add_argument("--type", default=None, help="only this Type, e.g. Functional")
+    parser.add_argument("--owner", default=None, help="only this user's submissions")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--rebuild", action="store_true", help="index the whole table again")
+    args = parser.parse_args(argv)
+    if not args.query and not args.rebuild:
+        parser.error("give a query or --rebuild")
+    return args
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    start = time.perf_counter()
+    index = get_index(rebuild=args.rebuild)
+    if args.rebuild:
+        index.save()
+        print(f"✅ {len(index)} requirements, {len(index.postings)} terms indexed "
+              f"in {time.perf_counter() - start:.2f}s -> {INDEX_PATH}")
+    if args.query:
+        start = time.perf_counter()
+        hits = search(args.query, args.limit, args.sid, args.type, args.owner)
+        for hit in hits:
+            print(f"{hit['score']:6.2f}  {shards.row_label(hit['shard'], hit['id'])} "
+                  f"(SubmissionID {hit['submission_id']}, {hit['type']})  "
+                  f"{hit['description']}")
+        print(f"{len(hits)} result(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,72 @@
+# server.py
+# Production entry point for the Flask app (app.run(debug=True) is for development only).
+# Usage:
+#   (venv) > python server.py                                   # waitress, 16 worker threads, port 8000
+#   (venv) > python server.py --threads 32 --port 80
+#   $ python server.py --server gunicorn --workers 4 --threads 8   # Linux: processes x threads
+#
+# waitress keeps sockets on one asynchronous I/O loop and hands each request
+# to a bounded pool of worker threads, so slow pyodbc round trips only ever
+# block a worker thread (pyodbc releases the GIL while it waits on the server).
+# The DB connection pool is sized to the worker threads, so a request never
+# waits for a connection that another idle request is holding.
+#
+# gunicorn with --workers > 1 runs separate processes: point ARGOS_SQLITE_PATH
+# at a file (an in-memory SQLite database would be private to each worker).
+# The per-process unknown-email login cache is turned off then.
+
+import argparse
+import os
+
+
+def _serve_waitress(app, args):
+    from waitress import serve
+    serve(app, host=args.host, port=args.port, threads=args.threads,
+          connection_limit=args.connection_limit, ident="argos")
+
+
+def _serve_gunicorn(app, args):
+    from gunicorn.app.base import BaseApplication
+
+    class ArgosApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{args.host}:{args.port}")
+            self.cfg.set("workers", args.workers)
+            self.cfg.set("threads", args.threads)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("worker_connections", args.connection_limit)
+
+        def load(self):
+            return app
+
+    ArgosApplication().run()
+
+
+SERVERS = {"waitress": _serve_waitress, "gunicorn": _serve_gunicorn}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the ARGOS web app")
+    parser.add_argument("--server", choices=sorted(SERVERS), default="waitress")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--threads", type=int, default=16, help="request worker threads (per process)")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn worker processes")
+    parser.add_argument("--connection-limit", type=int, default=1000, help="open client sockets")
+    args = parser.parse_args(argv)
+
+    # one pooled DB connection per worker thread; must be set before db is imported
+    os.environ.setdefault("ARGOS_DB_POOL_SIZE", str(args.threads))
+    if args.server == "gunicorn" and args.workers > 1:
+        # credentials.py's unknown-email cache is per process: a user registered
+        # on one worker would be turned away by the others until it expires
+        os.environ["ARGOS_LOGIN_NEGATIVE_TTL"] = "0"
+    from app import app
+
+    print(f"🚀 ARGOS on http://{args.host}:{args.port} ({args.server}, "
+          f"{args.workers} process(es) x {args.threads} threads)")
+    SERVERS[args.server](app, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,522 @@
+# shards.py
+# Submissions spread over several databases ("shards"), placed per user by consistent hashing.
+# Usage:
+#   (venv) > python shards.py report                        # per-shard totals, queried in parallel
+#   (venv) > python shards.py where --owner ali@example.com # shard of a user (or --sid 12)
+#   (venv) > python shards.py rebalance --dry-run           # what would move after editing shards.json
+#   (venv) > python shards.py rebalance
+#
+# Without a shards file (ARGOS_SHARDS_FILE, default shards.json) there is one
+# shard, MAIN: the database of db.py, and everything works as before.
+#
+# The main database is also the directory: SubmissionIds (schema.py) hands out
+# the IDs and records each submission's Owner (session["user"]) and the Shard
+# holding its rows. A new submission goes to the shard its owner hashes to on
+# the ring (VNODES points per unit of weight, so adding a shard moves about
+# 1/N of the owners, not all of them). Reading one submission looks its shard
+# up in the directory (a primary key seek), so reads stay right while a
+# rebalance is moving rows; rows from before sharding (Shard NULL) are in the
+# main database. The directory entry of a submission on another shard is
+# committed before its rows, and deleted again when they roll back.
+#
+# rebalance moves every submission whose recorded shard is not where its owner
+# hashes to now: copy the rows and commit, point the directory at the new
+# shard, then delete the old rows. A run that stops half way is run again. To
+# retire a shard, give it weight 0, rebalance, then take it out of the file.
+#
+# Cross-user reads (latest submission, generate --all, bulk export,
+# extractor.py, aggregate.py, report) go to every shard; fan_out() runs one
+# call per shard in parallel threads. Row Ids are only unique per shard, so
+# the search and similarity indexes key rows on (shard, Id) and catch up
+# shard by shard, and extractor.py checkpoints the last Id per shard.
+#
+# shards.json:
+#   {"version": 1,
+#    "shards": {"main": null,
+#               "s1": "shards/s1.db",
+#               "s2": {"location": "shards/s2.db", "weight": 2}}}
+# A location is a SQLite path (relative to the file) or a SQL Server
+# connection string, for the backend db.py uses; "main" is always db.py's
+# database (listing it with a weight puts it on the ring, the default is 0).
+
+import argparse
+import bisect
+import hashlib
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import db
+import metrics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SHARDS_FILE = os.environ.get("ARGOS_SHARDS_FILE", os.path.join(HERE, "shards.json"))
+FAN_OUT_WORKERS = int(os.environ.get("ARGOS_SHARD_WORKERS", "8"))
+FORMAT_VERSION = 1
+MAIN = "main"
+VNODES = 64          # ring points per unit of weight
+MOVE_BATCH = 200     # submissions per copy / delete (stays under SQL Server's 2100 parameters)
+
+SUBMISSION_SHARD = "SELECT Shard FROM dbo.SubmissionIds WHERE SubmissionID = ?"
+OWNER_LATEST = "SELECT MAX(SubmissionID) FROM dbo.SubmissionIds WHERE Owner = ?"
+SUBMISSION_OWNER = "SELECT Owner FROM dbo.SubmissionIds WHERE SubmissionID = ?"
+OWNER_SUBMISSIONS = "SELECT SubmissionID FROM dbo.SubmissionIds WHERE Owner = ?"
+SHARD_LATEST = "SELECT MAX(SubmissionID) FROM dbo.Requirements"
+
+
+def _backend_name():
+    """The backend of db.py's active pool (after db.configure() too): shards use the same driver."""
+    return db.get_pool().backend.name
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class Shard:
+    """One database holding Requirements rows; location None is db.py's own database."""
+
+    def __init__(self, name, location=None, weight=1):
+        self.name = name
+        self.location = location
+        self.weight = weight
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_main(self):
+        return self.location is None
+
+    @property
+    def pool(self):
+        if self.location is None:
+            return db.get_pool()  # follows db.configure()
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    backend_name = _backend_name()
+                    if backend_name == "sqlserver":
+                        backend = db.make_backend(backend_name, conn_str=self.location)
+                    else:
+                        if self.location != ":memory:" and os.path.dirname(self.location):
+                            os.makedirs(os.path.dirname(self.location), exist_ok=True)
+                        backend = db.make_backend(backend_name, path=self.location)
+                    self._pool = db.ConnectionPool(backend)
+        return self._pool
+
+    def connection(self):
+        """db.connection() on this shard: commit on success, roll back on error."""
+        return self.pool.connection()
+
+    def __repr__(self):
+        return f"Shard({self.name!r})"
+
+
+class ShardMap:
+    """The configured shards and the hash ring new submissions are placed with."""
+
+    def __init__(self, shards, vnodes=VNODES):
+        self.shards = {shard.name: shard for shard in shards}
+        if MAIN not in self.shards:
+            self.shards[MAIN] = Shard(MAIN, weight=0)  # unsharded rows stay readable
+        points = sorted((_hash(f"{shard.name}#{i}"), shard.name)
+                        for shard in self.shards.values() for i in range(shard.weight * vnodes))
+        if not points:
+            raise ValueError("shards: at least one shard needs a weight above 0")
+        self._hashes = [h for h, _ in points]
+        self._names = [name for _, name in points]
+
+    @property
+    def sharded(self):
+        return len(self.shards) > 1
+
+    def all(self):
+        return list(self.shards.values())
+
+    def get(self, name):
+        shard = self.shards.get(name or MAIN)
+        if shard is None:
+            raise KeyError(f"shard {name!r} holds submissions but is not in {SHARDS_FILE}")
+        return shard
+
+    def shard_for(self, owner):
+        """The shard an owner's new submissions go to (owner None: bulk imports etc.)."""
+        i = bisect.bisect(self._hashes, _hash(owner or "")) % len(self._hashes)
+        return self.shards[self._names[i]]
+
+    def ring_share(self):
+        """{shard name: fraction of the hash space (≈ of the owners) it gets}."""
+        share = dict.fromkeys(self.shards, 0.0)
+        previous = self._hashes[-1] - 2 ** 64
+        for h, name in zip(self._hashes, self._names):
+            share[name] += (h - previous) / 2 ** 64
+            previous = h
+        return share
+
+
+def load(path=None):
+    """ShardMap from a shards file; a missing file means the one MAIN shard."""
+    path = path or SHARDS_FILE
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return ShardMap([Shard(MAIN)])
+    if not isinstance(data, dict) or data.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{path}: expected {{\"version\": {FORMAT_VERSION}, \"shards\": {{...}}}}")
+    if not isinstance(data.get("shards"), dict) or not data["shards"]:
+        raise ValueError(f"{path}: shards: expected an object of name -> location")
+    shards = []
+    for name, spec in data["shards"].items():
+        if not name or len(name) > 64:
+            raise ValueError(f"{path}: shard names must be 1-64 characters")
+        if not isinstance(spec, dict):
+            spec = {"location": spec}
+        location, weight = spec.get("location"), spec.get("weight", 0 if name == MAIN else 1)
+        if not isinstance(weight, int) or weight < 0:
+            raise ValueError(f"{path}: shards[{name!r}]: weight must be a whole number >= 0")
+        if name == MAIN:
+            if location is not None:
+                raise ValueError(f"{path}: shards[{MAIN!r}] is db.py's database; its location must be null")
+        elif not isinstance(location, str) or not location:
+            raise ValueError(f"{path}: shards[{name!r}]: expected a SQLite path or a connection string")
+        elif _backend_name() == "sqlite" and location != ":memory:" and not os.path.isabs(location):
+            location = os.path.join(os.path.dirname(os.path.abspath(path)), location)
+        shards.append(Shard(name, location, weight))
+    return ShardMap(shards, data.get("vnodes", VNODES))
+
+
+_map = None
+_map_lock = threading.Lock()
+
+
+def get_map():
+    global _map
+    if _map is None:
+        with _map_lock:
+            if _map is None:
+                _map = load()
+    return _map
+
+
+def get(name):
+    return get_map().get(name)
+
+
+def shard_for(owner):
+    return get_map().shard_for(owner)
+
+
+# ---------------------------------------
+# WRITES
+# ---------------------------------------
+def new_submission_ids(cursor, owner, shard, n=1):
+    """
+    Allocate n SubmissionIDs for rows going to `shard` (cursor is a connection
+    on it). On MAIN this is part of the caller's transaction, like before;
+    for another shard the directory entries are committed first, and the
+    caller hands them to discard_submission_ids() if its rows do not commit.
+    """
+    if shard.is_main:
+        return [db.next_submission_id(cursor, owner, shard.name) for _ in range(n)]
+    with db.connection() as conn:
+        directory = conn.cursor()
+        ids = [db.next_submission_id(directory, owner, shard.name) for _ in range(n)]
+        directory.close()
+    return ids
+
+
+def discard_submission_ids(shard, sids):
+    """Remove the directory entries of new SubmissionIDs whose rows were rolled back on `shard`."""
+    if shard.is_main or not sids:
+        return  # rolled back with the rows
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        for i in range(0, len(sids), MOVE_BATCH):
+            part = sids[i:i + MOVE_BATCH]
+            cursor.execute(f"DELETE FROM dbo.SubmissionIds WHERE SubmissionID IN ({', '.join('?' * len(part))})",
+                           part)
+        cursor.close()
+
+
+# ---------------------------------------
+# READS
+# ---------------------------------------
+def for_submission(sid):
+    """The shard holding a submission's rows (looked up in the directory)."""
+    shard_map = get_map()
+    if not shard_map.sharded:
+        return shard_map.get(MAIN)
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        with metrics.timed("argos_db_query_seconds", query="submission_shard"):
+            cursor.execute(SUBMISSION_SHARD, (sid,))
+            row = cursor.fetchone()
+        cursor.close()
+    return shard_map.get(row[0] if row else None)
+
+
+def submission_connection(sid):
+    """db.connection() on the shard holding SubmissionID sid."""
+    return for_submission(sid).connection()
+
+
+def fan_out(fn, shards=None, workers=None):
+    """[(shard, fn(shard))] for every shard (or `shards`), run in parallel threads."""
+    shards = get_map().all() if shards is None else list(shards)
+    if len(shards) <= 1:
+        return [(shard, fn(shard)) for shard in shards]
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(len(shards), workers or FAN_OUT_WORKERS)) as pool:
+        return list(zip(shards, pool.map(fn, shards)))
+
+
+def _scalar(shard, sql, params=(), label=None):
+    with shard.connection() as conn:
+        cursor = conn.cursor()
+        with metrics.timed("argos_db_query_seconds", query=label or "shard_scalar"):
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        cursor.close()
+    return row[0] if row else None
+
+
+def latest_submission_id(owner=None):
+    """
+    The owner's newest SubmissionID (an index seek in the directory), or with
+    owner=None the newest one with rows on any shard.
+    """
+    if owner is not None:
+        return _scalar(get_map().get(MAIN), OWNER_LATEST, (owner,), "owner_latest_submission")
+    found = [sid for _, sid in fan_out(lambda shard: _scalar(shard, SHARD_LATEST, (), "latest_submission"))
+             if sid is not None]
+    return max(found, default=None)
+
+
+def rows_by_id(query, keys, chunk=MOVE_BATCH):
+    """
+    {(shard name, Id): row} for `keys` [(shard name, Id)], each shard queried
+    in parallel; `query` selects Id first and has "{}" for the IN list. Keys
+    missing from the result are rows that are gone (or on a shard no longer
+    configured).
+    """
+    shard_map = get_map()
+    wanted = defaultdict(list)
+    for name, rid in keys:
+        if name in shard_map.shards:
+            wanted[name].append(rid)
+
+    def fetch(shard):
+        ids, found = wanted[shard.name], {}
+        with shard.connection() as conn:
+            cursor = conn.cursor()
+            for i in range(0, len(ids), chunk):
+                part = ids[i:i + chunk]
+                cursor.execute(query.format(", ".join("?" * len(part))), part)
+                found.update((row[0], row) for row in cursor.fetchall())
+            cursor.close()
+        return found
+
+    return {(shard.name, rid): row
+            for shard, found in fan_out(fetch, [shard_map.get(name) for name in wanted])
+            for rid, row in found.items()}
+
+
+def row_label(shard_name, rid):
+    """"#12" for a row of the main database, "s1#12" for one on another shard."""
+    return f"#{rid}" if shard_name == MAIN else f"{shard_name}#{rid}"
+
+
+def submission_owner(sid):
+    """Who submitted SubmissionID sid (None: unknown, or from before owners were recorded)."""
+    return _scalar(get_map().get(MAIN), SUBMISSION_OWNER, (sid,), "submission_owner")
+
+
+def owner_submission_ids(owner):
+    """The set of SubmissionIDs `owner` submitted (an index range scan in the directory)."""
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        with metrics.timed("argos_db_query_seconds", query="owner_submissions"):
+            cursor.execute(OWNER_SUBMISSIONS, (owner,))
+            sids = {sid for (sid,) in cursor.fetchall()}
+        cursor.close()
+    return sids
+
+
+def _stream(shard, query, params, batch_size):
+    with shard.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield from batch
+        cursor.close()
+
+
+def merged_rows(query, params=(), column=0, batch_size=5000):
+    """
+    Rows of `query` from every shard as one stream ordered by row[column]
+    (the query must ORDER BY that column; NULLs first, as the databases sort
+    them). Each shard is read through its own streaming cursor.
+    """
+    streams = [_stream(shard, query, params, batch_size) for shard in get_map().all()]
+    if len(streams) == 1:
+        return streams[0]
+    return heapq.merge(*streams, key=lambda row: (row[column] is not None, row[column]))
+
+
+# ---------------------------------------
+# REBALANCE
+# ---------------------------------------
+def plan(shard_map=None, batch_size=5000):
+    """{(from shard, to shard): [SubmissionID]} of submissions not where their owner hashes to."""
+    shard_map = shard_map or get_map()
+    placed = {}  # owner -> target shard name
+    moves = defaultdict(list)
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT SubmissionID, Owner, Shard FROM dbo.SubmissionIds ORDER BY SubmissionID")
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for sid, owner, shard in batch:
+                target = placed.get(owner)
+                if target is None:
+                    target = placed[owner] = shard_map.shard_for(owner).name
+                if (shard or MAIN) != target:
+                    moves[(shard or MAIN, target)].append(sid)
+        cursor.close()
+    return dict(moves)
+
+
+def move(source, target, sids):
+    """Move the rows of `sids` from one shard to another; returns the rows moved."""
+    import ingest  # ingest routes through this module
+
+    placeholders = ", ".join("?" * len(sids))
+    where = f" WHERE SubmissionID IN ({placeholders})"
+    with source.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT Type, Description, Priority, Stakeholder, SubmissionID FROM dbo.Requirements"
+                       + where + " ORDER BY Id", sids)
+        rows = cursor.fetchall()
+        cursor.close()
+    with target.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM dbo.Requirements" + where, sids)  # left by an interrupted run
+        if rows:
+            cursor.fast_executemany = True
+            cursor.executemany(ingest.INSERT_REQUIREMENT, [tuple(row) for row in rows])
+        cursor.close()
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE dbo.SubmissionIds SET Shard = ?" + where, [target.name, *sids])
+        cursor.close()
+    with source.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM dbo.Requirements" + where, sids)
+        cursor.close()
+    return len(rows)
+
+
+def rebalance(dry_run=False, batch=MOVE_BATCH, shard_map=None):
+    """Move misplaced submissions to their owners' shards; returns {(from, to): (submissions, rows)}."""
+    shard_map = shard_map or get_map()
+    done = {}
+    for (source, target), sids in sorted(plan(shard_map).items()):
+        rows = 0
+        if not dry_run:
+            for i in range(0, len(sids), batch):
+                rows += move(shard_map.get(source), shard_map.get(target), sids[i:i + batch])
+        done[(source, target)] = (len(sids), rows)
+    return done
+
+
+# ---------------------------------------
+# REPORT
+# ---------------------------------------
+def report(shard_map=None):
+    """[{shard, location, share, submissions, owners, requirements, ms}], each shard queried in parallel."""
+    shard_map = shard_map or get_map()
+
+    def counts(shard):
+        start = time.perf_counter()
+        with shard.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(DISTINCT SubmissionID), COUNT(*) FROM dbo.Requirements")
+            submissions, rows = cursor.fetchone()
+            cursor.close()
+        return submissions, rows, (time.perf_counter() - start) * 1000
+
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT Shard, COUNT(DISTINCT Owner) FROM dbo.SubmissionIds GROUP BY Shard")
+        owners = defaultdict(int)
+        for name, n in cursor.fetchall():
+            owners[name or MAIN] += n
+        cursor.close()
+    share = shard_map.ring_share()
+    return [{"shard": shard.name, "location": shard.location or "(db.py)", "share": share[shard.name],
+             "submissions": submissions, "owners": owners[shard.name], "requirements": rows, "ms": ms}
+            for shard, (submissions, rows, ms) in fan_out(counts, shard_map.all())]
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Per-user sharding of dbo.Requirements")
+    parser.add_argument("--file", default=SHARDS_FILE, help="shards file (default: ARGOS_SHARDS_FILE)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("report", help="per-shard totals (shards queried in parallel)")
+    where = sub.add_parser("where", help="which shard a user / submission is on")
+    group = where.add_mutually_exclusive_group(required=True)
+    group.add_argument("--owner")
+    group.add_argument("--sid", type=int)
+    reb = sub.add_parser("rebalance", help="move submissions to the shard their owner hashes to")
+    reb.add_argument("--dry-run", action="store_true", help="only print what would move")
+    reb.add_argument("--batch", type=int, default=MOVE_BATCH, help="submissions per copy / delete")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    global _map
+    args = _parse_args(argv)
+    try:
+        _map = load(args.file)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    start = time.perf_counter()
+    if args.command == "report":
+        rows = report(_map)
+        for r in rows:
+            print(f"{r['shard']:<10} {r['share']:6.1%} of the ring  {r['owners']:>6} owners  "
+                  f"{r['submissions']:>8} submissions  {r['requirements']:>10} rows  "
+                  f"({r['ms']:.1f} ms)  {r['location']}")
+        print(f"⏱️ {len(rows)} shard(s) in {(time.perf_counter() - start) * 1000:.1f} ms "
+              f"(sum of the per-shard queries: {sum(r['ms'] for r in rows):.1f} ms)")
+    elif args.command == "where":
+        if args.owner is not None:
+            print(f"{args.owner}: new submissions go to {_map.shard_for(args.owner).name}")
+        else:
+            print(f"SubmissionID {args.sid}: rows on {for_submission(args.sid).name}")
+    else:
+        moved = rebalance(args.dry_run, args.batch, _map)
+        if not moved:
+            print("✅ every submission is on its owner's shard")
+        for (source, target), (submissions, rows) in moved.items():
+            if args.dry_run:
+                print(f"{source} -> {target}: {submissions} submission(s) would move")
+            else:
+                print(f"✅ {source} -> {target}: {submissions} submission(s), {rows} rows moved")
+        if moved and not args.dry_run:
+            print(f"⏱️ {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+# similarity.py
+# Near-duplicate requirements: MinHash signatures + LSH banding.
+# Usage:
+#   (venv) > python similarity.py "The system must respond within 5 seconds"   # similar past requirements
+#   (venv) > python similarity.py --clusters --threshold 0.8                      # near-duplicate groups
+#   (venv) > python class_diagram.py --dedup 0.8                                  # collapse before emission
+#
+# A requirement's features are the word bigrams of its clean_text form, lower
+# cased, with the leading "the system shall/must/should" dropped and numbers
+# masked ("within # seconds"), so "within 2 seconds" and "within 3 seconds"
+# are the same requirement. Negated statements ("not", "never", "no") are only
+# compared with negated ones: "allow X" and "not allow X" never collapse.
+#
+# Each distinct feature set gets a NUM_PERM-value MinHash signature, cut into
+# BANDS bands of ROWS values; texts sharing a band are candidates and only
+# those are scored (exact Jaccard of the bigram sets), so a query costs about
+# its number of candidates, not the size of the index. With 16 x 4 a pair at
+# Jaccard 0.5 is a candidate ~23% of the time, at 0.8 ~99.9%.
+#
+# The process-wide index over dbo.Requirements (get_index) is built on first
+# use from every shard in parallel, keyed on (shard, Id, SubmissionID), and kept current by
+# app.py through ingest.on_submission_saved; /similar serves lookups from it.
+
+import argparse
+import os
+import random
+import re
+import threading
+import zlib
+from functools import lru_cache
+from itertools import islice
+
+import metrics
+import shards
+import uml_pipeline
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+DEFAULT_THRESHOLD = 0.7
+
+# ARGOS_DIAGRAM_DEDUP=0.8 makes /diagram collapse near-duplicates (unset = off)
+DIAGRAM_DEDUP = float(os.environ["ARGOS_DIAGRAM_DEDUP"]) if os.environ.get("ARGOS_DIAGRAM_DEDUP") else None
+
+_PRIME = (1 << 61) - 1
+_rnd = random.Random(20240601)  # fixed: signatures must agree across processes and runs
+_PERMS = tuple((_rnd.randrange(1, _PRIME), _rnd.randrange(0, _PRIME)) for _ in range(NUM_PERM))
+
+# clean_text turns "The system shall" into "The the system shall"
+_RE_LEADING_SHALL = re.compile(r"^(the\s+)*system\s+(shall|must|should)\s+")
+_RE_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+_RE_WORD = re.compile(r"[a-z#]+")
+_NEGATIONS = frozenset(("not", "never", "no", "cannot"))
+
+
+@lru_cache(maxsize=65536)
+def features(text):
+    """(negated, frozenset of word bigrams) for one description; text may already be normalized."""
+    s = uml_pipeline.clean_text(text).lower()
+    s = _RE_LEADING_SHALL.sub("", s)
+    words = _RE_WORD.findall(_RE_NUMBER.sub("#", s))
+    negated = not _NEGATIONS.isdisjoint(words)
+    if len(words) < 2:
+        return negated, frozenset(words)
+    return negated, frozenset(f"{a} {b}" for a, b in zip(words, words[1:]))
+
+
+@lru_cache(maxsize=65536)
+def _signature(shingles):
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+    return tuple(min([(a * h + b) % _PRIME for h in hashes]) for a, b in _PERMS)
+
+
+def _bands(feature):
+    negated, shingles = feature
+    sig = _signature(shingles)
+    # the negation flag is part of every band key, so the two sides never meet
+    return [(negated,) + sig[i:i + ROWS] for i in range(0, NUM_PERM, ROWS)]
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class SimilarityIndex:
+    """
+    key -> requirement text, searchable for near-duplicates. Keys sharing the
+    exact same features share one entry (one signature per distinct text).
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._ids = {}       # feature -> entry id
+        self._features = []  # entry id -> feature
+        self._keys = []      # entry id -> [keys]
+        self._buckets = [{} for _ in range(BANDS)]  # band value -> [entry ids]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(keys) for keys in self._keys)
+
+    def add(self, key, text):
+        feature = features(text)
+        if not feature[1]:
+            return None
+        with self._lock:
+            eid = self._ids.get(feature)
+            if eid is None:
+                eid = self._ids[feature] = len(self._features)
+                self._features.append(feature)
+                self._keys.append([])
+                for bucket, band in zip(self._buckets, _bands(feature)):
+                    bucket.setdefault(band, []).append(eid)
+            self._keys[eid].append(key)
+        return eid
+
+    def _candidates(self, feature):
+        found = set()
+        for bucket, band in zip(self._buckets, _bands(feature)):
+            found.update(bucket.get(band, ()))
+        return found
+
+    def _matches(self, feature, threshold):
+        """[(score, entry id)] at or above threshold, best first."""
+        shingles = feature[1]
+        scored = []
+        for cand in self._candidates(feature):
+            score = jaccard(shingles, self._features[cand][1])
+            if score >= threshold:
+                scored.append((score, cand))
+        scored.sort(key=lambda sc: (-sc[0], sc[1]))
+        return scored
+
+    def query(self, text, threshold=None, limit=10, keep=None):
+        """[(score, key)] of indexed requirements similar to text, best first (only keys `keep(key)` accepts)."""
+        feature = features(text)
+        if not feature[1]:
+            return []
+        threshold = self.threshold if threshold is None else threshold
+        with self._lock:
+            results = []
+            for score, eid in self._matches(feature, threshold):
+                keys = self._keys[eid] if keep is None else filter(keep, self._keys[eid])
+                results.extend((score, key) for key in islice(keys, limit - len(results)))
+                if len(results) >= limit:
+                    break
+        return results[:limit]
+
+    def clusters(self, threshold=None):
+        """Groups of keys (two or more) whose texts are near-duplicates, transitively."""
+        threshold = self.threshold if threshold is None else threshold
+        with self._lock:
+            parent = list(range(len(self._features)))
+
+            def root(i):
+                while parent[i] != i:
+                    parent[i] = parent[parent[i]]
+                    i = parent[i]
+                return i
+
+            for eid, feature in enumerate(self._features):
+                for _, other in self._matches(feature, threshold):
+                    if other != eid:
+                        a, b = root(eid), root(other)
+                        if a != b:
+                            parent[max(a, b)] = min(a, b)
+            groups = {}
+            for eid in range(len(self._features)):
+                groups.setdefault(root(eid), []).extend(self._keys[eid])
+        return [keys for keys in groups.values() if len(keys) > 1]
+
+
+def collapse(tokens, threshold=DEFAULT_THRESHOLD):
+    """
+    Pipeline dedup stage: drop every token that is a near-duplicate of an
+    earlier one (same functional flag), keeping the first of each group.
+    """
+    indexes = {True: SimilarityIndex(threshold), False: SimilarityIndex(threshold)}
+    kept, seen = [], set()
+    for token in tokens:
+        if token in seen:  # same statement again: tokens are shared per text
+            continue
+        seen.add(token)
+        index = indexes[token.functional]
+        if index.query(token.norm, limit=1):
+            continue
+        index.add(len(kept), token.norm)
+        kept.append(token)
+    return kept
+
+
+# ---------------------------------------
+# INDEX OVER dbo.Requirements
+# ---------------------------------------
+_index = None
+_index_lock = threading.Lock()
+
+
+def _add_rows(index, shard_name, cursor, batch_size=5000):
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return
+        for rid, sid, desc in batch:
+            if desc:
+                index.add((shard_name, rid, sid), desc)
+
+
+def _add_shard(index, shard):
+    with shard.connection() as conn:
+        cursor = conn.cursor()
+        with metrics.timed("argos_db_query_seconds", query="similarity_index_rows"):
+            cursor.execute("SELECT Id, SubmissionID, Description FROM dbo.Requirements")
+            _add_rows(index, shard.name, cursor)
+        cursor.close()
+
+
+def get_index():
+    """The shared index over every requirement (built from every shard on first use)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = SimilarityIndex()
+            shards.fan_out(lambda shard: _add_shard(index, shard))
+            _index = index
+    return _index
+
+
+def index_submission(sid):
+    """ingest listener: add a new submission's rows, if the index has been built."""
+    index = _index
+    if index is None:
+        return
+    shard = shards.for_submission(sid)
+    with shard.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT Id, SubmissionID, Description FROM dbo.Requirements WHERE SubmissionID = ?", (sid,))
+        _add_rows(index, shard.name, cursor)
+        cursor.close()
+
+
+def similar_requirements(text, limit=10, threshold=None, owner=None):
+    """
+    Similar past requirements: [{"score", "shard", "id", "submission_id", "type", "description"}],
+    best first; with `owner`, only from that user's submissions.
+    """
+    keep = None
+    if owner is not None:
+        sids = shards.owner_submission_ids(owner)
+
+        def keep(key):
+            return key[2] in sids
+    hits = get_index().query(text, threshold, limit, keep)
+    if not hits:
+        return []
+    rows = shards.rows_by_id("SELECT Id, SubmissionID, Type, Description FROM dbo.Requirements WHERE Id IN ({})",
+                             [key[:2] for _, key in hits])
+    return [{"score": round(score, 3), "shard": key[0], "id": key[1], "submission_id": rows[key[:2]][1],
+             "type": rows[key[:2]][2], "description": rows[key[:2]][3]}
+            for score, key in hits if key[:2] in rows]
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Near-duplicate requirements in dbo.Requirements")
+    parser.add_argument("text", nargs="?", help="find requirements similar to this text")
+    parser.add_argument("--clusters", action="store_true", help="print groups of near-duplicates")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Jaccard similarity, 0..1")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+    if not args.text and not args.clusters:
+        parser.error("give a text or --clusters")
+    return args
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    if args.text:
+        for hit in similar_requirements(args.text, args.limit, args.threshold):
+            print(f"{hit['score']:.2f}  {shards.row_label(hit['shard'], hit['id'])} "
+                  f"(SubmissionID {hit['submission_id']})  {hit['description']}")
+    else:
+        groups = sorted(get_index().clusters(args.threshold), key=len, reverse=True)
+        for keys in groups[:args.limit]:
+            print(f"{len(keys):>6} requirements, {', '.join(shards.row_label(*key[:2]) for key in sorted(keys)[:8])}"
+                  f"{' ...' if len(keys) > 8 else ''}")
+        print(f"✅ {len(groups)} near-duplicate group(s)")
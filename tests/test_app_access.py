@@ -0,0 +1,99 @@
+# tests/test_app_access.py
+# Users only see their own submissions: the sid routes answer 404 for
+# someone else's SubmissionID, and search / similar leave their rows out.
+# Usage:
+#   (venv) > python -m pytest -q tests
+
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("ARGOS_JOBS", "0")  # no worker threads in tests
+os.environ.setdefault("ARGOS_DAEMON", "0")
+
+import app  # noqa: E402
+import credentials  # noqa: E402
+import db  # noqa: E402
+import page_cache  # noqa: E402
+import search_index  # noqa: E402
+import shards  # noqa: E402
+import similarity  # noqa: E402
+
+FORM = {"functional_1": "let donors export yearly receipts",
+        "nonfunctional_1": "respond within 5 seconds"}
+
+
+@pytest.fixture
+def clients(tmp_path, monkeypatch):
+    """(alice, bob): logged-in test clients on a fresh database; alice has one submission."""
+    db.configure("sqlite", path=str(tmp_path / "app.db"))
+    monkeypatch.setattr(shards, "_map", shards.ShardMap([shards.Shard(shards.MAIN)]))
+    monkeypatch.setattr(credentials, "KDF_ITERATIONS", 1000)
+    monkeypatch.setattr(search_index, "_index", None)
+    monkeypatch.setattr(similarity, "_index", None)
+    monkeypatch.setattr(page_cache, "pages", page_cache.PageCache())
+    users = []
+    for email in ("alice@example.com", "bob@example.com"):
+        client = app.app.test_client()
+        client.post("/register", data={"email": email, "password": "pw"})
+        client.post("/login", data={"email": email, "password": "pw"})
+        users.append(client)
+    response = users[0].post("/submit", data=FORM)
+    sid = int(response.headers["Location"].rsplit("sid=", 1)[1])
+    yield users[0], users[1], sid
+    db.configure("sqlite", path=":memory:")
+
+
+def test_submission_routes_are_owner_only(clients):
+    alice, bob, sid = clients
+    assert alice.get(f"/templaterequirements?sid={sid}").status_code == 200
+    assert alice.get(f"/jobs/{sid}").status_code == 200
+    assert alice.get(f"/requirements/{sid}.json").get_json()["Functional"] == ["The system shall let donors export yearly receipts"]
+    assert bob.get(f"/requirements/{sid}.json").status_code == 404
+    assert bob.get(f"/templaterequirements?sid={sid}").status_code == 404
+    assert bob.get(f"/diagram/{sid}.png").status_code == 404
+    assert bob.get(f"/jobs/{sid}").status_code == 404
+
+
+def test_cached_page_answers_304_to_its_etag(clients):
+    alice, bob, sid = clients
+    first = alice.get(f"/templaterequirements?sid={sid}")
+    again = alice.get(f"/templaterequirements?sid={sid}", headers={"If-None-Match": first.headers["ETag"]})
+    assert (again.status_code, again.data) == (304, b"")
+    assert page_cache.pages.get((sid, 1))[0] == first.headers["ETag"].strip('"')
+    assert bob.get(f"/templaterequirements?sid={sid}", headers={"If-None-Match": first.headers["ETag"]}).status_code == 404
+
+
+def test_search_and_similar_only_return_own_rows(clients):
+    alice, bob, sid = clients
+    found = alice.get("/search?q=export receipts").get_json()
+    assert [hit["submission_id"] for hit in found] == [sid]
+    assert bob.get("/search?q=export receipts").get_json() == []
+    similar = alice.get("/similar?q=The system shall let donors export yearly receipts").get_json()
+    assert [hit["submission_id"] for hit in similar] == [sid]
+    assert bob.get("/similar?q=The system shall let donors export yearly receipts").get_json() == []
+
+
+def test_submit_leaves_the_search_catch_up_to_a_background_thread(clients, monkeypatch):
+    alice, _, _ = clients
+    assert alice.get("/search?q=export receipts").status_code == 200  # loads the index
+    threads = []
+    refresh = search_index.refresh
+
+    def recording_refresh(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        return refresh(*args, **kwargs)
+    monkeypatch.setattr(search_index, "refresh", recording_refresh)
+    response = alice.post("/submit", data={"functional_1": "let donors print annual statements"})
+    new_sid = int(response.headers["Location"].rsplit("sid=", 1)[1])
+    deadline = time.monotonic() + 5
+    while not search_index._index.search("annual statements") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert threads == ["search-index"]
+    assert [hit["submission_id"] for hit in alice.get("/search?q=annual statements").get_json()] == [new_sid]
@@ -0,0 +1,90 @@
+# tests/test_bulk_io.py
+# bulk_io.py on a throwaway SQLite file: JSONL / CSV import in chunks with
+# fresh SubmissionIDs, listeners after each chunk, export to a store file.
+# Usage:
+#   (venv) > python -m pytest -q tests
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import bulk_io  # noqa: E402
+import db  # noqa: E402
+import ingest  # noqa: E402
+import shards  # noqa: E402
+from requirement_store import RequirementStore  # noqa: E402
+
+
+@pytest.fixture
+def saved(tmp_path, monkeypatch):
+    """SubmissionIDs the submission listeners were told about, on a fresh database."""
+    db.configure("sqlite", path=str(tmp_path / "bulk.db"))
+    monkeypatch.setattr(shards, "_map", shards.ShardMap([shards.Shard(shards.MAIN)]))
+    notified = []
+    monkeypatch.setattr(ingest, "submission_listeners", [notified.append])
+    yield notified
+    db.configure("sqlite", path=":memory:")
+
+
+def _table():
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT SubmissionID, Type, Description, Priority, Stakeholder FROM dbo.Requirements ORDER BY Id")
+        rows = [tuple(row) for row in cursor.fetchall()]
+        cursor.close()
+    return rows
+
+
+def test_import_jsonl_maps_submission_ids_in_chunks(saved, tmp_path):
+    records = [{"SubmissionID": 40, "Type": "Functional", "Description": "Users log in"},
+               {"SubmissionID": 40, "Type": "Domain", "Description": "Donations are in euro", "Priority": "High"},
+               {"Description": ""},  # skipped
+               {"SubmissionID": 7, "Type": "Functional", "Description": "Admins export receipts"},
+               {"Description": "Pages load within 2 seconds"},
+               {"SubmissionID": 40, "Type": "Inverse", "Description": "Guests cannot donate"}]
+    path = tmp_path / "reqs.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in records) + "\n\n", encoding="utf-8")
+    total, new_ids = bulk_io.import_file(str(path), chunk_rows=2)
+    assert total == 5 and len(new_ids) == 3
+    rows = _table()
+    by_sid = {}
+    for sid, _, desc, _, _ in rows:
+        by_sid.setdefault(sid, []).append(desc)
+    assert sorted(by_sid.values()) == [["Admins export receipts"], ["Pages load within 2 seconds"],
+                                       ["Users log in", "Donations are in euro", "Guests cannot donate"]]
+    assert sorted(by_sid) == new_ids
+    assert rows[1][1:] == ("Domain", "Donations are in euro", "High", "Client")
+    assert rows[3][1:] == ("General", "Pages load within 2 seconds", "Medium", "Client")
+    # one notification per submission per committed chunk: (40), (7, none), (40)
+    assert len(saved) == 4 and set(saved) == set(new_ids)
+
+
+def test_import_csv_with_a_bom_and_a_bad_jsonl_line(saved, tmp_path):
+    path = tmp_path / "reqs.csv"
+    path.write_bytes("﻿Type,Description,Priority\nFunctional,\"Users see, and edit, their profile\",Low\n"
+                     "Domain,Donations are in €,\n".encode("utf-8"))
+    assert bulk_io.import_file(str(path))[0] == 2
+    assert [row[1:4] for row in _table()] == [("Functional", "Users see, and edit, their profile", "Low"),
+                                              ("Domain", "Donations are in €", "Medium")]
+    bad = tmp_path / "bad.jsonl"
+    bad.write_text('{"Description": "ok"}\n{not json\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="bad.jsonl:2"):
+        list(bulk_io.read_records(str(bad)))
+    with pytest.raises(ValueError, match="unknown format"):
+        bulk_io.read_records(str(tmp_path / "reqs.txt"))
+
+
+def test_export_round_trips_through_the_store_file(saved, tmp_path):
+    records = [{"SubmissionID": n % 3, "Type": "Functional", "Description": f"Requirement {n}"} for n in range(10)]
+    bulk_io.import_records(records, chunk_rows=4)
+    path = str(tmp_path / "corpus.argosreq")
+    assert bulk_io.export_file(path, batch_size=3) == 10
+    store = RequirementStore.load(path)
+    table = _table()
+    assert [(sid, rows) for sid, rows in store.submissions()] == [
+        (sid, [(rtype, desc) for s, rtype, desc, _, _ in table if s == sid]) for sid in sorted({r[0] for r in table})]
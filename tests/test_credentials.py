@@ -0,0 +1,94 @@
+# tests/test_credentials.py
+# Password hashes, rehash on login, the unknown-email path and the bounded
+# KDF queue in credentials.py, on an in-memory database.
+# Usage:
+#   (venv) > python -m pytest -q tests
+
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import credentials  # noqa: E402
+import db  # noqa: E402
+
+
+@pytest.fixture
+def users(monkeypatch):
+    db.configure("sqlite", path=":memory:")
+    monkeypatch.setattr(credentials, "KDF_ITERATIONS", 1000)
+    monkeypatch.setattr(credentials, "_unknown", {})
+    yield
+    db.configure("sqlite", path=":memory:")
+
+
+def _stored(email):
+    with db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT Password FROM Users WHERE Email = ?", (email,))
+        row = cursor.fetchone()
+        cursor.close()
+    return row[0]
+
+
+def test_verify_password(monkeypatch):
+    monkeypatch.setattr(credentials, "KDF_ITERATIONS", 1000)
+    stored = credentials.hash_password("pw")
+    assert stored.startswith("pbkdf2_sha256$1000$")
+    assert credentials.verify_password("pw", stored) == (True, False)
+    assert credentials.verify_password("other", stored) == (False, False)
+    assert credentials.verify_password("pw", credentials.hash_password("pw", iterations=500)) == (True, True)
+    assert credentials.verify_password("pw", "pw") == (True, True)  # plain text from before hashing
+    for broken in ("", None, "pbkdf2_sha256$0$c2FsdA$aGFzaA", "pbkdf2_sha256$x$c2FsdA$aGFzaA", "pbkdf2_sha256$1$!$!"):
+        assert credentials.verify_password("pw", broken) == (False, False)
+
+
+def test_login_rehashes_outdated_hashes(users, monkeypatch):
+    assert credentials.register_user("a@example.com", "pw")
+    assert not credentials.register_user("a@example.com", "other")
+    monkeypatch.setattr(credentials, "KDF_ITERATIONS", 2000)
+    assert not credentials.authenticate("a@example.com", "wrong")
+    assert _stored("a@example.com").startswith("pbkdf2_sha256$1000$")
+    assert credentials.authenticate("a@example.com", "pw")
+    assert _stored("a@example.com").startswith("pbkdf2_sha256$2000$")
+
+
+def test_busy_rehash_keeps_the_login(users, monkeypatch):
+    credentials.register_user("a@example.com", "pw")
+    monkeypatch.setattr(credentials, "KDF_ITERATIONS", 2000)
+    run_kdf = credentials._run_kdf
+
+    def busy_for_hashing(fn, *args):
+        if fn is credentials.hash_password:
+            raise credentials.CredentialsBusy("full")
+        return run_kdf(fn, *args)
+    monkeypatch.setattr(credentials, "_run_kdf", busy_for_hashing)
+    assert credentials.authenticate("a@example.com", "pw")
+    assert _stored("a@example.com").startswith("pbkdf2_sha256$1000$")
+
+
+def test_unknown_emails_still_run_the_kdf(users, monkeypatch):
+    verified = []
+    verify = credentials.verify_password
+    monkeypatch.setattr(credentials, "verify_password", lambda pw, stored: verified.append(stored) or verify(pw, stored))
+    assert not credentials.authenticate("nobody@example.com", "pw")
+    assert not credentials.authenticate("nobody@example.com", "pw")  # negative cache: no lookup, same KDF
+    assert len(verified) == 2
+    assert all(stored.startswith("pbkdf2_sha256$1000$") for stored in verified)
+    assert credentials.register_user("nobody@example.com", "pw")  # clears the negative cache entry
+    assert credentials.authenticate("nobody@example.com", "pw")
+
+
+def test_full_kdf_queue_raises_busy(monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(credentials, "_slots", slots)
+    monkeypatch.setattr(credentials, "KDF_TIMEOUT", 0.05)
+    slots.acquire()  # a hash still running
+    with pytest.raises(credentials.CredentialsBusy):
+        credentials._run_kdf(credentials.hash_password, "pw")
+    slots.release()
+    assert credentials._run_kdf(credentials.verify_password, "pw", "pw") == (True, True)
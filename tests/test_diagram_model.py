@@ -0,0 +1,84 @@
+# tests/test_diagram_model.py
+# DiagramModel against generate_class_diagram: after any sequence of adds,
+# removes and replaces the incremental model emits what a full regenerate of
+# the remaining requirements gives.
+# Usage:
+#   (venv) > python -m pytest -q tests
+
+import random
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import class_diagram  # noqa: E402
+
+TYPES = ("Functional", "Non-Functional", "Domain", "Inverse")
+
+
+def _statements():
+    lines = []
+    for name in ("sample_reqs.txt", "form_fields.txt"):
+        for line in (ROOT / name).read_text(encoding="utf-8").splitlines():
+            line = re.sub(r"^\d+\.\s*", "", line.strip())
+            if line and not line.endswith(":"):
+                lines.append(line)
+    return lines + ["The admin shall manage users", "The system must respond within 5 seconds"]
+
+
+STATEMENTS = _statements()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_model_matches_a_full_regenerate(seed):
+    rnd = random.Random(seed)
+    current = [(rnd.choice(TYPES), rnd.choice(STATEMENTS)) for _ in range(rnd.randrange(0, 10))]
+    model = class_diagram.DiagramModel(current)
+    for _ in range(60):
+        op = rnd.random()
+        stray = (rnd.choice(TYPES), rnd.choice(STATEMENTS))
+        if op < 0.1 and stray not in current:
+            with pytest.raises(KeyError):
+                model.remove(*stray)
+        elif op < 0.45 or not current:
+            req = (rnd.choice(TYPES), rnd.choice(STATEMENTS))
+            model.add(*req)
+            current.append(req)
+        elif op < 0.8:
+            req = current.pop(rnd.randrange(len(current)))
+            model.remove(*req)
+        else:
+            i = rnd.randrange(len(current))
+            new = (rnd.choice(TYPES), rnd.choice(STATEMENTS))
+            model.replace(current[i], new)
+            current[i] = new
+        assert model.to_plantuml() == class_diagram.generate_class_diagram(current)
+
+
+def test_changes_describe_the_difference():
+    model = class_diagram.DiagramModel()
+    before = set(model.to_plantuml().splitlines())
+    model.add("Functional", "The system shall allow donors to export receipts")
+    after = set(model.to_plantuml().splitlines())
+    changes = model.drain_changes()
+    assert [sign for sign, _ in changes] == ["+"] * len(changes)
+    assert len(after - before) >= len(changes) > 0
+    model.remove("Functional", "The system shall allow donors to export receipts")
+    assert [sign for sign, _ in model.drain_changes()] == ["-"] * len(changes)
+    assert set(model.to_plantuml().splitlines()) == before
+
+
+def test_removing_a_requirement_that_was_not_added():
+    model = class_diagram.DiagramModel([("Functional", "The admin shall manage users")])
+    with pytest.raises(KeyError):
+        model.remove("Functional", "The admin shall manage users too")
+    with pytest.raises(KeyError):
+        class_diagram.DiagramModel().remove("Functional", "The admin shall manage users")
+    model.remove("Functional", "The admin shall manage users")
+    with pytest.raises(KeyError):
+        model.remove("Functional", "The admin shall manage users")
+    assert model.to_plantuml() == class_diagram.generate_class_diagram([])
@@ -0,0 +1,67 @@
+# tests/test_golden.py
+# Golden-output test: the class-diagram rules must keep producing exactly what
+# the original class_diagram.py produced for sample_reqs.txt and
+# form_fields.txt (tests/golden/class_diagram.json, generated from it).
+# Usage:
+#   (venv) > python -m pytest -q tests
+
+import json
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import class_diagram  # noqa: E402
+
+GOLDEN = json.loads((ROOT / "tests" / "golden" / "class_diagram.json").read_text(encoding="utf-8"))
+FUNCTIONS = ("clean_text", "statement_to_method", "statement_to_attribute")
+
+
+def _unnumbered(line):
+    return re.sub(r"^\d+\.\s*", "", line)
+
+
+def _sample_requirements():
+    """sample_reqs.txt as one submission: the section headers give the Type."""
+    reqs, rtype = [], None
+    for line in (ROOT / "sample_reqs.txt").read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line.endswith("Requirements:"):
+            rtype = line[:-len(" Requirements:")]
+        elif line:
+            reqs.append((rtype, _unnumbered(line)))
+    return reqs
+
+
+def _form_requirements():
+    return [("Functional", _unnumbered(line.strip()))
+            for line in (ROOT / "form_fields.txt").read_text(encoding="utf-8").splitlines()
+            if line.strip()[:1].isdigit()]
+
+
+@pytest.mark.parametrize("statement", sorted(GOLDEN["statements"]))
+def test_statement_rules(statement):
+    expected = GOLDEN["statements"][statement]
+    assert {name: getattr(class_diagram, name)(statement) for name in FUNCTIONS} == expected
+
+
+def test_every_input_line_is_covered():
+    lines = set()
+    for name in ("sample_reqs.txt", "form_fields.txt"):
+        for line in (ROOT / name).read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                lines.update((line.strip(), _unnumbered(line.strip())))
+    assert lines == set(GOLDEN["statements"])
+
+
+@pytest.mark.parametrize("name, requirements", [
+    ("sample_reqs", _sample_requirements()),
+    ("form_fields", _form_requirements()),
+    ("both", _sample_requirements() + _form_requirements()),
+])
+def test_generate_class_diagram(name, requirements):
+    assert class_diagram.generate_class_diagram(requirements) == GOLDEN["diagrams"][name]
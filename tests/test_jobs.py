@@ -0,0 +1,97 @@
+# tests/test_jobs.py
+# jobs.py queue on a scratch SQLite file: claims never overlap, an expired
+# lease is claimed again and the old holder's result is discarded, and a
+# failing job stops at MAX_ATTEMPTS.
+# Usage:
+#   (venv) > python -m pytest -q tests
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("ARGOS_JOBS", "0")
+
+import jobs  # noqa: E402
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    """Path of an empty queue; "extract" jobs return their SubmissionID, "boom" jobs raise."""
+    def boom(sid):
+        raise RuntimeError(f"boom {sid}")
+    monkeypatch.setattr(jobs, "HANDLERS", {"extract": lambda sid: {"sid": sid}, "boom": boom})
+    monkeypatch.setattr(jobs, "BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(jobs, "MAX_ATTEMPTS", 3)
+    return str(tmp_path / "jobs.db")
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_workers_never_claim_the_same_job(queue, tmp_path):
+    for sid in range(1, 61):
+        jobs.enqueue(sid, ("extract",), path=queue)
+    pids = []
+    for n in range(4):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                with open(tmp_path / f"claimed{n}", "w") as f:
+                    while (job := jobs.claim(queue)) is not None:
+                        f.write(f"{job[2]}\n")
+            except BaseException:
+                os._exit(1)
+            os._exit(0)
+        pids.append(pid)
+    assert [os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) for pid in pids] == [0] * 4
+    claimed = [int(line) for n in range(4) for line in (tmp_path / f"claimed{n}").read_text().split()]
+    assert sorted(claimed) == list(range(1, 61))
+
+
+def test_enqueue_twice_is_a_no_op(queue):
+    jobs.enqueue(7, ("extract",), path=queue)
+    assert jobs.run_one(queue) == ("extract", 7, "done")
+    jobs.enqueue(7, ("extract",), path=queue)
+    assert jobs.run_one(queue) is None
+    assert [(j["state"], j["result"]) for j in jobs.status(7, queue)] == [("done", {"sid": 7})]
+
+
+def test_expired_lease_is_reclaimed_and_the_old_result_dropped(queue, monkeypatch):
+    monkeypatch.setattr(jobs, "LEASE_SECONDS", 0.05)
+    jobs.enqueue(3, ("extract",), path=queue)
+    first = jobs.claim(queue)
+    assert jobs.claim(queue) is None  # leased
+    time.sleep(0.1)
+    second = jobs.claim(queue)
+    assert second[:3] == first[:3] and second[3] == 2
+    assert jobs._finish(first[0], first[4], {"stale": True}, queue) is False
+    assert jobs._fail(first[0], first[3], first[4], "stale", queue) == "lost"
+    assert jobs._finish(second[0], second[4], {"sid": 3}, queue) is True
+    assert [(j["state"], j["attempts"], j["result"]) for j in jobs.status(3, queue)] == [("done", 2, {"sid": 3})]
+
+
+def test_failing_job_stops_at_max_attempts(queue):
+    jobs.enqueue(5, ("boom",), path=queue)
+    assert [jobs.run_one(queue) for _ in range(4)] == [("boom", 5, "queued"), ("boom", 5, "queued"),
+                                                       ("boom", 5, "failed"), None]
+    [job] = jobs.status(5, queue)
+    assert (job["state"], job["attempts"], job["error"]) == ("failed", 3, "RuntimeError: boom 5")
+    jobs.enqueue(5, ("boom",), path=queue)  # a failed job goes back in the queue
+    assert jobs.run_one(queue) == ("boom", 5, "queued")
+
+
+def test_job_whose_lease_expires_on_the_last_attempt_fails(queue, monkeypatch):
+    monkeypatch.setattr(jobs, "LEASE_SECONDS", 0.02)
+    monkeypatch.setattr(jobs, "MAX_ATTEMPTS", 2)
+    jobs.enqueue(9, ("extract",), path=queue)
+    for attempt in (1, 2):
+        assert jobs.claim(queue)[3] == attempt
+        time.sleep(0.05)  # the worker "died"
+    assert jobs.claim(queue) is None
+    [job] = jobs.status(9, queue)
+    assert (job["state"], job["error"]) == ("failed", "lease expired on attempt 2")
+    assert jobs.retry_failed(queue) == 1
+    assert jobs.run_one(queue) == ("extract", 9, "done")
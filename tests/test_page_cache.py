@@ -0,0 +1,70 @@
+# tests/test_page_cache.py
+# PageCache: LRU order, TTL expiry, per-submission invalidation and the
+# hit / miss counts, also with many threads at once.
+# Usage:
+#   (venv) > python -m pytest -q tests
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import page_cache  # noqa: E402
+
+
+def test_least_recently_used_page_goes_first():
+    cache = page_cache.PageCache(max_entries=2)
+    etag = cache.put((1, 1), "one")
+    cache.put((2, 1), "two")
+    assert cache.get((1, 1)) == (etag, "one")  # (1, 1) is now the newest
+    cache.put((3, 1), "three")
+    assert cache.get((2, 1)) is None
+    assert cache.get((1, 1)) == (page_cache.make_etag("one"), "one")
+    assert cache.stats() == {"entries": 2, "max_entries": 2, "hits": 2, "misses": 1}
+
+
+def test_entries_expire_after_the_ttl():
+    cache = page_cache.PageCache(ttl=0.02)
+    cache.put((1, 1), "one")
+    assert cache.get((1, 1)) is not None
+    time.sleep(0.04)
+    assert cache.get((1, 1)) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_invalidate_drops_every_page_of_one_submission():
+    cache = page_cache.PageCache()
+    for sid in (1, 2):
+        for page in (1, 2, 3):
+            cache.put((sid, page), f"{sid}/{page}")
+    cache.invalidate_submission(1)
+    assert [cache.get((1, page)) for page in (1, 2, 3)] == [None] * 3
+    assert [cache.get((2, page))[1] for page in (1, 2, 3)] == ["2/1", "2/2", "2/3"]
+
+
+def test_threads_sharing_the_cache():
+    cache = page_cache.PageCache(max_entries=50)
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(2000):
+                key = ((n + i) % 80, 1)
+                if cache.get(key) is None:
+                    cache.put(key, str(key))
+                if i % 500 == 0:
+                    cache.invalidate_submission(n)
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = cache.stats()
+    assert errors == []
+    assert stats["entries"] <= 50
+    assert stats["hits"] + stats["misses"] == 8 * 2000
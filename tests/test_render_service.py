@@ -0,0 +1,134 @@
+# tests/test_render_service.py
+# RenderService against a stand-in for `plantuml -pipe` (a small Python
+# script that answers every diagram with "<pid>:<diagram text>"): process
+# reuse, shared jobs, a full queue, timeouts, recycling and main's backpressure.
+# Usage:
+#   (venv) > python -m pytest -q tests
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import render_service  # noqa: E402
+
+FAKE_PLANTUML = f"""#!{sys.executable}
+import os, sys, time
+delimiter = sys.argv[sys.argv.index("-pipedelimitor") + 1]
+lines = []
+for line in sys.stdin:
+    lines.append(line.strip())
+    if line.strip() == "@enduml":
+        if "slow" in lines:
+            time.sleep(float(os.environ.get("FAKE_PLANTUML_DELAY", "1")))
+        sys.stdout.write(f"{{os.getpid()}}:{{'|'.join(lines)}}\\n{{delimiter}}\\n")
+        sys.stdout.flush()
+        lines = []
+"""
+
+
+def diagram(*lines):
+    return "\n".join(("@startuml",) + lines + ("@enduml",))
+
+
+@pytest.fixture
+def plantuml(tmp_path):
+    if os.name == "nt":
+        pytest.skip("the stand-in plantuml is a shebang script")
+    path = tmp_path / "plantuml"
+    path.write_text(FAKE_PLANTUML)
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def service(plantuml):
+    service = render_service.RenderService(workers=1, queue_size=4, timeout=5, cmd=plantuml)
+    yield service
+    service.close()
+
+
+def test_renders_reuse_one_process(service):
+    first = service.render(diagram("class A"))
+    second = service.render(diagram("class B"))
+    pid, text = first.decode().strip().split(":", 1)
+    assert text == "@startuml|class A|@enduml"
+    assert second.decode().startswith(pid + ":")
+    assert service.stats()["renders"] == 2
+
+
+def test_identical_jobs_in_flight_share_one_render(service, monkeypatch):
+    monkeypatch.setenv("FAKE_PLANTUML_DELAY", "0.2")
+    slow = service.submit(diagram("slow"))
+    futures = [service.submit(diagram("class A")) for _ in range(3)]
+    assert futures[0] is futures[1] is futures[2]
+    assert slow.result(5) and futures[0].result(5)
+    stats = service.stats()
+    assert (stats["renders"], stats["shared"]) == (2, 2)
+
+
+def test_full_queue_raises_busy(plantuml, monkeypatch):
+    monkeypatch.setenv("FAKE_PLANTUML_DELAY", "0.3")
+    service = render_service.RenderService(workers=1, queue_size=1, timeout=5, cmd=plantuml)
+    try:
+        running = service.submit(diagram("slow"))
+        while not running.running():
+            time.sleep(0.01)
+        service.submit(diagram("class A"))  # waits in the queue
+        with pytest.raises(render_service.RenderBusy):
+            service.submit(diagram("class B"))
+        assert service.stats()["rejected"] == 1
+    finally:
+        service.close()
+
+
+def test_timeout_kills_the_process_and_the_next_job_gets_a_new_one(plantuml, monkeypatch):
+    monkeypatch.setenv("FAKE_PLANTUML_DELAY", "5")
+    service = render_service.RenderService(workers=1, timeout=0.2, cmd=plantuml)
+    try:
+        with pytest.raises(render_service.RenderTimeout):
+            service.render(diagram("slow"), timeout=5)
+        assert service.render(diagram("class A")).decode().strip().endswith("class A|@enduml")
+        assert service.stats()["timeouts"] == 1
+    finally:
+        service.close()
+
+
+def test_process_is_recycled_after_max_jobs(plantuml):
+    service = render_service.RenderService(workers=1, max_jobs=2, cmd=plantuml)
+    try:
+        pids = [service.render(diagram(f"class C{i}")).split(b":", 1)[0] for i in range(5)]
+        assert pids[0] == pids[1] != pids[2] == pids[3] != pids[4]
+        assert service.stats()["restarts"] == 2
+    finally:
+        service.close()
+
+
+def test_missing_plantuml_is_unavailable(tmp_path):
+    service = render_service.RenderService(workers=1, cmd=str(tmp_path / "no-such-plantuml"))
+    try:
+        with pytest.raises(render_service.RenderUnavailable):
+            service.render(diagram("class A"))
+    finally:
+        service.close()
+
+
+def test_main_waits_for_room_in_a_small_queue(plantuml, tmp_path, monkeypatch, capsys):
+    shared = render_service.RenderService(workers=2, queue_size=2, cmd=plantuml)
+    monkeypatch.setattr(render_service, "_default", shared)  # as inside the argos.py daemon
+    files = []
+    for i in range(20):
+        path = tmp_path / f"d{i}.puml"
+        path.write_text(diagram(f"class C{i}"))
+        files.append(str(path))
+    try:
+        render_service.main(files + ["--format", "svg"])
+    finally:
+        shared.close()
+    assert "20/20 rendered" in capsys.readouterr().out
+    assert (tmp_path / "d7.svg").read_bytes().strip().endswith(b"class C7|@enduml")
@@ -0,0 +1,85 @@
+# tests/test_requirement_store.py
+# RequirementStore in memory and memory-mapped from save(): every accessor
+# gives back what was appended (NULLs, non-ASCII text, decode chunk edges).
+# Usage:
+#   (venv) > python -m pytest -q tests
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import requirement_store  # noqa: E402
+from requirement_store import RequirementStore  # noqa: E402
+
+TYPES = ("Functional", "Non-Functional", "Domain", "Inverse")
+
+
+def _rows(n):
+    """(Id, Type, Description, Priority, Stakeholder, SubmissionID) rows; a few NULLs and non-ASCII texts."""
+    rows = []
+    for i in range(n):
+        desc = None if i % 997 == 5 else (f"The système shall log évent {i}" if i % 1500 == 7 else f"Requirement {i}")
+        rows.append((i + 1, TYPES[i % 4], desc, (None, "High", "Low")[i % 3], "Client" if i % 2 else None, 1 + i // 7))
+    return rows
+
+
+def _store(rows):
+    store = RequirementStore()
+    for rid, rtype, desc, prio, holder, sid in rows:
+        store.append(rtype, desc, rid, prio, holder, sid)
+    return store
+
+
+@pytest.fixture(params=["memory", "mapped"])
+def stored(request, tmp_path):
+    """(rows, store): the store built from rows, or saved and loaded back."""
+    rows = _rows(requirement_store._DECODE_CHUNK * 2 + 10)
+    store = _store(rows)
+    if request.param == "mapped":
+        store.save(str(tmp_path / "corpus.argosreq"))
+        store = RequirementStore.load(str(tmp_path / "corpus.argosreq"))
+    return rows, store
+
+
+def test_accessors_give_back_the_rows(stored):
+    rows, store = stored
+    assert len(store) == len(rows)
+    assert list(store) == [(rtype, desc) for _, rtype, desc, _, _, _ in rows]
+    assert list(store.rows()) == [row[:5] for row in rows]
+    assert list(store.descriptions()) == [row[2] for row in rows]
+    assert [store.description(i) for i in (0, 5, 7, len(rows) - 1)] == [rows[i][2] for i in (0, 5, 7, -1)]
+    view = store[-1]
+    assert (view.id, view.type, view.description, view.priority, view.stakeholder, view.submission_id) == rows[-1]
+    assert store.type_mask("Domain") == [i for i, row in enumerate(rows) if row[1] == "Domain"]
+    assert store.type_mask("General") == []
+    with pytest.raises(IndexError):
+        store[len(rows)]
+
+
+def test_submissions_group_runs_of_equal_ids(stored):
+    rows, store = stored
+    groups = list(store.submissions(resume_from=3))
+    assert [sid for sid, _ in groups] == sorted({row[5] for row in rows if row[5] >= 3})
+    assert groups[0][1] == [(row[1], row[2]) for row in rows if row[5] == 3]
+
+
+def test_mapped_store_is_read_only(tmp_path):
+    path = str(tmp_path / "one.argosreq")
+    RequirementStore.from_pairs([("Functional", "Users log in")]).save(path)
+    store = RequirementStore.load(path)
+    assert list(store) == [("Functional", "Users log in")]
+    with pytest.raises(TypeError):
+        store.append("Functional", "Users log out")
+
+
+def test_empty_store_and_foreign_files(tmp_path):
+    path = str(tmp_path / "empty.argosreq")
+    RequirementStore().save(path)
+    assert list(RequirementStore.load(path)) == []
+    (tmp_path / "other.bin").write_bytes(b"not a store at all, honestly")
+    with pytest.raises(ValueError):
+        RequirementStore.load(str(tmp_path / "other.bin"))
@@ -0,0 +1,55 @@
+# tests/test_schema.py
+# schema.migrate on fresh SQLite files: processes starting together apply
+# each migration once, and a column added by hand is not added again.
+# Usage:
+#   (venv) > python -m pytest -q tests
+
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import db  # noqa: E402
+import schema  # noqa: E402
+
+
+def _versions(path):
+    conn = sqlite3.connect(path)
+    versions = [v for (v,) in conn.execute("SELECT Version FROM SchemaVersion ORDER BY Version")]
+    conn.close()
+    return versions
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+@pytest.mark.parametrize("attempt", range(5))
+def test_processes_migrating_together(tmp_path, attempt):
+    path = str(tmp_path / "fresh.db")
+    pids = []
+    for _ in range(4):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                db.SqliteBackend(path)
+            except BaseException:
+                os._exit(1)
+            os._exit(0)
+        pids.append(pid)
+    assert [os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) for pid in pids] == [0] * 4
+    assert _versions(path) == [number for number, _, _ in schema.MIGRATIONS]
+
+
+def test_add_column_steps_skip_existing_columns(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path, factory=db._SqliteConnection)
+    schema.migrate(conn, "sqlite", target=4)
+    conn.execute("ALTER TABLE SubmissionIds ADD COLUMN Owner TEXT")  # added by hand
+    conn.commit()
+    assert schema.migrate(conn, "sqlite") == schema.LATEST_VERSION
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(SubmissionIds)")]
+    conn.close()
+    assert columns.count("Owner") == 1 and "Shard" in columns
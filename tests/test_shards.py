@@ -0,0 +1,213 @@
+# tests/test_shards.py
+# shards.py on throwaway SQLite files: ring placement, rebalance (run twice,
+# and after a run that stopped half way), the merged cross-shard stream and
+# the search index over rows whose Ids repeat across shards.
+# Usage:
+#   (venv) > python -m pytest -q tests
+
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import db  # noqa: E402
+import extractor  # noqa: E402
+import ingest  # noqa: E402
+import search_index  # noqa: E402
+import shards  # noqa: E402
+
+OWNERS = [f"user{i}@example.com" for i in range(2000)]
+
+
+def _ring(*names, weights=None):
+    weights = weights or {}
+    return shards.ShardMap([shards.Shard(name, f"{name}.db", weights.get(name, 1)) for name in names])
+
+
+@pytest.fixture
+def use_shards(tmp_path, monkeypatch):
+    """use_shards({"main": null, "s1": "s1.db", ...}) points db.py and shards.py at files under tmp_path."""
+    db.configure("sqlite", path=str(tmp_path / "main.db"))
+
+    def use(spec):
+        path = tmp_path / "shards.json"
+        path.write_text(json.dumps({"version": shards.FORMAT_VERSION, "shards": spec}), encoding="utf-8")
+        shard_map = shards.load(str(path))
+        monkeypatch.setattr(shards, "_map", shard_map)
+        return shard_map
+
+    yield use
+    db.configure("sqlite", path=":memory:")
+
+
+def _rows(shard):
+    with shard.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT SubmissionID, Description FROM dbo.Requirements ORDER BY Id")
+        rows = [tuple(row) for row in cursor.fetchall()]
+        cursor.close()
+    return rows
+
+
+def _all_rows(shard_map):
+    return Counter(row for shard in shard_map.all() for row in _rows(shard))
+
+
+def _submit(owners):
+    return {owner: ingest.save_submission([("Functional", f"The system shall serve {owner}"),
+                                           ("Domain", f"The system shall support {owner}")], owner=owner)
+            for owner in owners}
+
+
+# ---------- ring ----------
+
+def test_ring_places_owners_by_weight():
+    placed = Counter(_ring("s1", "s2", weights={"s2": 2}).shard_for(owner).name for owner in OWNERS)
+    assert placed["main"] == 0  # weight 0 unless listed with one
+    assert 1.5 < placed["s2"] / placed["s1"] < 2.6
+
+
+def test_ring_share_covers_the_hash_space():
+    share = _ring("s1", "s2", "s3").ring_share()
+    assert sum(share.values()) == pytest.approx(1.0)
+    assert share["main"] == 0.0
+
+
+def test_adding_a_shard_only_moves_owners_to_it():
+    before, after = _ring("s1", "s2"), _ring("s1", "s2", "s3")
+    moved = [owner for owner in OWNERS if before.shard_for(owner).name != after.shard_for(owner).name]
+    assert all(after.shard_for(owner).name == "s3" for owner in moved)
+    assert 0.2 < len(moved) / len(OWNERS) < 0.45
+
+
+def test_a_map_needs_a_weighted_shard():
+    with pytest.raises(ValueError):
+        shards.ShardMap([shards.Shard("main", weight=0)])
+
+
+# ---------- rebalance ----------
+
+def test_rebalance_moves_everything_once(use_shards):
+    use_shards({"main": {"location": None, "weight": 1}})
+    sids = _submit(OWNERS[:40])
+    shard_map = use_shards({"main": None, "s1": "s1.db", "s2": "s2.db"})
+    expected = _all_rows(shard_map)
+
+    moved = shards.rebalance()
+    assert sum(submissions for submissions, _ in moved.values()) == len(sids)
+    assert sum(rows for _, rows in moved.values()) == 2 * len(sids)
+    assert _all_rows(shard_map) == expected
+    assert _rows(shard_map.get("main")) == []
+    for owner, sid in sids.items():
+        assert shards.for_submission(sid) is shard_map.shard_for(owner)
+
+    assert shards.plan() == {}
+    assert shards.rebalance() == {}
+    assert _all_rows(shard_map) == expected
+
+
+def test_rebalance_finishes_a_run_that_stopped(use_shards, monkeypatch):
+    use_shards({"main": {"location": None, "weight": 1}})
+    _submit(OWNERS[:40])
+    shard_map = use_shards({"main": None, "s1": "s1.db", "s2": "s2.db"})
+    expected = _all_rows(shard_map)
+
+    connection, calls = db.connection, []
+
+    def stop_at_directory_update():
+        calls.append(1)
+        if len(calls) > 1:  # the first one is plan()
+            raise RuntimeError("stopped")
+        return connection()
+
+    # the first batch is copied to its new shard, then the directory update fails
+    with monkeypatch.context() as m:
+        m.setattr(db, "connection", stop_at_directory_update)
+        with pytest.raises(RuntimeError):
+            shards.rebalance(batch=5)
+    assert sum(_all_rows(shard_map).values()) > sum(expected.values())  # copied, not yet deleted
+
+    shards.rebalance(batch=5)
+    assert _all_rows(shard_map) == expected
+    assert shards.plan() == {}
+
+
+def test_failed_submission_leaves_no_directory_entry(use_shards):
+    shard_map = use_shards({"main": None, "s1": "s1.db"})
+    with pytest.raises(ValueError):
+        ingest.save_submission([("Functional",)], owner=OWNERS[0])  # not a (Type, Description) pair
+    with shard_map.get("main").connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM dbo.SubmissionIds")
+        assert cursor.fetchone()[0] == 0
+        cursor.close()
+    assert shards.latest_submission_id(OWNERS[0]) is None
+
+
+# ---------- reads ----------
+
+def test_merged_rows_are_ordered_with_nulls_first(use_shards):
+    shard_map = use_shards({"main": None, "s1": "s1.db", "s2": "s2.db"})
+    placed = {"main": [5, None, 1], "s1": [4, 2, None], "s2": [3, 6]}
+    for name, sids in placed.items():
+        with shard_map.get(name).connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(ingest.INSERT_REQUIREMENT,
+                               [("Functional", f"{name} {sid}", "Medium", "Client", sid) for sid in sids])
+            cursor.close()
+    rows = list(shards.merged_rows("SELECT Description, SubmissionID FROM dbo.Requirements ORDER BY SubmissionID",
+                                   column=1, batch_size=1))
+    assert [row[1] for row in rows] == [None, None, 1, 2, 3, 4, 5, 6]
+    assert {row[0] for row in rows} == {f"{name} {sid}" for name, sids in placed.items() for sid in sids}
+
+
+def test_search_index_keeps_rows_with_the_same_id_apart(use_shards):
+    shard_map = use_shards({"main": None, "s1": "s1.db"})
+    for name in ("main", "s1"):
+        with shard_map.get(name).connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(ingest.INSERT_REQUIREMENT,
+                           ("Functional", f"The system shall export invoices from {name}", "Medium", "Client", 1))
+            cursor.close()
+    index = search_index.SearchIndex()
+    assert search_index.refresh(index) == 2
+    assert sorted((name, rid) for _, name, rid, _, _ in index.search("export invoices")) == [("main", 1), ("s1", 1)]
+    assert search_index.refresh(index) == 0
+
+
+class _ListSink:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, rows):
+        self.rows.extend(rows)
+
+    def close(self):
+        pass
+
+
+def test_extractor_reads_every_shard(use_shards, tmp_path):
+    use_shards({"main": {"location": None, "weight": 1}})
+    _submit(OWNERS[:20])
+    shard_map = use_shards({"main": None, "s1": "s1.db", "s2": "s2.db"})
+    shards.rebalance()
+    expected = Counter(desc for sid, desc in _all_rows(shard_map).elements())
+
+    sink = _ListSink()
+    assert extractor.run(sink, batch_size=7) == sum(expected.values())
+    assert Counter(row[2] for row in sink.rows) == expected
+
+    checkpoint = str(tmp_path / "extract.ckpt")
+    first, rest = _ListSink(), _ListSink()
+    batches = extractor.iter_batches_keyset
+    with pytest.MonkeyPatch.context() as m:  # stop after the first batch of each shard
+        m.setattr(extractor, "iter_batches_keyset", lambda *args: iter(list(batches(*args))[:1]))
+        extractor.run(first, batch_size=7, checkpoint=checkpoint)
+    assert set(extractor.read_checkpoint(checkpoint)) == {"s1", "s2"}
+    extractor.run(rest, batch_size=7, checkpoint=checkpoint)
+    assert Counter(row[2] for row in first.rows + rest.rows) == expected
@@ -0,0 +1,84 @@
+# tests/test_similarity.py
+# similarity.py: feature normalization, LSH lookups against a brute-force
+# Jaccard scan over the sample requirements, clusters and collapse.
+# Usage:
+#   (venv) > python -m pytest -q tests
+
+import re
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import similarity  # noqa: E402
+
+Token = namedtuple("Token", "norm functional")
+
+
+def _statements():
+    lines = set()
+    for name in ("sample_reqs.txt", "form_fields.txt"):
+        for line in (ROOT / name).read_text(encoding="utf-8").splitlines():
+            line = re.sub(r"^\d+\.\s*", "", line.strip())
+            if line and not line.endswith(":"):
+                lines.add(line)
+    return sorted(lines)
+
+
+STATEMENTS = _statements() + ["The system shall respond within 2 seconds",
+                              "The system must respond within 30 seconds",
+                              "The system shall not respond within 2 seconds",
+                              "Users can export their donation history as CSV",
+                              "Users can export their donation history as PDF"]
+
+
+def test_features_mask_numbers_and_the_leading_shall():
+    assert (similarity.features("The system shall respond within 2 seconds")
+            == similarity.features("system must respond within 30 seconds"))
+    negated, shingles = similarity.features("The system shall not respond within 2 seconds")
+    assert negated and "respond within" in shingles
+
+
+def test_negated_requirements_never_match_plain_ones():
+    index = similarity.SimilarityIndex()
+    index.add("plain", "The system shall respond within 2 seconds")
+    assert index.query("The system shall not respond within 2 seconds", threshold=0.0) == []
+    assert index.query("The system shall respond within 5 seconds") == [(1.0, "plain")]
+
+
+def test_query_finds_what_a_brute_force_scan_finds():
+    index = similarity.SimilarityIndex()
+    for i, text in enumerate(STATEMENTS):
+        index.add(i, text)
+    feats = [similarity.features(text) for text in STATEMENTS]
+    for i, (negated, shingles) in enumerate(feats):
+        if not shingles:
+            continue
+        expected = {j for j, (other_negated, other) in enumerate(feats)
+                    if other and other_negated == negated and similarity.jaccard(shingles, other) >= 0.9}
+        found = index.query(STATEMENTS[i], threshold=0.9, limit=len(STATEMENTS))
+        assert {key for _, key in found} == expected
+        assert [score for score, _ in found] == sorted((score for score, _ in found), reverse=True)
+
+
+def test_limit_and_keep():
+    index = similarity.SimilarityIndex()
+    for key in range(6):
+        index.add(key, "Users can export their donation history")
+    assert len(index) == 6
+    assert [key for _, key in index.query("Users can export their donation history", limit=3)] == [0, 1, 2]
+    assert [key for _, key in index.query("Users can export their donation history", keep=lambda k: k % 2)] == [1, 3, 5]
+
+
+def test_clusters_and_collapse():
+    index = similarity.SimilarityIndex(threshold=0.6)
+    texts = ["Users can export their donation history as CSV", "Users can export their donation history as PDF",
+             "The admin shall manage users", "The system shall respond within 2 seconds",
+             "The system must respond within 3 seconds"]
+    for i, text in enumerate(texts):
+        index.add(i, text)
+    assert sorted(sorted(group) for group in index.clusters()) == [[0, 1], [3, 4]]
+    tokens = [Token(text, True) for text in texts] + [Token(texts[0], False)]
+    assert similarity.collapse(tokens, threshold=0.6) == [tokens[0], tokens[2], tokens[3], tokens[5]]
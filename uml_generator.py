@@ -1,39 +1,69 @@
-import db
+import shards
+import diagram_cache
+import uml_pipeline
+
+# Bump when the keyword rules below change (invalidates cached diagrams).
+# 2: emitted by the shared pipeline (inheritance inline, each member once)
+GENERATOR_VERSION = "2"
+
+def _functional_rows(shard):
+    with shard.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT Description FROM dbo.Requirements WHERE Type='Functional'")
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
 
 def fetch_functional_requirements():
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT Description FROM dbo.Requirements WHERE Type='Functional'")
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return [r[0] for r in rows]
-
-def generate_uml(requirements):
-    uml = "@startuml\n"
-    uml += "class User {\n}\n"
-    uml += "class Admin {\n}\n"
-    uml += "class Manager {\n}\n"
-
-    for req in requirements:
-        r = req.lower()
-        if "login" in r:
-            uml += "User : +login()\n"
-        if "profile" in r:
-            uml += "User : +updateProfile()\n"
-        if "report" in r:
-            uml += "Manager : +generateReport()\n"
-        if "delete" in r or "manage" in r:
-            uml += "Admin : +manageRecords()\n"
-
-    uml += "Manager --|> User\n"
-    uml += "Admin --|> User\n"
-    uml += "@enduml\n"
-    return uml
+    # every user's submissions: one query per shard, in parallel
+    return [r[0] for _, rows in shards.fan_out(_functional_rows) for r in rows]
 
-if __name__ == "__main__":
+# keyword -> role method; all runs through the shared pipeline (uml_pipeline.py)
+_ROLE_RULES = (
+    (("login",), "User", "+login()"),
+    (("profile",), "User", "+updateProfile()"),
+    (("report",), "Manager", "+generateReport()"),
+    (("delete", "manage"), "Admin", "+manageRecords()"),
+)
+
+def _classify(token):
+    return tuple((cls, "method", member) for keywords, cls, member in _ROLE_RULES
+                 if any(k in token.lower for k in keywords))
+
+RULES = uml_pipeline.Ruleset(
+    "uml_generator", GENERATOR_VERSION,
+    classes=(("User", None), ("Admin", "User"), ("Manager", "User")),
+    classify=_classify,
+    sort_members=False,
+)
+
+PIPELINE = uml_pipeline.get_pipeline(RULES)
+
+def current_rules():
+    # role rules are code, not a rules file: there is only one version
+    return RULES
+
+def generate_uml(requirements, fmt="plantuml"):
+    return uml_pipeline.get_pipeline(RULES, fmt).run([("Functional", r) for r in requirements])
+
+def cached_uml(requirements, cache=None):
+    """generate_uml through the diagram cache (order matters here). Returns (key, text)."""
+    cache = cache or diagram_cache.get_cache()
+    rows = [("Functional", r) for r in requirements]
+    return cache.puml("uml_generator", GENERATOR_VERSION, rows,
+                      lambda rows: generate_uml([d for _, d in rows]), ordered=True)
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Role diagram (User / Admin / Manager) from Functional requirements")
+    parser.add_argument("--out", default="class_diagram.puml")
+    args = parser.parse_args(argv)
     reqs = fetch_functional_requirements()
-    uml_code = generate_uml(reqs)
-    with open("class_diagram.puml", "w", encoding="utf-8") as f:
+    _, uml_code = cached_uml(reqs)
+    with open(args.out, "w", encoding="utf-8") as f:
         f.write(uml_code)
-    print("✅ UML description generated in class_diagram.puml")
+    print(f"✅ UML description generated in {args.out}")
+
+if __name__ == "__main__":
+    main()
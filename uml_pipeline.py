@@ -0,0 +1,377 @@
+# uml_pipeline.py
+# Requirement rows -> UML text, in stages shared by every generator:
+#
+#   fetch -> normalize -> tokenize -> classify -> map -> build -> emit
+#
+#   normalize  clean_text per distinct row                 -> Statement(functional, text)
+#   tokenize   lower-cased / rule form / words, once       -> Token(functional, lower, norm, words)
+#   dedup      optional: near-duplicates collapsed          (similarity.collapse, Pipeline(dedup=0.8))
+#   classify   the ruleset picks class + kind per token    -> (cls, kind, rule)
+#   map        rule(token) -> member text                  -> (cls, kind, member)
+#   build      defaults + members per class                -> Diagram
+#   emit       Diagram -> text through EMITTERS (plantuml, mermaid, json)
+#
+# The rules themselves live with their generators (class_diagram.RULES, whose
+# word lists are the hot-reloaded mapping_rules.json, and uml_generator.RULES).
+# Normalize, tokenize and the member rules are memoized, so repeated
+# near-default statements cost a dict lookup per stage.
+# Every Pipeline sums the time spent per stage over its runs.
+# Usage:
+#   (venv) > python uml_pipeline.py                                   # latest submission, PlantUML
+#   (venv) > python uml_pipeline.py --sid 12 --format mermaid --out class_diagram.mmd
+#   (venv) > python uml_pipeline.py --all --rules roles --timings      # where generation time goes
+#   (venv) > python uml_pipeline.py --dedup 0.8                        # near-duplicate rows collapsed
+
+import argparse
+import importlib
+import json
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+import metrics
+import shards
+import similarity
+
+Statement = namedtuple("Statement", "functional text")
+
+
+class Token(namedtuple("Token", "functional lower norm words")):
+    # tokenize_one hands out one Token per distinct statement, and the stages
+    # after it are memoized per token: identity hashing keeps those lookups
+    # from re-hashing the word tuple every time
+    __slots__ = ()
+    __hash__ = object.__hash__
+    __eq__ = object.__eq__
+    __ne__ = object.__ne__
+
+
+Diagram = namedtuple("Diagram", "name classes attrs methods")
+
+STAGES = ("fetch", "normalize", "tokenize", "dedup", "classify", "map", "build", "emit")
+
+
+# ---------------------------------------
+# NORMALIZE / TOKENIZE
+# ---------------------------------------
+_RE_THE_THE = re.compile(r"\bthe\s+the\b", re.I)
+_RE_SYSTEM_REPEAT = re.compile(r"\b(system\s+){2,}", re.I)
+_RE_SYSTEM_SHALL = re.compile(r"\b(system\s+(shall|must|should)\s+)+", re.I)
+_RE_PUNCT = re.compile(r"[^\w\s]")
+
+
+def clean_text(txt: str) -> str:
+    if not txt:
+        return ""
+    s = txt.strip().replace("\r", " ").replace("\n", " ")
+    # cheap substring checks first; most statements need only some of the passes
+    folded = s.casefold()
+    if folded.count("the") > 1:
+        s = _RE_THE_THE.sub("the", s)
+    if folded.count("system") > 1:
+        s = _RE_SYSTEM_REPEAT.sub("system ", s)
+    s = " ".join(s.split())
+    if "system" in folded:
+        s = _RE_SYSTEM_SHALL.sub("the system shall ", s)
+    return s.strip()
+
+
+@lru_cache(maxsize=65536)
+def normalize_one(rtype, desc):
+    functional = isinstance(rtype, str) and rtype.lower().startswith("functional")
+    return Statement(functional, clean_text(desc))
+
+
+@lru_cache(maxsize=65536)
+def tokenize_one(statement):
+    # clean_text is not idempotent ("system shall" gains a "the" each pass), so
+    # the member rules keep seeing clean_text(text) exactly as they always have
+    functional, text = statement
+    norm = clean_text(text).lower()
+    return Token(functional, text.lower(), norm, tuple(_RE_PUNCT.sub(" ", norm).split()))
+
+
+@lru_cache(maxsize=65536)
+def _apply(rule, token):
+    return rule(token)
+
+
+# ---------------------------------------
+# RULESETS
+# ---------------------------------------
+class Ruleset:
+    """
+    What a generator plugs into the pipeline:
+
+    classes       ((name, parent or None), ...) in output order
+    classify      token -> ((cls, "attr" | "method", rule), ...); rule is the
+                  member text or a callable rule(token) -> member text
+    defaults      per-class members that are always present
+    placeholders  per-class method shown when a class would be empty
+    sort_members  sorted members (set semantics) or first-seen order
+    """
+
+    def __init__(self, name, version, classes, classify, default_attrs=None, default_methods=None,
+                 placeholders=None, sort_members=True):
+        self.name = name
+        self.version = version
+        self.classes = tuple(classes)
+        self.classify = lru_cache(maxsize=65536)(classify)
+        self.default_attrs = default_attrs or {}
+        self.default_methods = default_methods or {}
+        self.placeholders = placeholders or {}
+        self.sort_members = sort_members
+
+    def build(self, members):
+        """[(cls, kind, member)] -> Diagram, defaults included."""
+        if self.sort_members:
+            attrs = {cls: set(self.default_attrs.get(cls, ())) for cls, _ in self.classes}
+            methods = {cls: set(self.default_methods.get(cls, ())) for cls, _ in self.classes}
+            for cls, kind, member in members:
+                (methods if kind == "method" else attrs)[cls].add(member)
+            order = sorted
+        else:
+            attrs = {cls: dict.fromkeys(self.default_attrs.get(cls, ())) for cls, _ in self.classes}
+            methods = {cls: dict.fromkeys(self.default_methods.get(cls, ())) for cls, _ in self.classes}
+            for cls, kind, member in members:
+                (methods if kind == "method" else attrs)[cls][member] = None
+            order = list
+        return self.diagram({cls: order(v) for cls, v in attrs.items()},
+                            {cls: order(v) for cls, v in methods.items()})
+
+    def diagram(self, attrs, methods):
+        """Diagram from per-class member lists that are already in output order."""
+        for cls, placeholder in self.placeholders.items():
+            if not attrs[cls] and not methods[cls]:
+                methods = {**methods, cls: [placeholder]}
+        return Diagram(self.name, self.classes, attrs, methods)
+
+
+# ---------------------------------------
+# EMITTERS
+# ---------------------------------------
+def emit_plantuml(diagram):
+    lines = ["@startuml", "skinparam classAttributeIconSize 0"]
+    for cls, parent in diagram.classes:
+        lines.append(f"class {cls} extends {parent} {{ }}" if parent else f"class {cls} {{ }}")
+    for cls, _ in diagram.classes:
+        for a in diagram.attrs[cls]:
+            lines.append(f"{cls} : {a}")
+        for m in diagram.methods[cls]:
+            lines.append(f"{cls} : {m}")
+    lines.append("@enduml")
+    return "\n".join(lines)
+
+
+def emit_mermaid(diagram):
+    lines = ["classDiagram"]
+    for cls, parent in diagram.classes:
+        if parent:
+            lines.append(f"    {parent} <|-- {cls}")
+    for cls, _ in diagram.classes:
+        members = diagram.attrs[cls] + diagram.methods[cls]
+        if not members:
+            lines.append(f"    class {cls}")
+            continue
+        lines.append(f"    class {cls} {{")
+        lines.extend(f"        {m}" for m in members)
+        lines.append("    }")
+    return "\n".join(lines) + "\n"
+
+
+def emit_json(diagram):
+    return json.dumps({
+        "diagram": diagram.name,
+        "classes": [
+            {"name": cls, "extends": parent,
+             "attributes": diagram.attrs[cls], "methods": diagram.methods[cls]}
+            for cls, parent in diagram.classes
+        ],
+    }, ensure_ascii=False, indent=2)
+
+
+# emitter name -> (Diagram -> text); add an entry to support another format
+EMITTERS = {"plantuml": emit_plantuml, "mermaid": emit_mermaid, "json": emit_json}
+EXTENSIONS = {"plantuml": "puml", "mermaid": "mmd", "json": "json"}
+
+
+# ---------------------------------------
+# PIPELINE
+# ---------------------------------------
+class Pipeline:
+    """
+    One ruleset + one emitter; `timings` holds seconds per stage, summed over runs.
+    With `dedup` (a Jaccard threshold) near-duplicate statements are collapsed
+    to the first of each group before classification.
+    """
+
+    def __init__(self, rules, emitter="plantuml", dedup=None):
+        if emitter not in EMITTERS:
+            raise ValueError(f"unknown emitter: {emitter} (have {', '.join(EMITTERS)})")
+        self.rules = rules
+        self.emitter = emitter
+        self.dedup = dedup
+        self.timings = dict.fromkeys(STAGES, 0.0)
+        self.runs = 0
+
+    def _lap(self, stage, start):
+        now = time.perf_counter()
+        self.timings[stage] += now - start
+        return now
+
+    def fetch(self, sid=None):
+        """(sid, [(Type, Description)]) for one submission; sid=None means the latest."""
+        t = time.perf_counter()
+        if not sid:
+            sid = shards.latest_submission_id()
+        rows = []
+        if sid:
+            with shards.submission_connection(sid) as conn:
+                cursor = conn.cursor()
+                with metrics.timed("argos_db_query_seconds", query="submission_rows"):
+                    cursor.execute("SELECT Type, Description FROM dbo.Requirements WHERE SubmissionID = ?", (sid,))
+                    rows = cursor.fetchall()
+                cursor.close()
+        self._lap("fetch", t)
+        return sid, rows
+
+    def members(self, requirements, rules=None):
+        """[(Type, Description)] -> [(cls, kind, member)]: every stage up to build."""
+        rules = rules or self.rules
+        t = time.perf_counter()
+        statements = [normalize_one(rtype, desc) for rtype, desc in requirements if desc]
+        t = self._lap("normalize", t)
+        tokens = [tokenize_one(s) for s in statements]
+        t = self._lap("tokenize", t)
+        if self.dedup is not None:
+            tokens = similarity.collapse(tokens, self.dedup)
+            t = self._lap("dedup", t)
+        decisions = [(decision, token) for token in tokens for decision in rules.classify(token)]
+        t = self._lap("classify", t)
+        members = [(cls, kind, rule if isinstance(rule, str) else _apply(rule, token))
+                   for (cls, kind, rule), token in decisions]
+        self._lap("map", t)
+        return members
+
+    def run(self, requirements):
+        """[(Type, Description)] -> emitted text."""
+        rules = self.rules  # one Ruleset for the whole run, even if a reload swaps it meanwhile
+        members = self.members(requirements, rules)
+        t = time.perf_counter()
+        diagram = rules.build(members)
+        t = self._lap("build", t)
+        text = EMITTERS[self.emitter](diagram)
+        self._lap("emit", t)
+        self.runs += 1
+        return text
+
+    def run_submission(self, sid=None):
+        """fetch + run. Returns (sid, text); text is None when there are no rows."""
+        sid, rows = self.fetch(sid)
+        return sid, (self.run(rows) if rows else None)
+
+    def run_all(self, submissions):
+        """Yield (sid, text) for an iterator of (sid, rows); time spent pulling rows counts as fetch."""
+        it = iter(submissions)
+        while True:
+            t = time.perf_counter()
+            item = next(it, None)
+            self._lap("fetch", t)
+            if item is None:
+                return
+            sid, rows = item
+            yield sid, self.run(rows)
+
+    def report(self):
+        """Per-stage timing table."""
+        total = sum(self.timings.values()) or 1.0
+        runs = max(self.runs, 1)
+        lines = [f"{'stage':<10} {'total ms':>10} {'us/run':>10} {'share':>7}"]
+        for stage in STAGES:
+            secs = self.timings[stage]
+            lines.append(f"{stage:<10} {secs * 1000:>10.1f} {secs / runs * 1e6:>10.1f} {secs / total:>7.1%}")
+        lines.append(f"{self.runs} run(s), {self.rules.name} -> {self.emitter}")
+        return "\n".join(lines)
+
+
+# shared pipelines per (ruleset, emitter); /metrics sums their timings at
+# scrape time, so instrumentation costs nothing per run
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_pipeline(rules, emitter="plantuml", dedup=None):
+    key = (rules.name, emitter, dedup)
+    pipeline = _pipelines.get(key)
+    if pipeline is None:
+        with _pipelines_lock:
+            pipeline = _pipelines.setdefault(key, Pipeline(rules, emitter, dedup))
+    if pipeline.rules is not rules:
+        pipeline.rules = rules  # same ruleset after a rules-file reload; timings carry on
+    return pipeline
+
+
+def _stage_seconds():
+    totals = {}
+    for p in list(_pipelines.values()):
+        for stage, secs in p.timings.items():
+            key = (("generator", p.rules.name), ("stage", stage))
+            totals[key] = totals.get(key, 0.0) + secs
+    return totals
+
+
+def _diagrams_generated():
+    totals = {}
+    for p in list(_pipelines.values()):
+        key = (("format", p.emitter), ("generator", p.rules.name))
+        totals[key] = totals.get(key, 0) + p.runs
+    return totals
+
+
+metrics.function("argos_pipeline_stage_seconds_total", _stage_seconds, kind="counter")
+metrics.function("argos_diagrams_generated_total", _diagrams_generated, kind="counter")
+
+
+# ruleset name -> module defining current_rules() (imported on demand; those modules import this one)
+RULESETS = {"class": "class_diagram", "roles": "uml_generator"}
+
+
+def get_rules(name):
+    return importlib.import_module(RULESETS[name]).current_rules()
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate UML from dbo.Requirements through the staged pipeline")
+    parser.add_argument("--rules", choices=sorted(RULESETS), default="class")
+    parser.add_argument("--format", choices=sorted(EMITTERS), default="plantuml")
+    parser.add_argument("--sid", type=int, default=None, help="SubmissionID (default: latest)")
+    parser.add_argument("--all", action="store_true", help="every submission (timings only, nothing written)")
+    parser.add_argument("--out", help="output file (default: stdout)")
+    parser.add_argument("--timings", action="store_true", help="print per-stage timings to stderr")
+    parser.add_argument("--dedup", type=float, default=None, help="collapse near-duplicates at this similarity")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    pipeline = get_pipeline(get_rules(args.rules), args.format, args.dedup)
+    if args.all:
+        import class_diagram
+        count = sum(1 for _ in pipeline.run_all(class_diagram.iter_submissions()))
+        print(f"✅ {count} submissions", file=sys.stderr)
+    else:
+        sid, text = pipeline.run_submission(args.sid)
+        if text is None:
+            print("⚠️ No requirements found.", file=sys.stderr)
+            sys.exit(1)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                f.write(text)
+            print(f"✅ SubmissionID {sid} -> {args.out}", file=sys.stderr)
+        else:
+            print(text)
+    if args.timings or args.all:
+        print(pipeline.report(), file=sys.stderr)